@@ -0,0 +1,42 @@
+"""song vote_count
+
+Revision ID: 5b1f0c2d9e41
+Revises: 146e78e8709c
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c2d9e41'
+down_revision: Union[str, Sequence[str], None] = '146e78e8709c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('songs', sa.Column('vote_count', sa.Integer(), server_default='0', nullable=False))
+    # backfill з наявних голосів
+    op.execute(
+        """
+        UPDATE songs s
+        SET vote_count = v.cnt
+        FROM (SELECT song_id, count(*) AS cnt FROM votes GROUP BY song_id) v
+        WHERE s.id = v.song_id
+        """
+    )
+    op.create_index('ix_song_round_votes', 'songs', ['round_id', sa.text('vote_count DESC'), 'id'], unique=False)
+    # префікс нового індексу — окремий більше не потрібен
+    op.drop_index('ix_song_round', table_name='songs')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_song_round', 'songs', ['round_id'], unique=False)
+    op.drop_index('ix_song_round_votes', table_name='songs')
+    op.drop_column('songs', 'vote_count')
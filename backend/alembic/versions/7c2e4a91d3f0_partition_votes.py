@@ -0,0 +1,105 @@
+"""partition votes by round_id
+
+Revision ID: 7c2e4a91d3f0
+Revises: 5b1f0c2d9e41
+Create Date: 2026-10-19 18:00:00.000000
+
+votes -> декларативно секціонована таблиця, RANGE (round_id) по ROUNDS_PER_PARTITION раундів.
+round_id росте з часом, тож секція ≈ період роботи; ключ секції входить у PK (id, round_id)
+і в uq_vote_user_round, тож ON CONFLICT (user_id, round_id) працює як раніше.
+Секції наперед і від'єднання старих — archive_votes.py; votes_default ловить решту.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e4a91d3f0'
+down_revision: Union[str, Sequence[str], None] = '5b1f0c2d9e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROUNDS_PER_PARTITION = 5000     # те саме значення за замовчуванням у archive_votes.py
+PARTITIONS_AHEAD = 2
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    max_round = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM rounds")).scalar_one()
+
+    # стара таблиця звільняє імена (індекси/обмеження — глобальні в схемі) і послідовність
+    op.execute("ALTER TABLE votes RENAME TO votes_legacy")
+    op.execute("ALTER TABLE votes_legacy RENAME CONSTRAINT votes_pkey TO votes_legacy_pkey")
+    op.execute("ALTER TABLE votes_legacy RENAME CONSTRAINT uq_vote_user_round TO uq_vote_user_round_legacy")
+    op.drop_index('ix_votes_round_song', table_name='votes_legacy')
+    op.drop_index('ix_votes_song_id', table_name='votes_legacy')
+    op.drop_index('ix_votes_user_round', table_name='votes_legacy')
+    op.execute("ALTER SEQUENCE votes_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE votes (
+            id INTEGER NOT NULL DEFAULT nextval('votes_id_seq'),
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            round_id INTEGER NOT NULL REFERENCES rounds (id) ON DELETE CASCADE,
+            song_id INTEGER NOT NULL REFERENCES songs (id) ON DELETE CASCADE,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT votes_pkey PRIMARY KEY (id, round_id),
+            CONSTRAINT uq_vote_user_round UNIQUE (user_id, round_id)
+        ) PARTITION BY RANGE (round_id)
+        """
+    )
+    last = (max_round // ROUNDS_PER_PARTITION + PARTITIONS_AHEAD) * ROUNDS_PER_PARTITION
+    for lo in range(0, last + 1, ROUNDS_PER_PARTITION):
+        op.execute(
+            f"CREATE TABLE votes_r{lo} PARTITION OF votes FOR VALUES FROM ({lo}) TO ({lo + ROUNDS_PER_PARTITION})"
+        )
+    op.execute("CREATE TABLE votes_default PARTITION OF votes DEFAULT")
+
+    op.execute(
+        "INSERT INTO votes (id, user_id, round_id, song_id, created_at) "
+        "SELECT id, user_id, round_id, song_id, created_at FROM votes_legacy"
+    )
+    op.drop_table('votes_legacy')
+    op.execute("ALTER SEQUENCE votes_id_seq OWNED BY votes.id")
+
+    # на батьківській таблиці — створюються в кожній секції; (user_id, round_id) покриває uq
+    op.create_index('ix_votes_round_song', 'votes', ['round_id', 'song_id'], unique=False)
+    op.create_index('ix_votes_song_id', 'votes', ['song_id'], unique=False)
+    op.execute("ANALYZE votes")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # голоси з від'єднаних (архівних) секцій назад не повертаються
+    op.execute("ALTER TABLE votes RENAME TO votes_partitioned")
+    op.execute("ALTER TABLE votes_partitioned RENAME CONSTRAINT votes_pkey TO votes_partitioned_pkey")
+    op.execute("ALTER TABLE votes_partitioned RENAME CONSTRAINT uq_vote_user_round TO uq_vote_user_round_partitioned")
+    op.drop_index('ix_votes_round_song', table_name='votes_partitioned')
+    op.drop_index('ix_votes_song_id', table_name='votes_partitioned')
+    op.execute("ALTER SEQUENCE votes_id_seq OWNED BY NONE")
+
+    op.create_table('votes',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('votes_id_seq')"), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('round_id', sa.Integer(), nullable=False),
+    sa.Column('song_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['round_id'], ['rounds.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'round_id', name='uq_vote_user_round')
+    )
+    op.execute(
+        "INSERT INTO votes (id, user_id, round_id, song_id, created_at) "
+        "SELECT id, user_id, round_id, song_id, created_at FROM votes_partitioned"
+    )
+    op.execute("DROP TABLE votes_partitioned")      # разом із секціями
+    op.execute("ALTER SEQUENCE votes_id_seq OWNED BY votes.id")
+    op.create_index('ix_votes_round_song', 'votes', ['round_id', 'song_id'], unique=False)
+    op.create_index('ix_votes_song_id', 'votes', ['song_id'], unique=False)
+    op.create_index('ix_votes_user_round', 'votes', ['user_id', 'round_id'], unique=False)
@@ -0,0 +1,97 @@
+"""analytics rollups
+
+Revision ID: 9d4b7e2a1c58
+Revises: 7c2e4a91d3f0
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4b7e2a1c58'
+down_revision: Union[str, Sequence[str], None] = '7c2e4a91d3f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analytics_rounds',
+    sa.Column('round_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('club_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('ended_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('votes', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('voters', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('suggestions', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('attendees', sa.Integer(), nullable=True),
+    sa.Column('winner_song_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['club_id'], ['clubs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('round_id')
+    )
+    op.create_index('ix_analytics_rounds_club_day', 'analytics_rounds', ['club_id', 'day'], unique=False)
+    op.create_index('ix_analytics_rounds_event', 'analytics_rounds', ['event_id'], unique=False)
+
+    op.create_table('analytics_vote_minutes',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('minute', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('votes', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'minute')
+    )
+
+    op.create_table('analytics_event_songs',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('song_key', sa.String(length=512), nullable=False),
+    sa.Column('club_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('artist', sa.String(length=255), nullable=True),
+    sa.Column('source', sa.String(length=32), nullable=True),
+    sa.Column('source_id', sa.String(length=128), nullable=True),
+    sa.Column('cover_url', sa.String(length=1024), nullable=True),
+    sa.Column('votes', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rounds', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('wins', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['club_id'], ['clubs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'song_key')
+    )
+    op.create_index('ix_analytics_event_songs_club_day', 'analytics_event_songs', ['club_id', 'day'], unique=False)
+    op.create_index(
+        'ix_analytics_event_songs_event_votes', 'analytics_event_songs', ['event_id', sa.text('votes DESC')], unique=False
+    )
+
+    op.create_table('analytics_event_voters',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('club_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['club_id'], ['clubs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'user_id')
+    )
+    op.create_index(
+        'ix_analytics_event_voters_club_day_user', 'analytics_event_voters', ['club_id', 'day', 'user_id'], unique=False
+    )
+    # історію заповнить перший запуск worker_analytics.py
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_analytics_event_voters_club_day_user', table_name='analytics_event_voters')
+    op.drop_table('analytics_event_voters')
+    op.drop_index('ix_analytics_event_songs_event_votes', table_name='analytics_event_songs')
+    op.drop_index('ix_analytics_event_songs_club_day', table_name='analytics_event_songs')
+    op.drop_table('analytics_event_songs')
+    op.drop_table('analytics_vote_minutes')
+    op.drop_index('ix_analytics_rounds_event', table_name='analytics_rounds')
+    op.drop_index('ix_analytics_rounds_club_day', table_name='analytics_rounds')
+    op.drop_table('analytics_rounds')
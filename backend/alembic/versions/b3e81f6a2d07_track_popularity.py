@@ -0,0 +1,53 @@
+"""track popularity
+
+Revision ID: b3e81f6a2d07
+Revises: 9d4b7e2a1c58
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e81f6a2d07'
+down_revision: Union[str, Sequence[str], None] = '9d4b7e2a1c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('track_popularity',
+    sa.Column('club_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=32), nullable=False),
+    sa.Column('source_id', sa.String(length=128), nullable=False),
+    sa.Column('suggestions', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('votes', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('wins', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_played_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['club_id'], ['clubs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('club_id', 'source', 'source_id')
+    )
+    # backfill з уже врахованих раундів (analytics_rounds): далі — rollup_round при закритті
+    op.execute(
+        """
+        INSERT INTO track_popularity (club_id, source, source_id, suggestions, votes, wins, last_played_at)
+        SELECT a.club_id, s.source, s.source_id,
+               count(*), sum(s.vote_count),
+               count(*) FILTER (WHERE s.id = a.winner_song_id),
+               max(a.ended_at) FILTER (WHERE s.id = a.winner_song_id)
+        FROM analytics_rounds a
+        JOIN songs s ON s.round_id = a.round_id
+        WHERE s.source IS NOT NULL AND s.source_id IS NOT NULL
+        GROUP BY a.club_id, s.source, s.source_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('track_popularity')
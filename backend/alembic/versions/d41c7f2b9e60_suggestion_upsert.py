@@ -0,0 +1,70 @@
+"""suggestion upsert
+
+Revision ID: d41c7f2b9e60
+Revises: b3e81f6a2d07
+Create Date: 2026-10-19 22:00:00.000000
+
+uq_song_round_title_artist -> NULLS NOT DISTINCT, щоб ON CONFLICT у song_crud ловив і
+пропозиції без виконавця. Дублікати, які стара версія обмеження пропускала (artist IS NULL),
+зливаються в найменший id: голоси, vote_count і переможці раундів переносяться.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7f2b9e60'
+down_revision: Union[str, Sequence[str], None] = 'b3e81f6a2d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('club_settings', sa.Column('duplicate_suggestion_votes', sa.Boolean(), server_default='true', nullable=False))
+
+    op.execute(
+        """
+        CREATE TEMP TABLE song_dups AS
+        SELECT id, keep
+        FROM (
+            SELECT id, min(id) OVER (PARTITION BY round_id, title) AS keep
+            FROM songs
+            WHERE artist IS NULL
+        ) d
+        WHERE id <> keep
+        """
+    )
+    # (user_id, round_id) унікальні, тож голос за дубль не зіткнеться з голосом за оригінал
+    op.execute("UPDATE votes v SET song_id = d.keep FROM song_dups d WHERE v.song_id = d.id")
+    op.execute(
+        """
+        UPDATE songs s SET vote_count = s.vote_count + x.votes
+        FROM (
+            SELECT d.keep, sum(dup.vote_count) AS votes
+            FROM song_dups d
+            JOIN songs dup ON dup.id = d.id
+            GROUP BY d.keep
+        ) x
+        WHERE s.id = x.keep
+        """
+    )
+    op.execute("UPDATE rounds r SET winner_song_id = d.keep FROM song_dups d WHERE r.winner_song_id = d.id")
+    op.execute("UPDATE analytics_rounds a SET winner_song_id = d.keep FROM song_dups d WHERE a.winner_song_id = d.id")
+    op.execute("DELETE FROM songs s USING song_dups d WHERE s.id = d.id")
+    op.execute("DROP TABLE song_dups")
+
+    op.drop_constraint('uq_song_round_title_artist', 'songs', type_='unique')
+    op.execute(
+        "ALTER TABLE songs ADD CONSTRAINT uq_song_round_title_artist "
+        "UNIQUE NULLS NOT DISTINCT (round_id, title, artist)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_song_round_title_artist', 'songs', type_='unique')
+    op.create_unique_constraint('uq_song_round_title_artist', 'songs', ['round_id', 'title', 'artist'])
+    op.drop_column('club_settings', 'duplicate_suggestion_votes')
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel, Field
-from sqlalchemy import delete, desc, select
+from sqlalchemy import delete, desc, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from app.schemas.schemas import ClubSettingsUpdate
@@ -20,8 +21,16 @@ from app.models.models import (
     EventDJ,
     AdminClub,
     ClubSettings,
-
+    AnalyticsRound,
+    AnalyticsVoteMinute,
+    AnalyticsEventSong,
+    AnalyticsEventVoter,
 )
+from app.crud.event_crud import end_last_round
+from app.services import round_state
+from app.services.event_cache import invalidate_club
+from app.services.live_bus import publish_event
+from app.services.fastjson import dumps
 from app.core.auth import (
     verify_password,
     create_admin_token,
@@ -112,6 +121,66 @@ class DashboardOut(BaseModel):
     recent_events: list[EventOut]
 
 
+class AnalyticsTrackOut(BaseModel):
+    id: str
+    title: str
+    artist: Optional[str] = None
+    cover_url: Optional[str] = None
+    external_id: Optional[str] = None
+    source: str
+
+
+class AnalyticsTopTrackOut(BaseModel):
+    track: AnalyticsTrackOut
+    votes: int
+    wins: int
+    events: Optional[int] = None
+
+
+class AnalyticsPointOut(BaseModel):
+    time: datetime
+    count: int
+
+
+class EventAnalyticsOut(BaseModel):
+    total_votes: int
+    total_suggestions: int
+    total_rounds: int
+    unique_voters: int
+    peak_attendees: int
+    top_tracks: list[AnalyticsTopTrackOut]
+    votes_timeline: list[AnalyticsPointOut]
+
+
+class AnalyticsDayOut(BaseModel):
+    day: date
+    events: int
+    rounds: int
+    votes: int
+    suggestions: int
+
+
+class AnalyticsEventTotalOut(BaseModel):
+    event_id: int
+    title: str
+    votes: int
+    rounds: int
+
+
+class ClubAnalyticsOut(BaseModel):
+    date_from: date
+    date_to: date
+    total_events: int
+    total_rounds: int
+    total_votes: int
+    total_suggestions: int
+    unique_voters: int
+    peak_attendees: int
+    days: list[AnalyticsDayOut]
+    top_tracks: list[AnalyticsTopTrackOut]
+    top_events: list[AnalyticsEventTotalOut]
+
+
 # =========================
 # HELPERS
 # =========================
@@ -182,24 +251,55 @@ def _dashboard_admin_to_dict(admin: AdminUser, club_id: int) -> dict:
     }
 
 
-async def _event_dj_ids(db: AsyncSession, event_id: int) -> list[int]:
-    rows = (
-        await db.execute(select(EventDJ.dj_id).where(EventDJ.event_id == event_id))
-    ).scalars().all()
-    return list(rows)
+# ---------- Serialization ----------
+# Списки івентів читаємо колонками (без ORM identity map), dj_ids — array_agg у тому ж запиті
+# замість окремого SELECT на кожен івент. Рядки йдуть у JSON напряму (fastjson), минаючи
+# EventOut(**dict) + повторну валідацію response_model; формат полів той самий.
+_EVENT_DJ_IDS = (
+    select(func.array_agg(aggregate_order_by(EventDJ.dj_id, EventDJ.dj_id)))
+    .where(EventDJ.event_id == Event.id)
+    .correlate(Event)
+    .scalar_subquery()
+)
+_EVENT_COLUMNS = (
+    Event.id,
+    Event.club_id,
+    Event.title,
+    Event.preview,
+    Event.start_date,
+    Event.end_date,
+    Event.created_at,
+    _EVENT_DJ_IDS.label("dj_ids"),
+)
 
 
-async def _event_to_dict(db: AsyncSession, event: Event) -> dict:
-    return {
-        "id": event.id,
-        "club_id": event.club_id,
-        "title": event.title,
-        "preview": event.preview,
-        "start_date": event.start_date,
-        "end_date": event.end_date,
-        "created_at": event.created_at,
-        "dj_ids": await _event_dj_ids(db, event.id),
-    }
+def _event_row(row) -> dict:
+    """Рядок _EVENT_COLUMNS -> dict полів EventOut."""
+    out = row._asdict()
+    out["dj_ids"] = out["dj_ids"] or []
+    return out
+
+
+async def _event_rows(db: AsyncSession, *where, limit: Optional[int] = None) -> list[dict]:
+    stmt = (
+        select(*_EVENT_COLUMNS)
+        .where(*where)
+        .order_by(desc(Event.start_date).nullslast(), desc(Event.id))
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return [_event_row(row) for row in (await db.execute(stmt)).all()]
+
+
+async def _event_json(db: AsyncSession, *where, status_code: int = 200) -> Response:
+    rows = await _event_rows(db, *where)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return _json(dumps(rows[0]), status_code=status_code)
+
+
+def _json(body: bytes, status_code: int = 200) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
 
 
 async def _resolve_selected_club(
@@ -410,34 +510,32 @@ async def dashboard(
 ):
     club = await _resolve_selected_club(db, me, club_id)
 
-    events = (
+    # ті самі правила, що в _calc_event_status: ended -> live -> решта scheduled
+    now = datetime.now(timezone.utc)
+    ended = Event.end_date.is_not(None) & (Event.end_date < now)
+    live = (
+            Event.start_date.is_not(None)
+            & (Event.start_date <= now)
+            & (Event.end_date.is_(None) | (Event.end_date >= now))
+    )
+    total_events, live_events, ended_events = (
         await db.execute(
-            select(Event)
-            .where(Event.club_id == club.id)
-            .order_by(desc(Event.start_date).nullslast(), desc(Event.id))
+            select(
+                func.count(),
+                func.count().filter(live),
+                func.count().filter(ended),
+            ).where(Event.club_id == club.id)
         )
-    ).scalars().all()
-
-    live_events = 0
-    upcoming_events = 0
-
-    for event in events:
-        event_status = _calc_event_status(event)
-        if event_status == "live":
-            live_events += 1
-        elif event_status == "scheduled":
-            upcoming_events += 1
-
-    recent_events = [EventOut(**(await _event_to_dict(db, event))) for event in events[:10]]
-
-    return DashboardOut(
-        admin=AdminDashboardAdminOut(**_dashboard_admin_to_dict(me, club.id)),
-        club=AdminClubOut(**_club_to_dict(club)),
-        total_events=len(events),
-        live_events=live_events,
-        upcoming_events=upcoming_events,
-        recent_events=recent_events,
-    )
+    ).one()
+
+    return _json(dumps({
+        "admin": _dashboard_admin_to_dict(me, club.id),
+        "club": _club_to_dict(club),
+        "total_events": total_events,
+        "live_events": live_events,
+        "upcoming_events": total_events - live_events - ended_events,
+        "recent_events": await _event_rows(db, Event.club_id == club.id, limit=10),
+    }))
 
 
 # =========================
@@ -450,16 +548,7 @@ async def list_events(
         db: AsyncSession = Depends(get_db),
 ):
     club = await _resolve_selected_club(db, me, club_id)
-
-    events = (
-        await db.execute(
-            select(Event)
-            .where(Event.club_id == club.id)
-            .order_by(desc(Event.start_date).nullslast(), desc(Event.id))
-        )
-    ).scalars().all()
-
-    return [EventOut(**(await _event_to_dict(db, event))) for event in events]
+    return _json(dumps(await _event_rows(db, Event.club_id == club.id)))
 
 
 @router.post("/events", response_model=EventOut, status_code=status.HTTP_201_CREATED)
@@ -492,9 +581,9 @@ async def create_event(
         db.add(EventDJ(event_id=event.id, dj_id=dj_id))
 
     await db.commit()
-    await db.refresh(event)
+    await invalidate_club(club.slug)
 
-    return EventOut(**(await _event_to_dict(db, event)))
+    return await _event_json(db, Event.id == event.id, status_code=status.HTTP_201_CREATED)
 
 
 @router.get("/events/{event_id}", response_model=EventOut)
@@ -505,8 +594,7 @@ async def get_event(
         db: AsyncSession = Depends(get_db),
 ):
     club = await _resolve_selected_club(db, me, club_id)
-    event = await _get_owned_event(db, event_id, club.id)
-    return EventOut(**(await _event_to_dict(db, event)))
+    return await _event_json(db, Event.id == event_id, Event.club_id == club.id)
 
 
 @router.patch("/events/{event_id}", response_model=EventOut)
@@ -549,9 +637,9 @@ async def update_event(
             db.add(EventDJ(event_id=event.id, dj_id=dj_id))
 
     await db.commit()
-    await db.refresh(event)
+    await invalidate_club(club.slug)
 
-    return EventOut(**(await _event_to_dict(db, event)))
+    return await _event_json(db, Event.id == event.id)
 
 
 @router.post("/events/{event_id}/end")
@@ -565,7 +653,14 @@ async def end_event(
     event = await _get_owned_event(db, event_id, club.id)
 
     event.end_date = datetime.now(timezone.utc)
+    # останній раунд закривається разом з івентом — інакше він лишається відкритим назавжди
+    # (голосування, analytics, archive_votes.py чекають на ended_at)
+    ended = await end_last_round(db, event.id)
     await db.commit()
+    await invalidate_club(club.slug)
+    if ended:
+        await round_state.invalidate(event.id)
+        await publish_event(event.id, {"type": "round_ended", **ended, "new_round_id": None, "new_round_number": None})
     await db.refresh(event)
 
     return {
@@ -588,6 +683,7 @@ async def delete_event(
     await db.execute(delete(EventDJ).where(EventDJ.event_id == event.id))
     await db.delete(event)
     await db.commit()
+    await invalidate_club(club.slug)
 
     return {
         "status": "success",
@@ -622,6 +718,7 @@ async def get_club_settings(
             "voting_duration_sec": settings.voting_duration_sec if settings else 60,
             "allow_explicit": settings.allow_explicit if settings else False,
             "auto_play": settings.auto_play if settings else False,
+            "duplicate_suggestion_votes": settings.duplicate_suggestion_votes if settings else True,
         },
     }
 
@@ -665,8 +762,203 @@ async def update_club_settings(
     if payload.auto_play is not None:
         settings.auto_play = payload.auto_play
 
+    if payload.duplicate_suggestion_votes is not None:
+        settings.duplicate_suggestion_votes = payload.duplicate_suggestion_votes
+
     if payload.background_image_url is not None:
         settings.background_image_url = payload.background_image_url.strip() or None
     await db.commit()
+    await invalidate_club(club.slug)
+
+    return {"status": "success"}
+
+
+# =========================
+# ANALYTICS
+# =========================
+# Лише rollup-таблиці (app/services/analytics.py, worker_analytics.py): раунд потрапляє сюди
+# після закриття; індекси (club_id, day) / event_id обмежують читання періодом або івентом.
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 366
+ANALYTICS_TOP_LIMIT = 50
+
+
+def _track_row(row) -> dict:
+    return {
+        "track": {
+            "id": row.song_key,
+            "title": row.title,
+            "artist": row.artist,
+            "cover_url": row.cover_url,
+            "external_id": row.source_id,
+            "source": row.source or "manual",
+        },
+        "votes": int(row.votes or 0),
+        "wins": int(row.wins or 0),
+    }
+
+
+def _analytics_range(date_from: Optional[date], date_to: Optional[date]) -> tuple[date, date]:
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {ANALYTICS_MAX_DAYS} days")
+    return date_from, date_to
+
+
+@router.get("/events/{event_id}/analytics", response_model=EventAnalyticsOut)
+async def event_analytics(
+        event_id: int,
+        club_id: Optional[int] = Query(default=None),
+        time_from: Optional[datetime] = Query(default=None, alias="from"),
+        time_to: Optional[datetime] = Query(default=None, alias="to"),
+        bucket_minutes: int = Query(default=1, ge=1, le=1440),
+        limit: int = Query(default=10, ge=1, le=ANALYTICS_TOP_LIMIT),
+        me: AdminUser = Depends(get_current_admin),
+        db: AsyncSession = Depends(get_db),
+):
+    club = await _resolve_selected_club(db, me, club_id)
+    event = await _get_owned_event(db, event_id, club.id)
+
+    votes, suggestions, rounds, attendees = (
+        await db.execute(
+            select(
+                func.coalesce(func.sum(AnalyticsRound.votes), 0),
+                func.coalesce(func.sum(AnalyticsRound.suggestions), 0),
+                func.count(),
+                func.coalesce(func.max(AnalyticsRound.attendees), 0),
+            ).where(AnalyticsRound.event_id == event.id)
+        )
+    ).one()
+    voters = (
+        await db.execute(select(func.count()).where(AnalyticsEventVoter.event_id == event.id))
+    ).scalar_one()
+
+    top = await db.execute(
+        select(AnalyticsEventSong)
+        .where(AnalyticsEventSong.event_id == event.id)
+        .order_by(AnalyticsEventSong.votes.desc(), AnalyticsEventSong.song_key)
+        .limit(limit)
+    )
+
+    # кошики по bucket_minutes від епохи: однакові межі для будь-якого from/to
+    seconds = bucket_minutes * 60
+    bucket = func.to_timestamp(
+        func.floor(func.extract("epoch", AnalyticsVoteMinute.minute) / seconds) * seconds
+    ).label("time")
+    timeline = (
+        select(bucket, func.sum(AnalyticsVoteMinute.votes).label("count"))
+        .where(AnalyticsVoteMinute.event_id == event.id)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    if time_from is not None:
+        timeline = timeline.where(AnalyticsVoteMinute.minute >= _normalize_dt(time_from))
+    if time_to is not None:
+        timeline = timeline.where(AnalyticsVoteMinute.minute < _normalize_dt(time_to))
+
+    return _json(dumps({
+        "total_votes": int(votes),
+        "total_suggestions": int(suggestions),
+        "total_rounds": rounds,
+        "unique_voters": voters,
+        "peak_attendees": int(attendees),
+        "top_tracks": [_track_row(row) for row in top.scalars().all()],
+        "votes_timeline": [{"time": t, "count": int(c)} for t, c in (await db.execute(timeline)).all()],
+    }))
+
+
+@router.get("/analytics", response_model=ClubAnalyticsOut)
+async def club_analytics(
+        club_id: Optional[int] = Query(default=None),
+        date_from: Optional[date] = Query(default=None),
+        date_to: Optional[date] = Query(default=None),
+        limit: int = Query(default=10, ge=1, le=ANALYTICS_TOP_LIMIT),
+        me: AdminUser = Depends(get_current_admin),
+        db: AsyncSession = Depends(get_db),
+):
+    club = await _resolve_selected_club(db, me, club_id)
+    date_from, date_to = _analytics_range(date_from, date_to)
+    rounds_in = (
+        AnalyticsRound.club_id == club.id,
+        AnalyticsRound.day.between(date_from, date_to),
+    )
+
+    days = (
+        await db.execute(
+            select(
+                AnalyticsRound.day,
+                func.count(func.distinct(AnalyticsRound.event_id)),
+                func.count(),
+                func.sum(AnalyticsRound.votes),
+                func.sum(AnalyticsRound.suggestions),
+                func.max(AnalyticsRound.attendees),
+            )
+            .where(*rounds_in)
+            .group_by(AnalyticsRound.day)
+            .order_by(AnalyticsRound.day)
+        )
+    ).all()
+    # подія може йти через північ — івенти рахуємо окремо, не сумою по днях
+    total_events = (
+        await db.execute(select(func.count(func.distinct(AnalyticsRound.event_id))).where(*rounds_in))
+    ).scalar_one()
+    voters = (
+        await db.execute(
+            select(func.count(func.distinct(AnalyticsEventVoter.user_id))).where(
+                AnalyticsEventVoter.club_id == club.id,
+                AnalyticsEventVoter.day.between(date_from, date_to),
+            )
+        )
+    ).scalar_one()
+
+    song_votes = func.sum(AnalyticsEventSong.votes).label("votes")
+    top = await db.execute(
+        select(
+            AnalyticsEventSong.song_key,
+            func.min(AnalyticsEventSong.title).label("title"),
+            func.min(AnalyticsEventSong.artist).label("artist"),
+            func.min(AnalyticsEventSong.cover_url).label("cover_url"),
+            func.min(AnalyticsEventSong.source).label("source"),
+            func.min(AnalyticsEventSong.source_id).label("source_id"),
+            song_votes,
+            func.sum(AnalyticsEventSong.wins).label("wins"),
+            func.count().label("events"),
+        )
+        .where(AnalyticsEventSong.club_id == club.id, AnalyticsEventSong.day.between(date_from, date_to))
+        .group_by(AnalyticsEventSong.song_key)
+        .order_by(song_votes.desc(), AnalyticsEventSong.song_key)
+        .limit(limit)
+    )
+
+    event_votes = func.sum(AnalyticsRound.votes).label("votes")
+    top_events = await db.execute(
+        select(AnalyticsRound.event_id, Event.title, event_votes, func.count().label("rounds"))
+        .join(Event, Event.id == AnalyticsRound.event_id)
+        .where(*rounds_in)
+        .group_by(AnalyticsRound.event_id, Event.title)
+        .order_by(event_votes.desc(), AnalyticsRound.event_id)
+        .limit(limit)
+    )
 
-    return {"status": "success"}
\ No newline at end of file
+    return _json(dumps({
+        "date_from": date_from,
+        "date_to": date_to,
+        "total_events": total_events,
+        "total_rounds": sum(d[2] for d in days),
+        "total_votes": sum(int(d[3] or 0) for d in days),
+        "total_suggestions": sum(int(d[4] or 0) for d in days),
+        "unique_voters": voters,
+        "peak_attendees": max((int(d[5] or 0) for d in days), default=0),
+        "days": [
+            {"day": d, "events": ev, "rounds": r, "votes": int(v or 0), "suggestions": int(sg or 0)}
+            for d, ev, r, v, sg, _ in days
+        ],
+        "top_tracks": [{**_track_row(row), "events": row.events} for row in top.all()],
+        "top_events": [
+            {"event_id": eid, "title": title, "votes": int(v or 0), "rounds": r}
+            for eid, title, v, r in top_events.all()
+        ],
+    }))
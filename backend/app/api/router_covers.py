@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.services.cover_proxy import CACHE_CONTROL, SIZES, CoverError, allowed, get_cover, verify_token
+
+router = APIRouter(prefix="/api/v1/covers", tags=["covers"])
+
+
+@router.get("/{size}/{token}")
+async def cover(request: Request, size: int, token: str):
+    if size not in SIZES:
+        raise HTTPException(status_code=404, detail="Unknown size")
+    url = verify_token(token)
+    # allowed() — ще й для токенів, підписаних до появи COVER_HOSTS
+    if not url or not allowed(url):
+        raise HTTPException(status_code=404, detail="Bad cover token")
+
+    accept_webp = "image/webp" in request.headers.get("accept", "")
+    try:
+        path, media_type = await get_cover(url, size, accept_webp)
+    except CoverError:
+        # без редіректу на оригінал: фронт покаже заглушку; ненадовго, щоб спробувати знову
+        raise HTTPException(status_code=404, detail="Cover unavailable", headers={"Cache-Control": "public, max-age=60"})
+
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={"Cache-Control": CACHE_CONTROL, "Vary": "Accept"},
+    )
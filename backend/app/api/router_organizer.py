@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -94,6 +96,7 @@ async def get_current_round(event_id: int,
 
 @router.post("/events/{event_id}/rounds/end")
 async def end_round(event_id: int,
+                    round_id: Optional[int] = None,
                     org: Organisator = Depends(require_organizer),
                     db: AsyncSession = Depends(get_async_session)):
-    return await end_round_and_start_next(db, event_id)
+    return await end_round_and_start_next(db, event_id, round_id)
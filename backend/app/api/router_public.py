@@ -1,53 +1,151 @@
-from fastapi import APIRouter, Depends, Header
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.session import get_async_session
 from app.core.security import verify_telegram_init_data, verify_event_token
-from app.crud.vote_crud import get_or_create_user, event_state, vote_for_song
+from app.crud.event_crud import max_suggestions_per_user
+from app.crud.user_crud import resolve_user_id
+from app.crud.vote_crud import event_state, remove_vote, switch_vote, vote_for_song
 from app.crud.song_crud import add_song_to_current_round
-# (опційно) rate limit / idempotency
-# from app.utils.ratelimit import rate_limit, ensure_idempotent
+from app.schemas.schemas import SongCreate, StateResponse
+from app.services.event_runtime import DEFAULT_MAX_SUGGESTIONS, release_suggestion, reserve_suggestion
+from app.utils.ratelimit import (
+    RateLimit,
+    ensure_idempotent,
+    forget_idempotent,
+    idempotency_key,
+    remember_idempotent,
+)
 
 router = APIRouter(prefix="/api/v1/public", tags=["public"])
 
+# user-кошик — за id з перевіреного initData (не за заголовком), event — за event_id з токена;
+# квоти ті самі, що на runtime-роуті черги, IP щедрий (пів залу за одним NAT)
+suggest_limit = RateLimit("public_suggest", user=(5, 60), ip=(60, 60), event=(300, 60))
+vote_limit = RateLimit("vote", user=(10, 30), ip=(300, 30))
+
 
-@router.get("/event/{event_token}/state")
+@router.get("/event/{event_token}/state", response_model=StateResponse)
 async def get_state(
         event_token: str,
         init_data: str = Header(..., alias="X-Telegram-InitData"),
         db: AsyncSession = Depends(get_async_session),
 ):
     user_info = verify_telegram_init_data(init_data)     # -> dict with id
-    user = await get_or_create_user(db, user_info["id"])
+    user_id = await resolve_user_id(db, user_info["id"])
     event_id = verify_event_token(event_token)
-    return await event_state(db, event_id, user)
+    return Response(content=await event_state(db, event_id, user_id), media_type="application/json")
 
 
 @router.post("/event/{event_token}/songs")
 async def suggest_song(
         event_token: str,
         payload: dict,
+        request: Request,
         init_data: str = Header(..., alias="X-Telegram-InitData"),
+        idem_header: Optional[str] = Header(default=None, alias="Idempotency-Key"),
         db: AsyncSession = Depends(get_async_session),
 ):
-    verify_telegram_init_data(init_data)
+    """
+    Ліміти як у POST /events/{slug}/queue: кошики користувач / IP / івент (429 + Retry-After)
+    і ClubSettings.max_suggestions_per_user на івент — спільна з чергою квота. Повтор з тим
+    самим Idempotency-Key повертає першу відповідь і не з'їдає квоту.
+    """
+    user_info = verify_telegram_init_data(init_data)
     event_id = verify_event_token(event_token)
-    name = (payload.get("name") or "").strip()
-    # await rate_limit(f"rl:suggest:{event_id}", 30, 60)   # опц. глобальний RL
-    return await add_song_to_current_round(db, event_id, payload={"name": name})
+    tg_id = user_info["id"]
+    song = SongCreate(
+        name=(payload.get("name") or "").strip(),
+        artist=payload.get("artist"),
+        track_id=payload.get("track_id"),
+        cover_url=payload.get("cover_url"),
+    )
+    await suggest_limit.check(request, user=tg_id, event=event_id)
+
+    idem = idempotency_key("public_suggest", idem_header, event_id, tg_id)
+    if idem:
+        previous = await ensure_idempotent(idem)
+        if previous is not None:
+            return previous
+
+    reserved = False
+    try:
+        max_per_user = await max_suggestions_per_user(db, event_id) or DEFAULT_MAX_SUGGESTIONS
+        if await reserve_suggestion(event_id, tg_id, max_per_user) is None:
+            raise HTTPException(status_code=429, detail="Suggestion limit reached")
+        reserved = True
+        # user_id — на випадок, коли повторна пропозиція зараховується як голос
+        user_id = await resolve_user_id(db, tg_id)
+        result = await add_song_to_current_round(db, event_id, song, user_id=user_id)
+    except Exception:
+        if reserved:
+            await release_suggestion(event_id, tg_id)
+        if idem:
+            await forget_idempotent(idem)
+        raise
+
+    if not result.created:
+        # пісня вже була в раунді — це голос, а не нова пропозиція
+        await release_suggestion(event_id, tg_id)
+    if idem:
+        await remember_idempotent(idem, result.model_dump(mode="json"))
+    return result
 
 
 @router.post("/event/{event_token}/vote")
 async def vote(
         event_token: str,
         payload: dict,
+        request: Request,
+        init_data: str = Header(..., alias="X-Telegram-InitData"),
+        db: AsyncSession = Depends(get_async_session),
+):
+    user_info = verify_telegram_init_data(init_data)
+    user_id = await resolve_user_id(db, user_info["id"])
+    verify_event_token(event_token)
+    song_id = int(payload.get("song_id"))
+    await vote_limit.check(request, user=user_id)
+    # подвійний тап: повтор того самого голосу протягом 5 с -> 409
+    idem = f"idem:vote:{user_id}:{song_id}"
+    await ensure_idempotent(idem, 5)
+    try:
+        return await vote_for_song(db, user_id, song_id)
+    except Exception:
+        # повтор після помилки — не 409 "Duplicate request"
+        await forget_idempotent(idem)
+        raise
+
+
+@router.post("/event/{event_token}/vote/switch")
+async def switch(
+        event_token: str,
+        payload: dict,
+        request: Request,
         init_data: str = Header(..., alias="X-Telegram-InitData"),
         db: AsyncSession = Depends(get_async_session),
 ):
+    """Перенести свій голос у поточному раунді на іншу пісню."""
     user_info = verify_telegram_init_data(init_data)
-    user = await get_or_create_user(db, user_info["id"])
+    user_id = await resolve_user_id(db, user_info["id"])
     verify_event_token(event_token)
     song_id = int(payload.get("song_id"))
-    # await rate_limit(f"rl:vote:{user.id}", 10, 30)
-    # await ensure_idempotent(f"idem:vote:{user.id}:{song_id}", 5)
-    return await vote_for_song(db, user, song_id)
+    await vote_limit.check(request, user=user_id)
+    return await switch_vote(db, user_id, song_id)
+
+
+@router.delete("/event/{event_token}/vote/{song_id}")
+async def unvote(
+        event_token: str,
+        song_id: int,
+        request: Request,
+        init_data: str = Header(..., alias="X-Telegram-InitData"),
+        db: AsyncSession = Depends(get_async_session),
+):
+    """Зняти свій голос за пісню поточного раунду."""
+    user_info = verify_telegram_init_data(init_data)
+    user_id = await resolve_user_id(db, user_info["id"])
+    verify_event_token(event_token)
+    await vote_limit.check(request, user=user_id)
+    return await remove_vote(db, user_id, song_id)
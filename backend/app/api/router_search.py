@@ -1,9 +1,87 @@
-from fastapi import APIRouter, Request
-from app.services.music_search import unified_search
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Request, Response
+from fastapi.responses import StreamingResponse
+from app.crud.event_crud import get_club_event
+from app.models.session import async_session
+from app.services import event_cache, track_popularity
+from app.services.fastjson import EncodedBody, dumps, negotiate
+from app.services.music_search import search_encoded, unified_search_stream
+from app.services.search_warmup import opening_stats, track_search
+from app.services.provider_health import get_health
+from app.services.search_providers import active_providers
 
 router = APIRouter(prefix="/api/v1/search",tags=["search"])
 
 @router.get("/")
-async def search(request: Request, q: str, limit: int = 15):
+async def search(
+        request: Request,
+        background: BackgroundTasks,
+        q: str,
+        limit: int = 15,
+        club: Optional[str] = None,
+        boost: bool = False,
+):
+    """
+    club — додає popularity (історія треку в цьому клубі) до відомих клубу треків;
+    boost=true — ще й піднімає їх у видачі. Без club — готові байти з кешу як є.
+    """
+    lang = request.headers.get("Accept-Language")
+    encoded, outcome = await search_encoded(q=q, limit=limit, lang=lang)
+    if club:
+        encoded = await _with_popularity(club, encoded, boost)
+    content, encoding = encoded.body(negotiate(request.headers.get("Accept-Encoding")))
+
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if club:
+        # історія для прогріву + облік холодних промахів — вже після відповіді
+        background.add_task(track_search, club, q, lang, outcome)
+    # готові байти з кешу, без jsonable_encoder/JSONResponse
+    return Response(content=content, media_type="application/json", headers=headers, background=background)
+
+async def _with_popularity(club: str, encoded: EncodedBody, boost: bool) -> EncodedBody:
+    items = encoded.payload.get("items") or []
+    if not items:
+        return encoded
+    # клуб — з event_cache (L1/Redis); сесія БД лише на його промаху, не на кожен пошук
+    cached, _ = await event_cache.lookup(club)
+    if cached is None:
+        async with async_session() as db:
+            cached = await get_club_event(db, club)
+    if cached["club"] is None:
+        return encoded
+    stats = await track_popularity.lookup(cached["club"]["id"], [i.get("id") for i in items])
+    if not stats:
+        return encoded
+    if boost:
+        items = track_popularity.boost(items, stats)
+    return EncodedBody({**encoded.payload, "items": track_popularity.annotate(items, stats)})
+
+@router.get("/stream")
+async def search_stream(request: Request, q: str, limit: int = 15):
+    """
+    Server-Sent Events: event "items" на кожну порцію результатів, потім "done".
+    """
     lang = request.headers.get("Accept-Language")
-    return await unified_search(q=q, limit=limit, lang=lang)
+
+    async def frames():
+        async for frame in unified_search_stream(q=q, limit=limit, lang=lang):
+            yield f"event: {frame['type']}\ndata: {dumps(frame).decode()}\n\n"
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/providers")
+async def providers_health():
+    return {name: get_health(name).snapshot() for name in active_providers()}
+
+
+@router.get("/warmup/{event_id}")
+async def warmup_stats(event_id: int):
+    """Скільки запитів прогріли і яка частка пошуків у перші 15 хв івенту була холодною."""
+    return await opening_stats(event_id)
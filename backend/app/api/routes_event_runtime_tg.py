@@ -1,23 +1,40 @@
 from __future__ import annotations
 
+import logging
 from typing import Optional
 from sqlalchemy import select, func
 from sqlalchemy import desc
-from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.models import ClubSettings,Club
-from app.crud.event_crud import get_latest_event_by_club_slug
+from app.crud.event_crud import get_club_event, get_latest_event_by_club_slug
 from app.models.session import get_async_session
 from app.services.event_runtime import (
+    DEFAULT_MAX_SUGGESTIONS,
     Track,
     enqueue_track,
-    get_attendees_count,
-    get_queue_snapshot,
+    get_bootstrap_state,
+    get_queue_state,
     register_attendee,
+    release_suggestion,
+    reserve_suggestion,
+)
+from app.services import track_popularity
+from app.services.fastjson import dumps, etag_matches
+from app.services.event_cache import summary_body
+from app.services.poll_hint import hint_headers, observe
+from app.services.search_warmup import record_suggestion
+from app.utils.ratelimit import (
+    RateLimit,
+    client_ip,
+    ensure_idempotent,
+    forget_idempotent,
+    idempotency_key,
+    remember_idempotent,
 )
 
 router = APIRouter(prefix="/api/v1/events", tags=["event-runtime"])
+log = logging.getLogger("event_runtime")
 
 
 class QueueAddIn(BaseModel):
@@ -36,105 +53,165 @@ async def resolve_event_id(club_slug: str, db: AsyncSession) -> int:
     return event.id
 
 
+SUMMARY_CACHE_CONTROL = "public, max-age=5, stale-while-revalidate=30"
+
+# IP щедрий: у клубі пів залу сидить на одному Wi-Fi за NAT
+suggest_limit = RateLimit("suggest", user=(5, 60), ip=(60, 60), event=(300, 60))
+
+
 @router.get("/{club_slug}")
 async def get_event_summary(
         club_slug: str,
-        tg_id: Optional[int] = Header(default=None, alias="X-Telegram-User-Id"),
+        request: Request,
         db: AsyncSession = Depends(get_async_session),
 ):
-    event = await get_latest_event_by_club_slug(db, club_slug)
-    if not event:
+    """
+    Однаковий для всіх глядачів, тож віддаємо готові байти з ETag — може кешувати і reverse proxy.
+    Відвідувача реєструє /queue (фронт тягне його паралельно), звідти ж і attendees_count.
+    """
+    cached = await get_club_event(db, club_slug)
+    if cached["club"] is None:
+        raise HTTPException(status_code=404, detail="Club not found")
+    if cached["event"] is None:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    club = (
-        await db.execute(
-            select(Club).where(Club.id == event.club_id)
-        )
-    ).scalar_one_or_none()
-
-    settings = None
-    if club:
-        settings = (
-            await db.execute(
-                select(ClubSettings).where(ClubSettings.club_id == club.id)
-            )
-        ).scalar_one_or_none()
-
-    if tg_id:
-        attendees_count = await register_attendee(event.id, tg_id)
-    else:
-        attendees_count = await get_attendees_count(event.id)
-
-    return {
-        "id": event.id,
-        "club_id": event.club_id,
-        "title": event.title,
-        "preview": event.preview,
-        "start_date": event.start_date,
-        "end_date": event.end_date,
-        "created_at": getattr(event, "created_at", None),
-        "slug": club_slug,
-        "attendees_count": attendees_count,
-        "background_image_url": (
-                getattr(event, "background_image_url", None)
-                or (settings.background_image_url if settings else None)
-        ),
-        "club": {
-            "id": club.id,
-            "name": club.name,
-            "slug": club.slug,
-        } if club else None,
-    }
+    body, etag = summary_body(club_slug, cached)
+    headers = {"ETag": etag, "Cache-Control": SUMMARY_CACHE_CONTROL, **hint_headers(cached["event"]["id"])}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/{club_slug}/queue")
 async def get_queue(
         club_slug: str,
         limit: int = Query(default=20, ge=1, le=200),
+        since: Optional[int] = Query(default=None, ge=0),
         tg_id: Optional[int] = Header(default=None, alias="X-Telegram-User-Id"),
         db: AsyncSession = Depends(get_async_session),
 ):
-    event_id = await resolve_event_id(club_slug, db)
-
-    if tg_id:
-        await register_attendee(event_id, tg_id)
+    """
+    X-Poll-Interval — коли приходити знову (poll_hint: темп змін черги + навантаження воркера).
+    ?since=<version> (з попередньої відповіді, bootstrap seq чи WS) — лише зміни після неї:
+    items = додані/змінені треки, removed = прибрані. Якщо версія вже випала з логу — повний
+    snapshot з full=true. Без since — як раніше, повний snapshot.
+    """
+    event = await get_latest_event_by_club_slug(db, club_slug)
+    event_id = event.id
 
-    items = await get_queue_snapshot(event_id, limit=limit)
-    attendees_count = await get_attendees_count(event_id)
+    # реєстрація + snapshot/дельта + лічильник — один round trip
+    state = await get_queue_state(event_id, tg_id, limit=limit, since=since)
+    observe(event_id, state["version"])
+    if state["items"]:
+        # історія треку в клубі — один запит по PK на всю сторінку (і той лише на промаху кешу)
+        stats = await track_popularity.lookup(event.club_id, [i["track_id"] for i in state["items"]])
+        state["items"] = track_popularity.annotate(state["items"], stats, id_field="track_id")
+    # лише str/int/None — jsonable_encoder тут зайвий
+    return Response(content=dumps(state), media_type="application/json", headers=hint_headers(event_id))
 
-    return {
-        "items": items,
-        "attendees_count": attendees_count,
-    }
 
+@router.get("/{club_slug}/bootstrap")
+async def get_bootstrap(
+        club_slug: str,
+        limit: int = Query(default=20, ge=1, le=200),
+        tg_id: Optional[int] = Header(default=None, alias="X-Telegram-User-Id"),
+        db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Summary + черга + кількість відвідувачів + seq стріму одним запитом замість двох.
+    Івент резолвиться з кешу (в Postgres лише на промаху), весь Redis — один скрипт.
+    seq — номер останнього повідомлення в WS-стрімі на момент snapshot.
+    """
+    cached = await get_club_event(db, club_slug)
+    if cached["club"] is None:
+        raise HTTPException(status_code=404, detail="Club not found")
+    if cached["event"] is None:
+        raise HTTPException(status_code=404, detail="Event not found")
 
-@router.post("/{club_slug}/queue")
+    summary, _ = summary_body(club_slug, cached)
+    items, attendees_count, seq = await get_bootstrap_state(cached["event"]["id"], tg_id, limit=limit)
+    if items:
+        # popularity — як у /queue, щоб перший екран не відрізнявся від наступних оновлень
+        stats = await track_popularity.lookup(cached["club"]["id"], [i["track_id"] for i in items])
+        items = track_popularity.annotate(items, stats, id_field="track_id")
+
+    # summary вже закодований — вклеюємо байти, а не енкодимо заново
+    body = b"".join((
+        b'{"event":', summary,
+        b',"items":', dumps(items),
+        b',"attendees_count":', str(attendees_count).encode(),
+        b',"seq":', str(seq).encode(),
+        b"}",
+    ))
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+
+
+@router.post("/{club_slug}/queue", dependencies=[Depends(suggest_limit)])
 async def add_to_queue(
         club_slug: str,
         payload: QueueAddIn,
+        request: Request,
         tg_id: Optional[int] = Header(default=None, alias="X-Telegram-User-Id"),
+        idem_header: Optional[str] = Header(default=None, alias="Idempotency-Key"),
         db: AsyncSession = Depends(get_async_session),
 ):
-    event_id = await resolve_event_id(club_slug, db)
+    """
+    Ліміти: RateLimit (користувач / IP / івент, 429 + Retry-After) і квота
+    ClubSettings.max_suggestions_per_user на івент (429 без Retry-After — до кінця івенту).
+    Повтор з тим самим Idempotency-Key повертає першу відповідь і не з'їдає квоту.
+    """
+    cached = await get_club_event(db, club_slug)
+    if cached["club"] is None:
+        raise HTTPException(status_code=404, detail="Club not found")
+    if cached["event"] is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    event_id = cached["event"]["id"]
 
     effective_tg_id = tg_id or payload.telegram_id
 
-    if effective_tg_id:
-        await register_attendee(event_id, effective_tg_id)
-
-    track = Track(
-        track_id=payload.track_id,
-        title=payload.title,
-        artist=payload.artist,
-        cover_url=payload.cover_url,
-        duration_sec=payload.duration_sec,
-        suggested_by=effective_tg_id,
-    )
-
-    await enqueue_track(event_id, track)
+    idem = idempotency_key("suggest", idem_header, event_id, effective_tg_id or client_ip(request))
+    if idem:
+        previous = await ensure_idempotent(idem)
+        if previous is not None:
+            return previous
+
+    reserved = False
+    try:
+        if effective_tg_id:
+            max_per_user = (cached["settings"] or {}).get("max_suggestions_per_user") or DEFAULT_MAX_SUGGESTIONS
+            if await reserve_suggestion(event_id, effective_tg_id, max_per_user) is None:
+                raise HTTPException(status_code=429, detail="Suggestion limit reached")
+            reserved = True
+            await register_attendee(event_id, effective_tg_id)
+
+        track = Track(
+            track_id=payload.track_id,
+            title=payload.title,
+            artist=payload.artist,
+            cover_url=payload.cover_url,
+            duration_sec=payload.duration_sec,
+            suggested_by=effective_tg_id,
+        )
 
-    return {
+        await enqueue_track(event_id, track)
+    except Exception:
+        if reserved:
+            await release_suggestion(event_id, effective_tg_id)
+        if idem:
+            await forget_idempotent(idem)
+        raise
+
+    try:
+        # трек уже в черзі — статистика для прогріву пошуку не повинна перетворити успіх на 500
+        await record_suggestion(club_slug, payload.title)
+    except Exception:
+        log.warning("record_suggestion failed for %s", club_slug, exc_info=True)
+
+    result = {
         "status": "success",
         "event_id": event_id,
         "track_id": payload.track_id,
-    }
\ No newline at end of file
+    }
+    if idem:
+        await remember_idempotent(idem, result)
+    return result
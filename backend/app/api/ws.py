@@ -42,20 +42,21 @@ async def ws_event(websocket: WebSocket, club_slug: str):
     q = None
 
     try:
+        # сесію закриваємо одразу: вона не повинна тримати конект з пулу весь час життя сокета
         async with async_session_maker() as db:
             event_id = await _resolve_event_id_by_club_slug(db, club_slug)
 
-            if not event_id:
-                await websocket.send_text(json.dumps({"type": "error", "detail": "Event not found"}, ensure_ascii=False))
-                await websocket.close(code=4404)
-                return
+        if not event_id:
+            await websocket.send_text(json.dumps({"type": "error", "detail": "Event not found"}, ensure_ascii=False))
+            await websocket.close(code=4404)
+            return
 
-            topic = f"event:{event_id}"
-            q = await bus.subscribe(topic)
+        topic = f"event:{event_id}"
+        q = await bus.subscribe(topic)
 
-            while True:
-                payload = await q.get()
-                await websocket.send_text(json.dumps(payload, ensure_ascii=False))
+        while True:
+            payload = await q.get()
+            await websocket.send_text(json.dumps(payload, ensure_ascii=False))
 
     except WebSocketDisconnect:
         pass
@@ -1,11 +1,12 @@
 from typing import List, Optional
 
 from fastapi import HTTPException, status
-from sqlalchemy import select, func
+from sqlalchemy import select, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import desc
-from app.models.models import Event, Round,Club
+from app.models.models import Event, Round, Club, ClubSettings
 from app.schemas.schemas import EventCreate, EventUpdate, EventResponse, RoundResponse,PublicEventResponse
+from app.services import event_cache, round_state, vote_ingest
 from app.services.live_bus import publish_event
 from watchfiles import awatch
 
@@ -25,35 +26,54 @@ async def list_events(db: AsyncSession) -> List[EventResponse]:
 
 
 async def get_latest_event_by_club_slug(db: AsyncSession, club_slug: str) -> EventResponse:
-    print(f"Starting to get_latest_event_by_club_slug with:({club_slug}) !!!")
-    club = (await db.execute(select(Club).where(Club.slug == club_slug))).scalar_one_or_none()
-    if not club:
+    cached = await get_club_event(db, club_slug)
+    if cached["club"] is None:
         raise HTTPException(404, "Club not found")
-    ev = (await db.execute(
-        select(Event)
-        .where(Event.club_id == club.id)
+    if cached["event"] is None:
+        raise HTTPException(404, "Event not found")
+    return EventResponse.model_validate(cached["event"])
+
+
+async def get_club_event(db: AsyncSession, club_slug: str) -> dict:
+    """
+    {"club": {...} | None, "event": {...} | None, "settings": {...} | None} —
+    клуб, його останній івент і публічні налаштування клубу.
+    З кешу (event_cache); в БД — один join і лише на промаху.
+    """
+    cached, gen = await event_cache.lookup(club_slug)
+    if cached is not None:
+        return cached
+
+    row = (await db.execute(
+        select(Club, Event, ClubSettings)
+        .outerjoin(Event, Event.club_id == Club.id)
+        .outerjoin(ClubSettings, ClubSettings.club_id == Club.id)
+        .where(Club.slug == club_slug)
         .order_by(desc(Event.created_at), desc(Event.id))
         .limit(1)
-    )).scalar_one_or_none()
+    )).first()
 
-    if not ev:
-        raise HTTPException(404, "Event not found")
-    return to_event(ev)
+    cached = event_cache.entry(*row) if row else event_cache.entry(None, None)
+    await event_cache.store(club_slug, cached, gen)
+    return cached
+
+
+async def max_suggestions_per_user(db: AsyncSession, event_id: int) -> Optional[int]:
+    """ClubSettings.max_suggestions_per_user клубу івенту; None — налаштувань ще нема."""
+    return (await db.execute(
+        select(ClubSettings.max_suggestions_per_user)
+        .join(Event, Event.club_id == ClubSettings.club_id)
+        .where(Event.id == event_id)
+    )).scalar_one_or_none()
 
 
 async def create_event(db: AsyncSession, payload: EventCreate) -> EventResponse:
     e = Event(**payload.model_dump(exclude_unset=True))
     db.add(e)
-    await db.commit()
-    await db.refresh(e)
-
-    # перший раунд
-    r = Round(event_id=e.id, number=1)
-    db.add(r)
-    await db.commit()
-    await db.refresh(r)
+    await db.flush()
 
-    e.current_round_id = r.id
+    # перший раунд — він і поточний (open_round), в одній транзакції з подією
+    db.add(Round(event_id=e.id, number=1))
     await db.commit()
     await db.refresh(e)
     return to_event(e)
@@ -84,53 +104,136 @@ async def delete_event(db: AsyncSession, event_id: int) -> None:
 
 # ---- Раунд-менеджмент для організатора ----
 
-async def current_round(db: AsyncSession, event_id: int) -> RoundResponse:
-    ev = (await db.execute(select(Event).where(Event.id == event_id))).scalar_one_or_none()
-    if not ev or not ev.current_round_id:
-        raise HTTPException(404, "Event or round not found")
-    r = (await db.execute(select(Round).where(Round.id == ev.current_round_id))).scalar_one()
-    return RoundResponse.model_validate(r, from_attributes=True)
+# Поточний раунд — відкритий (ended_at IS NULL) з найбільшим номером.
+ROUND_LOCK_NS = 0x524E          # перший ключ pg_advisory_xact_lock(ns, event_id) для ротації раундів
+
+# Ротація одним стейтментом: advisory lock на івент, FOR UPDATE поточного раунду, переможець
+# з ix_song_round_votes (songs.vote_count, при рівних — раніше запропонована), закриття й
+# новий раунд. Паралельний виклик чекає на lock/рядок, після commit переможця EPQ-перевірка
+# ended_at IS NULL відкидає вже закритий раунд — і стейтмент не повертає нічого.
+# У buffered-режимі частина голосів ще в Redis (vote_ingest): лічильники раунду передаються
+# масивами, і переможець рахується з них так само, як стан раунду (round_state.with_counts).
+# Кінець івенту (end_last_round) — те саме закриття, але без наступного раунду.
+_WIN_SQL = """
+win AS (
+    SELECT s.id
+    FROM songs s, cur
+    WHERE s.round_id = cur.id
+    ORDER BY s.vote_count DESC, s.id ASC
+    LIMIT 1
+),"""
+
+_WIN_BUFFERED_SQL = """
+buf AS (
+    SELECT * FROM unnest(CAST(:buf_song_ids AS INTEGER[]), CAST(:buf_votes AS INTEGER[])) AS b(song_id, votes)
+),
+win AS (
+    SELECT s.id
+    FROM songs s
+    JOIN cur ON s.round_id = cur.id
+    LEFT JOIN buf ON buf.song_id = s.id
+    -- лічильник буфера актуальніший за songs.vote_count в обидва боки (switch/unvote зменшують)
+    ORDER BY coalesce(buf.votes, s.vote_count) DESC, s.id ASC
+    LIMIT 1
+),"""
+
+_CLOSE_TEMPLATE = """
+WITH lk AS (
+    SELECT pg_advisory_xact_lock(:ns, :event_id)
+),
+cur AS (
+    SELECT r.id, r.number
+    FROM rounds r, lk
+    WHERE r.event_id = :event_id
+      AND r.ended_at IS NULL
+      AND (CAST(:round_id AS INTEGER) IS NULL OR r.id = :round_id)
+    ORDER BY r.number DESC
+    LIMIT 1
+    FOR UPDATE OF r
+),{win}
+closed AS (
+    UPDATE rounds
+    SET ended_at = now(), winner_song_id = (SELECT id FROM win)
+    FROM cur
+    WHERE rounds.id = cur.id
+    RETURNING rounds.id, rounds.number, rounds.winner_song_id
+)"""
+
+_ROTATE_TEMPLATE = _CLOSE_TEMPLATE + """,
+nxt AS (
+    INSERT INTO rounds (event_id, number)
+    SELECT :event_id, closed.number + 1 FROM closed
+    RETURNING id, number
+)
+SELECT closed.id AS ended_round_id, closed.winner_song_id, nxt.id AS new_round_id, nxt.number AS new_round_number
+FROM closed, nxt
+"""
+
+_FINISH_TEMPLATE = _CLOSE_TEMPLATE + """
+SELECT closed.id AS ended_round_id, closed.winner_song_id FROM closed
+"""
+
+_ROTATE_SQL = text(_ROTATE_TEMPLATE.format(win=_WIN_SQL))
+_ROTATE_BUFFERED_SQL = text(_ROTATE_TEMPLATE.format(win=_WIN_BUFFERED_SQL))
+_FINISH_SQL = text(_FINISH_TEMPLATE.format(win=_WIN_SQL))
+_FINISH_BUFFERED_SQL = text(_FINISH_TEMPLATE.format(win=_WIN_BUFFERED_SQL))
+
+
+async def open_round(db: AsyncSession, event_id: int) -> Optional[Round]:
+    return (await db.execute(
+        select(Round)
+        .where(Round.event_id == event_id, Round.ended_at.is_(None))
+        .order_by(Round.number.desc())
+        .limit(1)
+    )).scalar_one_or_none()
 
 
-async def end_round_and_start_next(db: AsyncSession, event_id: int) -> dict:
-    ev = (await db.execute(select(Event).where(Event.id == event_id))).scalar_one_or_none()
-    if not ev or not ev.current_round_id:
+async def current_round(db: AsyncSession, event_id: int) -> RoundResponse:
+    r = await open_round(db, event_id)
+    if not r:
         raise HTTPException(404, "Event or round not found")
+    return RoundResponse.model_validate(r, from_attributes=True)
 
-    cur = (await db.execute(select(Round).where(Round.id == ev.current_round_id))).scalar_one()
-
-    # визначаємо переможця по кількості голосів
-    from app.models.models import Song, Vote
-    res = await db.execute(
-        select(Song.id, func.count(Vote.id).label("v"))
-        .join(Vote, Vote.song_id == Song.id, isouter=True)
-        .where(Song.round_id == cur.id)
-        .group_by(Song.id)
-        .order_by(func.count(Vote.id).desc())
-        .limit(1)
-    )
-    row = res.first()
-    cur.winner_song_id = row[0] if row else None
-    cur.ended_at = func.now()
-    await db.commit()
-    await db.refresh(cur)
 
-    # стартуємо новий раунд
-    nxt = Round(event_id=event_id, number=cur.number + 1)
-    db.add(nxt)
+async def end_round_and_start_next(db: AsyncSession, event_id: int, round_id: Optional[int] = None) -> dict:
+    """
+    Закриває поточний раунд і відкриває наступний в одній транзакції (стейтмент + commit).
+    round_id — раунд, який бачив організатор: повторний клік по вже закритому -> 409,
+    а не закриття наступного.
+    """
+    sql, params = await _close_params(db, event_id, round_id, _ROTATE_SQL, _ROTATE_BUFFERED_SQL)
+    row = (await db.execute(sql, params)).first()
+    if row is None:
+        await db.rollback()
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Round already ended or no active round")
     await db.commit()
-    await db.refresh(nxt)
 
-    ev.current_round_id = nxt.id
-    await db.commit()
-    await db.refresh(ev)
-
-    payload = {
-        "type": "round_ended",
-        "winner_song_id": cur.winner_song_id,
-        "ended_round_id": cur.id,
-        "new_round_id": nxt.id,
-        "new_round_number": nxt.number,
-    }
+    # лише після commit: підписники не побачать раунд, якого ще нема в БД
+    payload = {"type": "round_ended", **row._asdict()}
+    await round_state.invalidate(event_id)
     await publish_event(event_id, payload)
     return payload
+
+
+async def end_last_round(db: AsyncSession, event_id: int) -> Optional[dict]:
+    """
+    Закриває відкритий раунд без наступного — кінець івенту. Без commit: caller комітить разом
+    з events.end_date, після commit — round_state.invalidate і подія. None — відкритого раунду нема.
+    """
+    sql, params = await _close_params(db, event_id, None, _FINISH_SQL, _FINISH_BUFFERED_SQL)
+    row = (await db.execute(sql, params)).first()
+    return row._asdict() if row else None
+
+
+async def _close_params(db: AsyncSession, event_id: int, round_id: Optional[int], plain, buffered):
+    params = {"ns": ROUND_LOCK_NS, "event_id": event_id, "round_id": round_id}
+    if not vote_ingest.buffered():
+        return plain, params
+    # голоси, які флашер ще не дописав у songs.vote_count, теж рахуються для переможця
+    rid = round_id
+    if rid is None:
+        r = await open_round(db, event_id)
+        rid = r.id if r else None
+    counts = await vote_ingest.round_counts(rid) if rid is not None else {}
+    params.update(buf_song_ids=list(counts), buf_votes=list(counts.values()))
+    return buffered, params
@@ -1,9 +1,10 @@
 from typing import List
-from fastapi import HTTPException
+from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.models import Round, Event
+from app.crud.event_crud import open_round
+from app.models.models import Round
 from app.schemas.schemas import RoundResponse
 
 
@@ -25,14 +26,13 @@ async def get_round(db: AsyncSession, round_id: int) -> RoundResponse:
 
 
 async def set_current_round(db: AsyncSession, event_id: int, round_id: int) -> RoundResponse:
-    ev = (await db.execute(select(Event).where(Event.id == event_id))).scalar_one_or_none()
-    if not ev:
-        raise HTTPException(404, "Event not found")
-
+    # поточний раунд не зберігається окремо — це відкритий раунд з найбільшим номером (open_round),
+    # тож "зробити поточним" можна лише той, що вже ним є; перемикає раунди end_round_and_start_next
     r = (await db.execute(select(Round).where(Round.id == round_id, Round.event_id == event_id))).scalar_one_or_none()
     if not r:
         raise HTTPException(404, "Round not found for event")
 
-    ev.current_round_id = r.id
-    await db.commit()
+    cur = await open_round(db, event_id)
+    if cur is None or cur.id != r.id:
+        raise HTTPException(status.HTTP_409_CONFLICT, "Round is not the open round of the event")
     return to_round(r)
@@ -1,10 +1,13 @@
-from typing import List
+from typing import List, Optional
 from fastapi import HTTPException, status
-from sqlalchemy import select, func
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.models import Event, Round, Song, Vote
-from app.schemas.schemas import SongCreate, SongResponse
+from app.crud.event_crud import open_round
+from app.crud.vote_crud import cast_vote
+from app.models.models import Round, Song
+from app.schemas.schemas import SongCreate, SongResponse, SongSuggestResponse
+from app.services import round_state
 from app.services.live_bus import publish_event
 
 
@@ -12,36 +15,82 @@ def to_song(id: int, name: str, round_id: int, votes: int) -> SongResponse:
     return SongResponse(id=id, name=name, round_id=round_id, votes=votes)
 
 
-async def add_song_to_current_round(db: AsyncSession, event_id: int, payload: SongCreate) -> SongResponse:
-    ev = (await db.execute(select(Event).where(Event.id == event_id))).scalar_one_or_none()
-    if not ev or not ev.current_round_id:
-        raise HTTPException(404, "Event not found or has no active round")
+# поточний раунд + upsert пісні одним стейтментом; конфлікт — не помилка, а наявна пісня.
+# DO UPDATE (а не DO NOTHING), щоб RETURNING віддав і наявний рядок; xmax = 0 — рядок щойно вставлено
+_SUGGEST_SQL = text("""
+WITH r AS (
+    SELECT r.id, coalesce(cs.duplicate_suggestion_votes, true) AS duplicate_votes
+    FROM rounds r
+    JOIN events e ON e.id = r.event_id
+    LEFT JOIN club_settings cs ON cs.club_id = e.club_id
+    WHERE r.event_id = :event_id AND r.ended_at IS NULL
+    ORDER BY r.number DESC
+    LIMIT 1
+),
+up AS (
+    INSERT INTO songs (round_id, title, artist, source, source_id, cover_url)
+    SELECT r.id, :title, :artist, :source, :source_id, :cover_url FROM r
+    ON CONFLICT ON CONSTRAINT uq_song_round_title_artist DO UPDATE
+    SET source = coalesce(songs.source, EXCLUDED.source),
+        source_id = coalesce(songs.source_id, EXCLUDED.source_id),
+        cover_url = coalesce(songs.cover_url, EXCLUDED.cover_url)
+    RETURNING id, round_id, title, vote_count, (xmax = 0) AS created
+)
+SELECT up.id, up.round_id, up.title, up.vote_count, up.created, r.duplicate_votes
+FROM up, r
+""")
+
 
-    s = Song(name=payload.name.strip(), event_id=event_id, round_id=ev.current_round_id)
-    db.add(s)
-    try:
-        await db.commit()
-    except Exception as e:
+async def add_song_to_current_round(
+        db: AsyncSession, event_id: int, payload: SongCreate, user_id: Optional[int] = None,
+) -> SongSuggestResponse:
+    """
+    Пропозиція в поточний раунд. Якщо трек уже є — повертає його (created=False) і, коли клуб
+    дозволяє (duplicate_suggestion_votes) і відомий user_id, зараховує як голос цього користувача.
+    """
+    title = payload.name.strip()
+    if not title:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Song name is required")
+    source, sep, source_id = (payload.track_id or "").partition(":")
+    row = (await db.execute(_SUGGEST_SQL, {
+        "event_id": event_id,
+        "title": title,
+        "artist": (payload.artist or "").strip() or None,
+        "source": source if sep and source_id else None,
+        "source_id": source_id if sep and source else None,
+        "cover_url": payload.cover_url,
+    })).first()
+    if row is None:
         await db.rollback()
-        # імовірно зловили UniqueConstraint (однакова назва в раунді)
-        raise HTTPException(status.HTTP_409_CONFLICT, detail="Song already exists in current round") from e
-    await db.refresh(s)
+        raise HTTPException(404, "Event not found or has no active round")
+    await db.commit()
+
+    if row.created:
+        await round_state.invalidate(event_id)
+        await publish_event(event_id, {"type": "song_added", "song": {"id": row.id, "name": row.title, "round_id": row.round_id}})
+        return SongSuggestResponse(id=row.id, name=row.title, round_id=row.round_id, votes=0, created=True)
 
-    await publish_event(event_id, {"type": "song_added", "song": {"id": s.id, "name": s.name, "round_id": s.round_id}})
-    return to_song(s.id, s.name, s.round_id, votes=0)
+    votes, voted = row.vote_count, False
+    if row.duplicate_votes and user_id is not None:
+        try:
+            votes = (await cast_vote(db, user_id, row.id, row.round_id, event_id, row.vote_count))["votes"]
+            voted = True
+        except HTTPException as e:
+            if e.status_code != status.HTTP_409_CONFLICT:
+                raise
+            # уже голосував у цьому раунді — лишається просто наявна пісня
+    return SongSuggestResponse(id=row.id, name=row.title, round_id=row.round_id, votes=votes, created=False, voted=voted)
 
 
 async def list_songs_in_current_round(db: AsyncSession, event_id: int) -> List[SongResponse]:
-    ev = (await db.execute(select(Event).where(Event.id == event_id))).scalar_one_or_none()
-    if not ev or not ev.current_round_id:
+    r = await open_round(db, event_id)
+    if not r:
         raise HTTPException(404, "Event not found or has no active round")
 
     rows = await db.execute(
-        select(Song.id, Song.name, Song.round_id, func.count(Vote.id).label("votes"))
-        .join(Vote, Vote.song_id == Song.id, isouter=True)
-        .where(Song.round_id == ev.current_round_id)
-        .group_by(Song.id)
-        .order_by(func.count(Vote.id).desc(), Song.id.asc())
+        select(Song.id, Song.title, Song.round_id, Song.vote_count)
+        .where(Song.round_id == r.id)
+        .order_by(Song.vote_count.desc(), Song.id.asc())
     )
     return [to_song(i, n, rid, v) for i, n, rid, v in rows.all()]
 
@@ -50,5 +99,8 @@ async def delete_song(db: AsyncSession, song_id: int) -> None:
     s = (await db.execute(select(Song).where(Song.id == song_id))).scalar_one_or_none()
     if not s:
         raise HTTPException(404, "Song not found")
+    event_id = (await db.execute(select(Round.event_id).where(Round.id == s.round_id))).scalar_one_or_none()
     await db.delete(s)
     await db.commit()
+    if event_id is not None:
+        await round_state.invalidate(event_id)
@@ -1,10 +1,14 @@
+import os
+from collections import OrderedDict
 from typing import List, Optional
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
 from app.models.models import User
 from app.schemas.schemas import ConfigDict
+from app.services import metrics
 from pydantic import BaseModel
 
 
@@ -28,15 +32,51 @@ async def list_users(db: AsyncSession) -> List[UserResponse]:
     return [UserResponse.model_validate(u, from_attributes=True) for u in res.scalars().all()]
 
 
+# ---------- Resolve by telegram_id ----------
+# telegram_id -> users.id назавжди (користувачів не видаляємо), тож повторні запити того самого
+# користувача не йдуть у БД; LRU обмежує пам'ять воркера
+USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", "50000"))
+_user_ids: "OrderedDict[int, int]" = OrderedDict()
+
+metrics.describe("user_id_cache_total", "Пошук users.id за telegram_id (result=hit|miss)")
+
+
+def _upsert(telegram_id: int):
+    # DO UPDATE (а не DO NOTHING), щоб RETURNING віддав рядок і для наявного користувача;
+    # паралельні перші входи не ловлять unique violation
+    stmt = pg_insert(User).values(telegram_id=telegram_id)
+    return stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={"telegram_id": stmt.excluded.telegram_id},
+    ).returning(User.id, User.telegram_id, User.notifications)
+
+
+def _remember(telegram_id: int, user_id: int) -> None:
+    _user_ids[telegram_id] = user_id
+    _user_ids.move_to_end(telegram_id)
+    if len(_user_ids) > USER_ID_CACHE_SIZE:
+        _user_ids.popitem(last=False)
+
+
+async def resolve_user_id(db: AsyncSession, telegram_id: int) -> int:
+    """users.id за telegram_id, створює користувача за потреби; з кешу — без БД."""
+    user_id = _user_ids.get(telegram_id)
+    if user_id is not None:
+        _user_ids.move_to_end(telegram_id)
+        metrics.inc("user_id_cache_total", result="hit")
+        return user_id
+    metrics.inc("user_id_cache_total", result="miss")
+    row = (await db.execute(_upsert(telegram_id))).one()
+    await db.commit()
+    _remember(telegram_id, row.id)
+    return row.id
+
+
 async def get_or_create_by_telegram(db: AsyncSession, telegram_id: int) -> UserResponse:
-    res = await db.execute(select(User).where(User.telegram_id == telegram_id))
-    u = res.scalar_one_or_none()
-    if not u:
-        u = User(telegram_id=telegram_id)
-        db.add(u)
-        await db.commit()
-        await db.refresh(u)
-    return UserResponse.model_validate(u, from_attributes=True)
+    row = (await db.execute(_upsert(telegram_id))).one()
+    await db.commit()
+    _remember(telegram_id, row.id)
+    return UserResponse.model_validate(row._asdict())
 
 
 async def set_notifications(db: AsyncSession, user_id: int, enabled: bool) -> UserResponse:
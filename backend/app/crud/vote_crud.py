@@ -1,73 +1,269 @@
-from typing import List
+from typing import List, Tuple
 from fastapi import HTTPException, status
-from sqlalchemy import select, func
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import IntegrityError
 
-from app.models.models import Event, Round, Song, Vote, User
-from app.schemas.schemas import StateResponse, EventResponse, RoundResponse, SongResponse
+from app.crud.event_crud import open_round
+from app.models.models import Event, Round, Song, Vote
+from app.schemas.schemas import EventResponse, RoundResponse
+from app.services.fastjson import dumps, fields
+from app.services import round_state, vote_ingest
 from app.services.live_bus import publish_event
 
 
-async def get_or_create_user(db: AsyncSession, telegram_id: int) -> User:
-    res = await db.execute(select(User).where(User.telegram_id == telegram_id))
-    u = res.scalar_one_or_none()
-    if u:
-        return u
-    u = User(telegram_id=telegram_id)
-    db.add(u)
-    await db.commit()
-    await db.refresh(u)
-    return u
-
-
-async def vote_for_song(db: AsyncSession, user: User, song_id: int) -> dict:
-    s = (await db.execute(select(Song).where(Song.id == song_id))).scalar_one_or_none()
+async def _open_song(db: AsyncSession, song_id: int):
+    s = (
+        await db.execute(
+            select(Song.id, Song.round_id, Song.vote_count, Round.event_id, Round.ended_at)
+            .join(Round, Round.id == Song.round_id)
+            .where(Song.id == song_id)
+        )
+    ).first()
     if not s:
         raise HTTPException(status_code=404, detail="Song not found")
+    if s.ended_at is not None:
+        # секцію votes закритого раунду згодом від'єднує archive_votes.py
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Round is closed")
+    return s
+
+
+async def vote_for_song(db: AsyncSession, user_id: int, song_id: int) -> dict:
+    s = await _open_song(db, song_id)
+    return await cast_vote(db, user_id, song_id, s.round_id, s.event_id, s.vote_count)
+
+
+async def cast_vote(
+        db: AsyncSession, user_id: int, song_id: int, round_id: int, event_id: int, vote_count: int,
+) -> dict:
+    """Голос за пісню відкритого раунду, яку caller уже знайшов (vote_for_song, song_crud)."""
+    if vote_ingest.buffered():
+        # write-behind: dedupe + лічильник у Redis зараз, у votes — пачкою від флашера
+        votes = await vote_ingest.accept_vote(user_id, round_id, song_id, event_id, vote_count)
+        if votes is None:
+            raise HTTPException(status.HTTP_409_CONFLICT, detail="Already voted in this round")
+        await _voted(event_id, round_id, user_id, song_id, votes)
+        return {"ok": True, "votes": votes}
+
+    # insert голосу + інкремент лічильника одним стейтментом (одна транзакція, без SELECT count)
+    ins = (
+        pg_insert(Vote)
+        .values(user_id=user_id, round_id=round_id, song_id=song_id)
+        .on_conflict_do_nothing()
+        .returning(Vote.song_id)
+        .cte("ins")
+    )
+    votes = (
+        await db.execute(
+            update(Song)
+            .where(Song.id == ins.c.song_id)
+            .values(vote_count=Song.vote_count + 1)
+            .returning(Song.vote_count)
+        )
+    ).scalar_one_or_none()
+    if votes is None:
+        await db.rollback()
+        # унікальне обмеження (user_id, round_id)
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Already voted in this round")
+    await _commit_counts(db, round_id, {song_id: votes})
+
+    await _voted(event_id, round_id, user_id, song_id, votes)
+    return {"ok": True, "votes": votes}
+
 
-    v = Vote(user_id=user.id, song_id=song_id)
-    db.add(v)
+async def _voted(event_id: int, round_id: int, user_id: int, song_id: int, votes: int) -> None:
+    # лічильник уже в round_state (vote_ingest / _commit_counts) — кеш стану не скидаємо
+    await round_state.add_user_vote(round_id, user_id, song_id)
+    await publish_event(event_id, {"type": "vote", "song_id": song_id, "votes": votes})
+
+
+async def _commit_counts(db: AsyncSession, round_id: int, counts: dict) -> None:
+    # sync-режим: лічильники в Redis до COMMIT, поки UPDATE тримає рядки пісень —
+    # паралельні голоси за ту саму пісню пишуть їх у порядку комітів
+    await round_state.set_counts(round_id, counts)
     try:
         await db.commit()
-    except IntegrityError:
-        await db.rollback()
-        # унікальне обмеження (user_id, song_id)
-        raise HTTPException(status.HTTP_409_CONFLICT, detail="Already voted for this song")
+    except Exception:
+        await round_state.drop_counts(round_id, counts)
+        raise
+
 
-    # поточний count для UI
-    cnt = await db.execute(select(func.count(Vote.id)).where(Vote.song_id == song_id))
-    votes = cnt.scalar_one()
+# Переміщення голосу користувача в раунді пісні song_id — один стейтмент:
+# FOR UPDATE на рядку голосу серіалізує паралельні switch того самого користувача; після
+# очікування береться вже нова версія рядка, тож "звідки" — актуальне і подвійного рахунку нема.
+# Обидва лічильники змінює один UPDATE (рядки блокуються в одному порядку — без взаємоблокувань).
+_SWITCH_SQL = text("""
+WITH tgt AS (
+    SELECT s.id, s.round_id, s.vote_count, r.event_id, r.ended_at
+    FROM songs s
+    JOIN rounds r ON r.id = s.round_id
+    WHERE s.id = :song_id
+),
+cur AS (
+    SELECT v.id, v.song_id
+    FROM votes v, tgt
+    WHERE v.user_id = :user_id AND v.round_id = tgt.round_id AND tgt.ended_at IS NULL
+    FOR UPDATE OF v
+),
+moved AS (
+    UPDATE votes v SET song_id = tgt.id
+    FROM cur, tgt
+    WHERE v.id = cur.id AND v.round_id = tgt.round_id AND cur.song_id <> tgt.id
+    RETURNING cur.song_id AS from_id
+),
+counts AS (
+    UPDATE songs SET vote_count = songs.vote_count + CASE WHEN songs.id = tgt.id THEN 1 ELSE -1 END
+    FROM moved, tgt
+    WHERE songs.id IN (moved.from_id, tgt.id)
+    RETURNING songs.id, songs.vote_count
+)
+SELECT tgt.round_id, tgt.event_id, tgt.ended_at, cur.song_id AS from_id,
+       moved.from_id IS NOT NULL AS moved,
+       (SELECT vote_count FROM counts WHERE counts.id = cur.song_id) AS from_votes,
+       coalesce((SELECT vote_count FROM counts WHERE counts.id = tgt.id), tgt.vote_count) AS to_votes
+FROM tgt
+LEFT JOIN cur ON true
+LEFT JOIN moved ON true
+""")
+
+
+async def switch_vote(db: AsyncSession, user_id: int, song_id: int) -> dict:
+    """
+    Переносить голос користувача в раунді на song_id (-1 старій пісні, +1 новій) атомарно —
+    у Postgres або, у buffered-режимі, в Redis (vote_ingest.move_vote). Одна подія "vote"
+    з обома лічильниками. Голосу ще нема -> 404, уже за цю пісню -> moved=False.
+    """
+    if vote_ingest.buffered():
+        s = await _open_song(db, song_id)
+        res = await vote_ingest.move_vote(user_id, s.round_id, song_id, s.event_id, s.vote_count)
+        if res is None:
+            raise HTTPException(status_code=404, detail="Vote not found")
+        moved, from_id, from_votes, to_votes = res
+        round_id, event_id = s.round_id, s.event_id
+    else:
+        row = (await db.execute(_SWITCH_SQL, {"user_id": user_id, "song_id": song_id})).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Song not found")
+        if row.ended_at is not None:
+            raise HTTPException(status.HTTP_409_CONFLICT, detail="Round is closed")
+        if row.from_id is None:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Vote not found")
+        if row.moved:
+            await _commit_counts(db, row.round_id, {row.from_id: row.from_votes, song_id: row.to_votes})
+        else:
+            await db.commit()
+        moved, from_id, from_votes, to_votes = row.moved, row.from_id, row.from_votes, row.to_votes
+        round_id, event_id = row.round_id, row.event_id
+
+    if not moved:
+        return {"ok": True, "moved": False, "votes": to_votes}
+    await round_state.move_user_vote(round_id, user_id, from_id, song_id)
+    await publish_event(event_id, {
+        "type": "vote",
+        "song_id": song_id,
+        "votes": to_votes,
+        "from": {"song_id": from_id, "votes": from_votes},
+    })
+    return {"ok": True, "moved": True, "votes": to_votes, "from": {"song_id": from_id, "votes": from_votes}}
+
+
+async def remove_vote(db: AsyncSession, user_id: int, song_id: int) -> dict:
+    """Знімає голос користувача за пісню відкритого раунду (-1 лічильнику). Нема голосу -> 404."""
+    s = await _open_song(db, song_id)
+    if vote_ingest.buffered():
+        # голос може бути ще лише в буфері — знімаємо там, флашер видалить і з votes
+        votes = await vote_ingest.retract_vote(user_id, s.round_id, song_id, s.event_id, s.vote_count)
+        if votes == vote_ingest.NOT_BUFFERED and await _db_vote(db, user_id, s.round_id) == song_id:
+            # голос лише у votes (до buffered-режиму або dedupe-ключ вичерпав TTL)
+            votes = await vote_ingest.retract_vote(user_id, s.round_id, song_id, s.event_id, s.vote_count, in_db=True)
+        if votes is None or votes == vote_ingest.NOT_BUFFERED:
+            raise HTTPException(status_code=404, detail="Vote not found")
+    else:
+        # round_id у фільтрі — DELETE чіпає лише секцію votes цього раунду
+        dele = (
+            delete(Vote)
+            .where(Vote.user_id == user_id, Vote.round_id == s.round_id, Vote.song_id == song_id)
+            .returning(Vote.song_id)
+            .cte("del")
+        )
+        votes = (
+            await db.execute(
+                update(Song)
+                .where(Song.id == dele.c.song_id)
+                .values(vote_count=Song.vote_count - 1)
+                .returning(Song.vote_count)
+            )
+        ).scalar_one_or_none()
+        if votes is None:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Vote not found")
+        await _commit_counts(db, s.round_id, {song_id: votes})
+
+    await round_state.remove_user_vote(s.round_id, user_id, song_id)
     await publish_event(s.event_id, {"type": "vote", "song_id": song_id, "votes": votes})
     return {"ok": True, "votes": votes}
 
 
-async def event_state(db: AsyncSession, event_id: int, user: User) -> StateResponse:
+async def event_state(db: AsyncSession, event_id: int, user_id: int) -> bytes:
+    # спільна частина — раз на версію раунду, персональна — множина голосів у Redis
+    round_id, shared, gen = await round_state.lookup(event_id)
+    if shared is None:
+        round_id, shared = await _shared_state(db, event_id)
+        await round_state.store(event_id, round_id, shared, gen)
+
+    # живі лічильники поверх спільних байтів — голоси не скидають кеш стану
+    counts, my_ids = await round_state.live(round_id, user_id)
+    if my_ids is None:
+        my_ids = await _user_votes(db, round_id, user_id)
+        await round_state.fill_user_votes(round_id, user_id, my_ids)
+    return round_state.with_user(round_state.with_counts(shared, counts), my_ids)
+
+
+async def _shared_state(db: AsyncSession, event_id: int) -> Tuple[int, bytes]:
     ev = (await db.execute(select(Event).where(Event.id == event_id))).scalar_one_or_none()
-    if not ev or not ev.current_round_id:
+    r = await open_round(db, event_id) if ev else None
+    if not r:
         raise HTTPException(404, "Event not found or has no active round")
 
-    r = (await db.execute(select(Round).where(Round.id == ev.current_round_id))).scalar_one()
+    # скан ix_song_round_votes, без join/group by по votes
+    rows = (
+        await db.execute(
+            select(Song.id, Song.title, Song.round_id, Song.vote_count)
+            .where(Song.round_id == r.id)
+            .order_by(Song.vote_count.desc(), Song.id.asc())
+        )
+    ).all()
+    # голоси, які флашер ще не дописав у songs.vote_count, накладає event_state (with_counts)
+    return r.id, _shared_body(ev, r, rows)
 
-    rows = await db.execute(
-        select(Song.id, Song.name, Song.round_id, func.count(Vote.id).label("votes"))
-        .join(Vote, Vote.song_id == Song.id, isouter=True)
-        .where(Song.round_id == r.id)
-        .group_by(Song.id)
-        .order_by(func.count(Vote.id).desc(), Song.id.asc())
-    )
-    songs = [SongResponse(id=i, name=n, round_id=rid, votes=v) for i, n, rid, v in rows.all()]
 
-    my = await db.execute(
-        select(Vote.song_id).where(Vote.user_id == user.id)
-        .join(Song, Song.id == Vote.song_id)
-        .where(Song.round_id == r.id)
-    )
-    my_ids = [s for (s,) in my.all()]
+async def _user_votes(db: AsyncSession, round_id: int, user_id: int) -> List[int]:
+    if vote_ingest.buffered():
+        # dedupe-ключ новіший за votes: не дописані флашером переміщення чи зняття голосу
+        # там уже враховані, тож при ньому рядок з votes не читаємо
+        pending = await vote_ingest.pending_vote(round_id, user_id)
+        if pending is not None:
+            return [pending] if pending else []
+    song_id = await _db_vote(db, user_id, round_id)
+    return [song_id] if song_id else []
+
 
-    return StateResponse(
-        event=EventResponse.model_validate(ev, from_attributes=True),
-        round=RoundResponse.model_validate(r, from_attributes=True),
-        songs=songs,
-        user_voted_song_ids=my_ids,
+async def _db_vote(db: AsyncSession, user_id: int, round_id: int):
+    # uq_vote_user_round — не більше одного рядка
+    return (
+        await db.execute(select(Vote.song_id).where(Vote.user_id == user_id, Vote.round_id == round_id))
+    ).scalar_one_or_none()
+
+
+def _shared_body(ev: Event, r: Round, song_rows) -> bytes:
+    return round_state.shared_body(
+        fields(ev, EventResponse),
+        fields(r, RoundResponse),
+        [{"id": i, "name": n, "round_id": rid, "votes": v} for i, n, rid, v in song_rows],
     )
+
+
+def state_response(ev: Event, r: Round, song_rows, my_ids: List[int]) -> bytes:
+    """JSON за схемою StateResponse напряму з ORM-об'єктів і рядків, без моделей на кожну пісню."""
+    return round_state.with_user(_shared_body(ev, r, song_rows), my_ids)
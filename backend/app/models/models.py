@@ -6,6 +6,8 @@ from sqlalchemy import (
     BigInteger,
     Boolean,
     Column,
+    DDL,
+    Date,
     DateTime,
     ForeignKey,
     Index,
@@ -13,6 +15,7 @@ from sqlalchemy import (
     String,
     UniqueConstraint,
     Enum as SAEnum,
+    event as sa_event,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -89,6 +92,8 @@ class ClubSettings(Base):
     background_image_url = Column(String(1024), nullable=True)
     allow_explicit = Column(Boolean,    nullable=False, server_default="false")
     auto_play = Column(Boolean, nullable=False, server_default="false")
+    # повторна пропозиція треку, що вже є в раунді, = голос за нього
+    duplicate_suggestion_votes = Column(Boolean, nullable=False, server_default="true")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(
@@ -319,6 +324,10 @@ class Song(Base):
     source_id = Column(String(128), nullable=True)
     cover_url = Column(String(1024), nullable=True)
 
+    # денормалізовано: змінюється в тій самій транзакції, що й insert/delete у votes
+    # (vote_crud), звіряє check_vote_counts.py
+    vote_count = Column(Integer, nullable=False, server_default="0")
+
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     round = relationship(
@@ -336,8 +345,15 @@ class Song(Base):
     )
 
     __table_args__ = (
-        UniqueConstraint("round_id", "title", "artist", name="uq_song_round_title_artist"),
-        Index("ix_song_round", "round_id"),
+        # NULLS NOT DISTINCT: пропозиція без виконавця теж ловиться ON CONFLICT (song_crud)
+        UniqueConstraint(
+            "round_id", "title", "artist",
+            name="uq_song_round_title_artist",
+            postgresql_nulls_not_distinct=True,
+        ),
+        # стан раунду й переможець — скан індексу в порядку голосів, без агрегації votes;
+        # покриває й пошук за round_id (колишній ix_song_round)
+        Index("ix_song_round_votes", "round_id", vote_count.desc(), "id"),
         Index("ix_song_source_source_id", "source", "source_id"),
     )
 
@@ -361,7 +377,9 @@ class User(Base):
 class Vote(Base):
     __tablename__ = "votes"
 
-    id = Column(Integer, primary_key=True)
+    # Секціонована за RANGE (round_id): ключ секції входить у PK і в унікальні обмеження.
+    # Старі секції від'єднує archive_votes.py (див. міграцію 7c2e4a91d3f0).
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
     user_id = Column(
         Integer,
@@ -371,6 +389,7 @@ class Vote(Base):
     round_id = Column(
         Integer,
         ForeignKey("rounds.id", ondelete="CASCADE"),
+        primary_key=True,
         nullable=False,
     )
     song_id = Column(
@@ -386,8 +405,105 @@ class Vote(Base):
     round = relationship("Round", back_populates="votes")
 
     __table_args__ = (
+        # uq_vote_user_round покриває і пошук за (user_id, round_id) — окремого індексу нема
         UniqueConstraint("user_id", "round_id", name="uq_vote_user_round"),
         Index("ix_votes_round_song", "round_id", "song_id"),
-        Index("ix_votes_user_round", "user_id", "round_id"),
         Index("ix_votes_song_id", "song_id"),
-    )
\ No newline at end of file
+        {"postgresql_partition_by": "RANGE (round_id)"},
+    )
+
+
+# create_all (/__dev__/init_db) створює лише батьківську таблицю — без секції вставки падали б
+sa_event.listen(
+    Vote.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS votes_default PARTITION OF votes DEFAULT"),
+)
+
+# ===================== ANALYTICS (ROLLUPS) =====================
+# Заповнює worker_analytics.py (app/services/analytics.py) по закритих раундах, один раз на раунд.
+# day — дата (UTC) старту раунду; по (club_id, day) фільтрує адмінка.
+
+class AnalyticsRound(Base):
+    __tablename__ = "analytics_rounds"
+
+    # наявність рядка = раунд уже враховано в усіх rollup-таблицях
+    round_id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    club_id = Column(Integer, ForeignKey("clubs.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)
+
+    votes = Column(Integer, nullable=False, server_default="0")
+    voters = Column(Integer, nullable=False, server_default="0")
+    suggestions = Column(Integer, nullable=False, server_default="0")
+    attendees = Column(Integer, nullable=True)
+    winner_song_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_analytics_rounds_club_day", "club_id", "day"),
+        Index("ix_analytics_rounds_event", "event_id"),
+    )
+
+
+class AnalyticsVoteMinute(Base):
+    __tablename__ = "analytics_vote_minutes"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    minute = Column(DateTime(timezone=True), primary_key=True)
+    votes = Column(Integer, nullable=False, server_default="0")
+
+
+class AnalyticsEventSong(Base):
+    __tablename__ = "analytics_event_songs"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    # source:source_id, або нормалізовані title|artist для ручних пісень
+    song_key = Column(String(512), primary_key=True)
+    club_id = Column(Integer, ForeignKey("clubs.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+
+    title = Column(String(255), nullable=False)
+    artist = Column(String(255), nullable=True)
+    source = Column(String(32), nullable=True)
+    source_id = Column(String(128), nullable=True)
+    cover_url = Column(String(1024), nullable=True)
+
+    votes = Column(Integer, nullable=False, server_default="0")
+    rounds = Column(Integer, nullable=False, server_default="0")
+    wins = Column(Integer, nullable=False, server_default="0")
+
+    __table_args__ = (
+        Index("ix_analytics_event_songs_club_day", "club_id", "day"),
+        Index("ix_analytics_event_songs_event_votes", "event_id", votes.desc()),
+    )
+
+
+class AnalyticsEventVoter(Base):
+    __tablename__ = "analytics_event_voters"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    club_id = Column(Integer, ForeignKey("clubs.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+
+    __table_args__ = (
+        # count(DISTINCT user_id) за період — index-only scan
+        Index("ix_analytics_event_voters_club_day_user", "club_id", "day", "user_id"),
+    )
+
+
+class TrackPopularity(Base):
+    __tablename__ = "track_popularity"
+
+    # трек провайдера в межах клубу — той самий id, що в пошуку й черзі ("deezer:123")
+    club_id = Column(Integer, ForeignKey("clubs.id", ondelete="CASCADE"), primary_key=True)
+    source = Column(String(32), primary_key=True)
+    source_id = Column(String(128), primary_key=True)
+
+    suggestions = Column(Integer, nullable=False, server_default="0")
+    votes = Column(Integer, nullable=False, server_default="0")
+    wins = Column(Integer, nullable=False, server_default="0")
+    last_played_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -66,6 +66,9 @@ class RoundResponse(BaseModel):
 
 class SongCreate(BaseModel):
     name: str
+    artist: Optional[str] = None
+    track_id: Optional[str] = None     # "deezer:123" з пошуку
+    cover_url: Optional[str] = None
 
 
 class SongResponse(BaseModel):
@@ -77,6 +80,11 @@ class SongResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class SongSuggestResponse(SongResponse):
+    created: bool                       # False — трек уже був у раунді
+    voted: bool = False                 # повтор зараховано як голос (ClubSettings.duplicate_suggestion_votes)
+
+
 class VoteCreate(BaseModel):
     song_id: int
 
@@ -143,6 +151,7 @@ class ClubSettingsUpdate(BaseModel):
     voting_duration_sec: Optional[int] = None
     allow_explicit: Optional[bool] = None
     auto_play: Optional[bool] = None
+    duplicate_suggestion_votes: Optional[bool] = None
 
 class ClubResponse(ClubCreate):
     id: int
@@ -0,0 +1,144 @@
+"""
+Rollup-таблиці для аналітики адмінки (models: Analytics*).
+
+Закритий раунд більше не змінюється, тож його внесок рахуємо один раз:
+- rollup_round: один стейтмент — рядок analytics_rounds (ON CONFLICT DO NOTHING — маркер
+  "уже враховано") і, лише якщо він вставився, додавання до хвилинних голосів, пісень івенту,
+  унікальних голосувальників і track_popularity клубу. Повтор для того самого раунду нічого
+  не змінює.
+- rollup_pending: раунди, закриті давніше за ANALYTICS_GRACE_SECONDS (write-behind голосів
+  встигає дописатись), але ще без рядка в analytics_rounds. Перший запуск = backfill історії.
+
+Роути адмінки читають лише ці таблиці — без сканів votes/songs.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import metrics
+
+ANALYTICS_GRACE_SECONDS = int(os.getenv("ANALYTICS_GRACE_SECONDS", "60"))
+ANALYTICS_BATCH = int(os.getenv("ANALYTICS_BATCH", "200"))
+
+log = logging.getLogger("analytics")
+
+metrics.describe("analytics_rounds_rolled_up_total", "Раунди, враховані в rollup-таблицях")
+
+# ключ пісні між раундами: ідентифікатор провайдера, інакше title|artist
+_SONG_KEY = (
+    "coalesce(s.source || ':' || s.source_id, lower(s.title) || '|' || lower(coalesce(s.artist, '')))"
+)
+
+_ROLLUP_SQL = text(f"""
+WITH r AS (
+    SELECT r.id, r.event_id, e.club_id, r.started_at, r.ended_at, r.winner_song_id,
+           CAST(timezone('UTC', r.started_at) AS DATE) AS day
+    FROM rounds r
+    JOIN events e ON e.id = r.event_id
+    WHERE r.id = :round_id AND r.ended_at IS NOT NULL
+),
+v AS (
+    SELECT user_id, created_at FROM votes WHERE round_id = :round_id
+),
+ins AS (
+    INSERT INTO analytics_rounds
+        (round_id, event_id, club_id, day, started_at, ended_at, votes, voters, suggestions, attendees, winner_song_id)
+    SELECT r.id, r.event_id, r.club_id, r.day, r.started_at, r.ended_at,
+           (SELECT count(*) FROM v),
+           (SELECT count(DISTINCT user_id) FROM v),
+           (SELECT count(*) FROM songs WHERE round_id = :round_id),
+           CAST(:attendees AS INTEGER),
+           r.winner_song_id
+    FROM r
+    ON CONFLICT (round_id) DO NOTHING
+    RETURNING event_id, club_id, day, winner_song_id, ended_at
+),
+minutes AS (
+    INSERT INTO analytics_vote_minutes (event_id, minute, votes)
+    SELECT ins.event_id, date_trunc('minute', v.created_at), count(*)
+    FROM ins, v
+    GROUP BY 1, 2
+    ON CONFLICT (event_id, minute) DO UPDATE
+    SET votes = analytics_vote_minutes.votes + EXCLUDED.votes
+),
+songs_ AS (
+    INSERT INTO analytics_event_songs
+        (event_id, song_key, club_id, day, title, artist, source, source_id, cover_url, votes, rounds, wins)
+    SELECT ins.event_id, {_SONG_KEY}, ins.club_id, ins.day,
+           min(s.title), min(s.artist), min(s.source), min(s.source_id), min(s.cover_url),
+           sum(s.vote_count), 1, count(*) FILTER (WHERE s.id = ins.winner_song_id)
+    FROM ins
+    JOIN songs s ON s.round_id = :round_id
+    GROUP BY ins.event_id, ins.club_id, ins.day, 2
+    ON CONFLICT (event_id, song_key) DO UPDATE
+    SET votes = analytics_event_songs.votes + EXCLUDED.votes,
+        rounds = analytics_event_songs.rounds + 1,
+        wins = analytics_event_songs.wins + EXCLUDED.wins,
+        cover_url = coalesce(analytics_event_songs.cover_url, EXCLUDED.cover_url)
+),
+voters AS (
+    INSERT INTO analytics_event_voters (event_id, user_id, club_id, day)
+    SELECT DISTINCT ins.event_id, v.user_id, ins.club_id, ins.day
+    FROM ins, v
+    ON CONFLICT (event_id, user_id) DO NOTHING
+),
+popularity AS (
+    INSERT INTO track_popularity (club_id, source, source_id, suggestions, votes, wins, last_played_at, updated_at)
+    SELECT ins.club_id, s.source, s.source_id,
+           count(*), sum(s.vote_count),
+           count(*) FILTER (WHERE s.id = ins.winner_song_id),
+           max(ins.ended_at) FILTER (WHERE s.id = ins.winner_song_id),
+           now()
+    FROM ins
+    JOIN songs s ON s.round_id = :round_id
+    WHERE s.source IS NOT NULL AND s.source_id IS NOT NULL
+    GROUP BY ins.club_id, s.source, s.source_id
+    ON CONFLICT (club_id, source, source_id) DO UPDATE
+    SET suggestions = track_popularity.suggestions + EXCLUDED.suggestions,
+        votes = track_popularity.votes + EXCLUDED.votes,
+        wins = track_popularity.wins + EXCLUDED.wins,
+        last_played_at = greatest(track_popularity.last_played_at, EXCLUDED.last_played_at),
+        updated_at = now()
+)
+SELECT count(*) FROM ins
+""")
+
+_PENDING_SQL = text("""
+SELECT r.id, r.event_id
+FROM rounds r
+WHERE r.ended_at IS NOT NULL
+  AND r.ended_at < now() - make_interval(secs => :grace)
+  AND NOT EXISTS (SELECT 1 FROM analytics_rounds a WHERE a.round_id = r.id)
+ORDER BY r.id
+LIMIT :limit
+""")
+
+
+async def rollup_round(db: AsyncSession, round_id: int, attendees: Optional[int] = None) -> bool:
+    """True, якщо раунд щойно враховано (False — уже був, або ще не закритий). Без commit."""
+    done = (await db.execute(_ROLLUP_SQL, {"round_id": round_id, "attendees": attendees})).scalar_one()
+    return bool(done)
+
+
+async def rollup_pending(db: AsyncSession, attendees=None, limit: int = ANALYTICS_BATCH) -> List[int]:
+    """
+    Враховує закриті раунди, яких ще нема в analytics_rounds; по commit на раунд.
+    attendees — async (event_id) -> int | None: скільки людей було на івенті (з Redis).
+    """
+    rows = (await db.execute(_PENDING_SQL, {"grace": ANALYTICS_GRACE_SECONDS, "limit": limit})).all()
+    await db.commit()
+    done = []
+    for round_id, event_id in rows:
+        count = await attendees(event_id) if attendees else None
+        if await rollup_round(db, round_id, count):
+            done.append(round_id)
+        await db.commit()
+    if done:
+        metrics.inc("analytics_rounds_rolled_up_total", len(done))
+        log.info("rolled up %d rounds (%d..%d)", len(done), done[0], done[-1])
+    return done
@@ -0,0 +1,323 @@
+"""
+Проксі обкладинок: кожен cover_url тягнемо з CDN один раз, зберігаємо зменшені варіанти
+на диску під іменами з хешу вмісту й віддаємо з довгим кешем.
+
+- cover_url у пошуку та черзі переписуємо на /api/v1/covers/{size}/{token},
+  token = base64url(url) + HMAC; підписуємо й тягнемо лише https з CDN провайдерів
+  (COVER_HOSTS), адреси, що резолвляться в приватні/link-local IP, відкидаємо, редіректи
+  перевіряємо на кожному кроці — cover_url у черзі задає клієнт, тож інакше це SSRF
+- файли: COVER_DIR/ab/<sha256>_<size>.webp|jpg, індекс url -> sha256 у COVER_DIR/by-url/
+- одна закачка на url (in-flight dedupe), не більше COVER_FETCH_CONCURRENCY одночасно
+- Pillow опційний: без нього зберігаємо й віддаємо оригінал (без ресайзу), але вже з нашого домену
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+import ipaddress
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+from app.core.config import BASE_DIR, settings
+from app.services import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - залежить від деплою
+    Image = None
+
+COVER_DIR = Path(os.getenv("COVER_DIR", str(BASE_DIR / "static" / "covers")))
+# фронт живе на іншому домені — туди пишемо публічну адресу API (https://api.next-track.fun)
+COVER_PUBLIC_BASE = os.getenv("COVER_PUBLIC_BASE", "").rstrip("/")
+COVER_PATH = "/api/v1/covers"
+# CDN обкладинок Deezer (cdn-images/e-cdns-images.dzcdn.net) та iTunes (isN-ssl.mzstatic.com);
+# збіг — сам хост або його піддомен
+COVER_HOSTS = tuple(
+    h.strip().lower().lstrip(".")
+    for h in os.getenv("COVER_HOSTS", "dzcdn.net,mzstatic.com").split(",")
+    if h.strip()
+)
+MAX_REDIRECTS = 3
+
+SIZES = (64, 128, 256)
+DEFAULT_SIZE = 128          # 40..64 css px на 2x екранах
+FORMATS = {"webp": "image/webp", "jpg": "image/jpeg"}
+QUALITY = 80
+
+MAX_BYTES = 5 * 1024 * 1024
+FETCH_TIMEOUT_SECONDS = 5.0
+COVER_FETCH_CONCURRENCY = int(os.getenv("COVER_FETCH_CONCURRENCY", "8"))
+FAILURE_TTL_SECONDS = 60.0
+MAX_INDEX = 50_000
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_ORIGINAL_EXT = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif"}
+_EXT_MIME = {ext: mime for mime, ext in _ORIGINAL_EXT.items()}
+
+_index: Dict[str, str] = {}                 # url_key -> content hash
+_inflight: Dict[str, asyncio.Future] = {}
+_failed: Dict[str, float] = {}               # url_key -> до коли не пробуємо знову
+_sem = asyncio.Semaphore(COVER_FETCH_CONCURRENCY)
+_client = httpx.AsyncClient(
+    timeout=FETCH_TIMEOUT_SECONDS,
+    follow_redirects=False,     # кожен Location проходить allowed() + перевірку IP
+    limits=httpx.Limits(max_connections=COVER_FETCH_CONCURRENCY * 2),
+)
+
+
+class CoverError(Exception):
+    """Не вдалося отримати чи розібрати зображення."""
+
+
+# ---------- Allowed origins ----------
+def allowed(url: Optional[str]) -> bool:
+    """https на стандартному порту, без userinfo, хост з COVER_HOSTS."""
+    try:
+        parts = urlsplit(url or "")
+        port = parts.port
+    except ValueError:
+        return False
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host or parts.username or parts.password or port not in (None, 443):
+        return False
+    return any(host == h or host.endswith("." + h) for h in COVER_HOSTS)
+
+
+async def _check_resolves_public(host: str) -> None:
+    """Усі адреси хоста мають бути публічними — allowlist не рятує від підміненого DNS."""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+    except OSError as e:
+        raise CoverError(f"resolve failed: {e}") from e
+    for info in infos:
+        ip = ipaddress.ip_address(info[4][0])
+        if not ip.is_global:
+            raise CoverError(f"non-public address {ip} for {host}")
+
+
+# ---------- Signed URLs ----------
+def _secret() -> bytes:
+    return (settings.EVENT_TOKEN_SECRET or settings.SECRET_KEY).encode()
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def sign_url(url: str) -> str:
+    raw = url.encode()
+    sig = hmac.new(_secret(), raw, hashlib.sha256).digest()[:12]
+    return _b64(raw) + "." + _b64(sig)
+
+
+def verify_token(token: str) -> Optional[str]:
+    try:
+        p_enc, s_enc = token.split(".", 1)
+        raw = base64.urlsafe_b64decode(p_enc + "==")
+        sig = base64.urlsafe_b64decode(s_enc + "==")
+    except Exception:
+        return None
+    calc = hmac.new(_secret(), raw, hashlib.sha256).digest()[:12]
+    if not hmac.compare_digest(calc, sig):
+        return None
+    return raw.decode()
+
+
+def proxied(url: Optional[str], size: int = DEFAULT_SIZE) -> Optional[str]:
+    """
+    Переписує cover_url з CDN провайдера на проксі. Вже проксійовані та не-http лишає як є;
+    http(s) з інших хостів — None: не підписуємо і не віддаємо клієнтам чужі адреси.
+    """
+    if not url or not url.startswith(("http://", "https://")) or COVER_PATH in url:
+        return url
+    if not allowed(url):
+        return None
+    return f"{COVER_PUBLIC_BASE}{COVER_PATH}/{size}/{sign_url(url)}"
+
+
+# ---------- Storage ----------
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+
+def _index_path(url_key: str) -> Path:
+    return COVER_DIR / "by-url" / url_key[:2] / url_key
+
+
+def variant_path(content_hash: str, size: int, ext: str) -> Path:
+    return COVER_DIR / content_hash[:2] / f"{content_hash}_{size}.{ext}"
+
+
+def _original_path(content_hash: str) -> Optional[Path]:
+    for ext in _ORIGINAL_EXT.values():
+        p = COVER_DIR / content_hash[:2] / f"{content_hash}_orig.{ext}"
+        if p.exists():
+            return p
+    return None
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # pid + випадковий суфікс: той самий варіант можуть писати кілька корутин одночасно
+    tmp = path.with_name(path.name + f".{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _read_index(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _render_variants(content_hash: str, data: bytes, content_type: str) -> None:
+    """CPU-робота, виконується в треді."""
+    if Image is None:
+        ext = _ORIGINAL_EXT.get(content_type, "jpg")
+        _write_atomic(COVER_DIR / content_hash[:2] / f"{content_hash}_orig.{ext}", data)
+        return
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception as e:
+        raise CoverError(f"bad image: {e}") from e
+    img = img.convert("RGB")
+
+    for size in SIZES:
+        thumb = img.copy()
+        thumb.thumbnail((size, size), Image.LANCZOS)
+        for ext, fmt in (("webp", "WEBP"), ("jpg", "JPEG")):
+            buf = io.BytesIO()
+            thumb.save(buf, fmt, quality=QUALITY, optimize=fmt == "JPEG")
+            _write_atomic(variant_path(content_hash, size, ext), buf.getvalue())
+
+
+async def _open(url: str) -> httpx.Response:
+    """GET зі стрімом; редіректи вручну — кожен крок знову через allowed() і перевірку IP."""
+    for _ in range(MAX_REDIRECTS + 1):
+        if not allowed(url):
+            raise CoverError(f"host not allowed: {url}")
+        await _check_resolves_public(urlsplit(url).hostname)
+        r = await _client.send(_client.build_request("GET", url), stream=True)
+        if not r.is_redirect:
+            return r
+        await r.aclose()
+        url = urljoin(url, r.headers.get("location", ""))
+    raise CoverError("too many redirects")
+
+
+async def _fetch_and_store(url: str, url_key: str) -> str:
+    async with _sem:
+        metrics.inc("cover_fetch_total")
+        try:
+            r = await _open(url)
+            try:
+                r.raise_for_status()
+                content_type = r.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+                if not content_type.startswith("image/"):
+                    raise CoverError(f"not an image: {content_type}")
+                chunks = []
+                size = 0
+                async for chunk in r.aiter_bytes():
+                    size += len(chunk)
+                    if size > MAX_BYTES:
+                        raise CoverError("image too large")
+                    chunks.append(chunk)
+            finally:
+                await r.aclose()
+        except httpx.HTTPError as e:
+            raise CoverError(str(e)) from e
+
+    data = b"".join(chunks)
+    content_hash = hashlib.sha256(data).hexdigest()[:32]
+    if not variant_path(content_hash, SIZES[-1], "webp").exists() and _original_path(content_hash) is None:
+        await asyncio.to_thread(_render_variants, content_hash, data, content_type)
+    await asyncio.to_thread(_write_atomic, _index_path(url_key), content_hash.encode())
+    return content_hash
+
+
+def _remember(url_key: str, content_hash: str) -> None:
+    if len(_index) > MAX_INDEX:
+        _index.clear()  # це лише кеш над by-url/ на диску
+    _index[url_key] = content_hash
+
+
+async def _content_hash(url: str) -> str:
+    url_key = _url_key(url)
+    h = _index.get(url_key)
+    if h:
+        return h
+
+    h = await asyncio.to_thread(_read_index, _index_path(url_key))
+    if h:
+        _remember(url_key, h)
+        return h
+
+    if _failed.get(url_key, 0.0) > time.monotonic():
+        raise CoverError("recently failed")
+
+    # in-flight dedupe: вся черга на екрані просить ту саму обкладинку одночасно
+    fut = _inflight.get(url_key)
+    if fut is None:
+        fut = asyncio.ensure_future(_fetch_and_store(url, url_key))
+        _inflight[url_key] = fut
+        fut.add_done_callback(lambda _: _inflight.pop(url_key, None))
+    try:
+        h = await asyncio.shield(fut)
+    except CoverError:
+        if len(_failed) > MAX_INDEX:
+            _failed.clear()
+        _failed[url_key] = time.monotonic() + FAILURE_TTL_SECONDS
+        metrics.inc("cover_fetch_failed_total")
+        raise
+    _remember(url_key, h)
+    return h
+
+
+async def _local(content_hash: str, size: int, ext: str) -> Optional[Tuple[Path, str]]:
+    path = variant_path(content_hash, size, ext)
+    if path.exists():
+        return path, FORMATS[ext]
+
+    orig = _original_path(content_hash)
+    if orig is None:
+        return None
+    if Image is None:
+        return orig, _EXT_MIME.get(orig.suffix.lstrip("."), "image/jpeg")
+    # Pillow з'явився після того, як зберегли оригінал — домальовуємо варіанти
+    data = await asyncio.to_thread(orig.read_bytes)
+    await asyncio.to_thread(_render_variants, content_hash, data, "")
+    return path, FORMATS[ext]
+
+
+async def get_cover(url: str, size: int, accept_webp: bool) -> Tuple[Path, str]:
+    """(шлях до файлу, media type). Кидає CoverError, якщо оригінал недоступний."""
+    size = min(SIZES, key=lambda s: abs(s - size))
+    ext = "webp" if accept_webp else "jpg"
+
+    found = await _local(await _content_hash(url), size, ext)
+    if found is None:
+        # індекс є, а файлів нема (почистили диск) — тягнемо заново
+        url_key = _url_key(url)
+        _index.pop(url_key, None)
+        _index_path(url_key).unlink(missing_ok=True)
+        found = await _local(await _content_hash(url), size, ext)
+    if found is None:
+        raise CoverError("cover files missing")
+    return found
+
+
+async def close_cover_client() -> None:
+    await _client.aclose()
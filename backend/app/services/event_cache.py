@@ -0,0 +1,130 @@
+"""
+Кеш slug клубу -> (клуб, поточний івент).
+
+get_latest_event_by_club_slug стоїть на гарячому шляху кожного запиту mini-app і
+кожного WS-конекту, а відповідь міняється лише коли адмін створює/редагує/завершує/видаляє
+івент. Тому:
+- L2: Redis club:{slug}:current (спільний для воркерів), довгий TTL лише як страховка
+- L1: in-process на LOCAL_TTL_SECONDS — стільки максимум інші воркери бачать старе після інвалідації
+- invalidate_club() з router_admin: INCR покоління + DEL; запис після читання з БД
+  проходить лише якщо покоління не змінилось (інакше повільний читач повернув би старе)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.redis_client import redis_client
+from app.schemas.schemas import EventResponse
+from app.services import metrics
+from app.services.fastjson import dumps
+from app.services.event_keys import k_club_current, k_club_current_gen
+
+CACHE_TTL_SECONDS = 10 * 60
+MISSING_TTL_SECONDS = 30     # "клубу/івенту нема" — не довбемо БД, але й довго не тримаємо
+LOCAL_TTL_SECONDS = 2.0
+MAX_LOCAL = 10_000
+
+# slug -> (expires_at, entry)
+_local: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+# slug -> (entry, body, etag): готовий summary, поки entry той самий об'єкт
+_summaries: Dict[str, Tuple[Dict[str, Any], bytes, str]] = {}
+
+# SET лише якщо покоління те саме, що було до читання з БД
+_STORE_LUA = """
+local gen = redis.call('GET', KEYS[2]) or '0'
+if gen == ARGV[1] then
+  redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+  return 1
+end
+return 0
+"""
+
+
+def entry(club: Any, event: Any, settings: Any = None) -> Dict[str, Any]:
+    """ORM-рядки -> те, що кладемо в кеш."""
+    return {
+        "club": {"id": club.id, "name": club.name, "slug": club.slug} if club else None,
+        "event": EventResponse.model_validate(event).model_dump(mode="json") if event else None,
+        "settings": {
+            "background_image_url": settings.background_image_url,
+            "max_suggestions_per_user": settings.max_suggestions_per_user,
+            "voting_duration_sec": settings.voting_duration_sec,
+        } if settings else None,
+    }
+
+
+async def lookup(club_slug: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """(entry або None, покоління для store())."""
+    now = time.monotonic()
+    hit = _local.get(club_slug)
+    if hit and hit[0] > now:
+        metrics.inc("club_event_cache_total", tier="local")
+        return hit[1], ""
+
+    try:
+        raw, gen = await redis_client.mget(k_club_current(club_slug), k_club_current_gen(club_slug))
+    except Exception:
+        metrics.inc("club_event_cache_total", tier="error")
+        return None, ""
+
+    if raw:
+        value = json.loads(raw)
+        _remember(club_slug, value)
+        metrics.inc("club_event_cache_total", tier="redis")
+        return value, ""
+
+    metrics.inc("club_event_cache_total", tier="miss")
+    return None, gen or "0"
+
+
+async def store(club_slug: str, value: Dict[str, Any], gen: str) -> None:
+    _remember(club_slug, value)
+    if not gen:
+        return
+    ttl = CACHE_TTL_SECONDS if value.get("event") else MISSING_TTL_SECONDS
+    try:
+        await redis_client.eval(
+            _STORE_LUA, 2, k_club_current(club_slug), k_club_current_gen(club_slug),
+            gen, json.dumps(value, separators=(",", ":")), ttl,
+        )
+    except Exception:
+        return
+
+
+def summary_body(club_slug: str, value: Dict[str, Any]) -> Tuple[bytes, str]:
+    """(JSON summary івенту, ETag) — енкодимо раз на запис кешу, а не на кожен запит."""
+    hit = _summaries.get(club_slug)
+    if hit and hit[0] is value:
+        return hit[1], hit[2]
+
+    event = value["event"]
+    settings = value.get("settings") or {}
+    body = dumps({
+        **event,
+        "slug": club_slug,
+        "background_image_url": event.get("background_image_url") or settings.get("background_image_url"),
+        "club": value["club"],
+    })
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    if len(_summaries) >= MAX_LOCAL:
+        _summaries.clear()
+    _summaries[club_slug] = (value, body, etag)
+    return body, etag
+
+
+async def invalidate_club(club_slug: str) -> None:
+    _local.pop(club_slug, None)
+    _summaries.pop(club_slug, None)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.incr(k_club_current_gen(club_slug))
+    pipe.delete(k_club_current(club_slug))
+    await pipe.execute()
+
+
+def _remember(club_slug: str, value: Dict[str, Any]) -> None:
+    if len(_local) >= MAX_LOCAL:
+        _local.clear()
+    _local[club_slug] = (time.monotonic() + LOCAL_TTL_SECONDS, value)
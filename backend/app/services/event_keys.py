@@ -22,4 +22,70 @@ def k_user_votes(event_id: int, tg_id: int) -> str:
 
 
 def k_attendees(event_id: int) -> str:
-    return f"event:{event_id}:attendees"
\ No newline at end of file
+    return f"event:{event_id}:attendees"
+
+def k_search_opening(event_id: int) -> str:
+    return f"event:{event_id}:search:opening"
+
+
+def k_club_search_queries(club_slug: str) -> str:
+    return f"club:{club_slug}:search:queries"
+
+
+def k_club_search_langs(club_slug: str) -> str:
+    return f"club:{club_slug}:search:langs"
+
+
+def k_club_suggested(club_slug: str) -> str:
+    return f"club:{club_slug}:suggested"
+
+
+def k_search_warmup_lock(event_id: int) -> str:
+    return f"event:{event_id}:search:warmup"
+
+
+def k_club_current(club_slug: str) -> str:
+    return f"club:{club_slug}:current"
+
+
+def k_club_current_gen(club_slug: str) -> str:
+    return f"club:{club_slug}:current:gen"
+
+
+def k_stream_seq(event_id: int) -> str:
+    return f"event:{event_id}:seq"
+
+
+def k_queue_changes(event_id: int) -> str:
+    return f"event:{event_id}:queue:changes"
+
+
+def k_queue_changes_floor(event_id: int) -> str:
+    return f"event:{event_id}:queue:changes:floor"
+
+
+def k_suggestions(event_id: int) -> str:
+    return f"event:{event_id}:suggestions"
+
+
+def k_vote_dedupe(round_id: int, user_id: int) -> str:
+    return f"round:{round_id}:voted:{user_id}"
+
+
+def k_round_vote_counts(round_id: int) -> str:
+    return f"round:{round_id}:song_votes"
+
+
+def k_round_user_votes(round_id: int, user_id: int) -> str:
+    return f"round:{round_id}:user:{user_id}:votes"
+
+
+def k_round_state(event_id: int) -> str:
+    return f"event:{event_id}:round_state"
+
+
+def k_round_state_gen(event_id: int) -> str:
+    return f"event:{event_id}:round_state:gen"
+
+
+K_VOTE_STREAM = "votes:ingest"
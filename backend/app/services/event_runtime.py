@@ -3,16 +3,22 @@ from __future__ import annotations
 import json
 import time
 from dataclasses import asdict, dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.core.redis_client import redis_client
+from app.services.cover_proxy import proxied
+from app.services.fastjson import loads
 from app.services.event_keys import (
     k_attendees,
+    k_queue_changes,
+    k_queue_changes_floor,
     k_queue_items,
     k_queue_order,
     k_votes,
     k_user_votes,
     k_state,
+    k_stream_seq,
+    k_suggestions,
 )
 
 
@@ -97,6 +103,7 @@ async def enqueue_track(event_id: int, track: Track) -> None:
     if not await redis_client.hexists(votes_key, track.track_id):
         await redis_client.hset(votes_key, track.track_id, 0)
 
+    await record_queue_changes(event_id, [track.track_id])
     await _trim_queue(event_id, max_len=200)
 
 
@@ -119,6 +126,68 @@ async def _trim_queue(event_id: int, max_len: int = 200) -> None:
     if removed_ids:
         await redis_client.hdel(items_key, *removed_ids)
         await redis_client.hdel(votes_key, *removed_ids)
+        await record_queue_changes(event_id, removed_ids)
+
+
+# ---------- Suggestion quota ----------
+# ClubSettings.max_suggestions_per_user на весь івент. Перевірка й інкремент атомарні,
+# інакше паралельні запити одного користувача проскакують повз ліміт.
+DEFAULT_MAX_SUGGESTIONS = 3   # як server_default у ClubSettings
+
+_RESERVE_SUGGESTION_LUA = """
+local n = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+if n >= tonumber(ARGV[2]) then
+  return -1
+end
+return redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+"""
+
+
+async def reserve_suggestion(event_id: int, tg_id: int, max_per_user: int) -> Optional[int]:
+    """Номер пропозиції користувача в цьому івенті або None, якщо квоту вичерпано."""
+    n = int(await redis_client.eval(_RESERVE_SUGGESTION_LUA, 1, k_suggestions(event_id), str(tg_id), max_per_user))
+    return None if n < 0 else n
+
+
+async def release_suggestion(event_id: int, tg_id: int) -> None:
+    """Пропозиція не дійшла до черги — повертаємо квоту."""
+    await redis_client.hincrby(k_suggestions(event_id), str(tg_id), -1)
+
+
+# ---------- Change log (для ?since=) ----------
+# Версія черги = seq стріму івенту (той самий, що в bootstrap і WS-повідомленнях).
+# Кожна зміна треку (додали / змінились голоси / прибрали) — запис "<версія>:<track_id>"
+# у zset зі score = версія. Лог тримаємо коротким; floor — найбільша версія, записи якої
+# могли обрізати: клієнту з since < floor віддаємо повний snapshot.
+MAX_QUEUE_CHANGES = 1000
+
+_RECORD_CHANGES_LUA = """
+local v = redis.call('INCR', KEYS[1])
+for i = 2, #ARGV do
+  redis.call('ZADD', KEYS[2], v, v .. ':' .. ARGV[i])
+end
+local n = redis.call('ZCARD', KEYS[2])
+local max = tonumber(ARGV[1])
+if n > max then
+  local cut = redis.call('ZRANGE', KEYS[2], n - max - 1, n - max - 1, 'WITHSCORES')
+  redis.call('ZREMRANGEBYRANK', KEYS[2], 0, n - max - 1)
+  redis.call('SET', KEYS[3], cut[2])
+end
+return v
+"""
+
+
+async def record_queue_changes(event_id: int, track_ids: List[str]) -> int:
+    """Одна нова версія на всю пачку змін; повертає її."""
+    return int(await redis_client.eval(
+        _RECORD_CHANGES_LUA,
+        3,
+        k_stream_seq(event_id),
+        k_queue_changes(event_id),
+        k_queue_changes_floor(event_id),
+        MAX_QUEUE_CHANGES,
+        *track_ids,
+    ))
 
 
 async def get_queue_snapshot(event_id: int, limit: int = 10) -> List[Dict[str, Any]]:
@@ -134,14 +203,19 @@ async def get_queue_snapshot(event_id: int, limit: int = 10) -> List[Dict[str, A
 
     raw_items = await redis_client.hmget(items_key, ids)
     raw_votes = await redis_client.hmget(votes_key, ids)
+    return _snapshot_items(ids, raw_items, raw_votes)
 
+
+def _snapshot_items(ids: List[str], raw_items: List[Optional[str]], raw_votes: List[Optional[str]]) -> List[Dict[str, Any]]:
+    # гарячий шлях кожного опитування черги: JSON з Redis -> dict відповіді напряму,
+    # без проміжного Track (ті самі нормалізації, що в Track.from_json)
     out: List[Dict[str, Any]] = []
     for tid, js, v in zip(ids, raw_items, raw_votes):
         if not js:
             continue
 
         try:
-            t = Track.from_json(js)
+            obj = loads(js)
         except Exception:
             continue
 
@@ -151,14 +225,104 @@ async def get_queue_snapshot(event_id: int, limit: int = 10) -> List[Dict[str, A
             votes = 0
 
         out.append({
-            "track_id": t.track_id or tid,
-            "title": t.title,
-            "artist": t.artist,
-            "cover_url": t.cover_url,
-            "duration_sec": t.duration_sec,
+            "track_id": str(obj.get("track_id") or "") or tid,
+            "title": str(obj.get("title") or ""),
+            "artist": obj.get("artist") or None,
+            "cover_url": proxied(obj.get("cover_url") or None),
+            "duration_sec": obj.get("duration_sec"),
             "votes": votes,
-            "suggested_by": t.suggested_by,
-            "created_at": t.created_at,
+            "suggested_by": obj.get("suggested_by"),
+            "created_at": int(obj.get("created_at") or 0),
         })
 
-    return out
\ No newline at end of file
+    return out
+
+
+# Усе, що треба клієнту, за один round trip: HMGET залежить від LRANGE / логу змін,
+# тож звичайним pipeline це два походи — скриптом один.
+# ARGV: tg_id або '', limit, since або ''
+_QUEUE_STATE_LUA = """
+if ARGV[1] ~= '' then
+  redis.call('SADD', KEYS[1], ARGV[1])
+end
+local attendees = redis.call('SCARD', KEYS[1])
+local seq = tonumber(redis.call('GET', KEYS[5]) or '0')
+local floor = tonumber(redis.call('GET', KEYS[7]) or '0')
+local since = tonumber(ARGV[3])
+
+local full = 1
+local ids = {}
+if since and since >= floor and since <= seq then
+  full = 0
+  local seen = {}
+  for _, entry in ipairs(redis.call('ZRANGEBYSCORE', KEYS[6], '(' .. since, '+inf')) do
+    local tid = string.sub(entry, string.find(entry, ':', 1, true) + 1)
+    if not seen[tid] then
+      seen[tid] = true
+      ids[#ids + 1] = tid
+    end
+  end
+else
+  ids = redis.call('LRANGE', KEYS[2], 0, tonumber(ARGV[2]) - 1)
+end
+
+local items, votes = {}, {}
+if #ids > 0 then
+  items = redis.call('HMGET', KEYS[3], unpack(ids))
+  votes = redis.call('HMGET', KEYS[4], unpack(ids))
+end
+return {attendees, seq, full, ids, items, votes}
+"""
+
+
+async def get_queue_state(
+        event_id: int,
+        tg_id: Optional[int],
+        limit: int = 20,
+        since: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Без since (або since вже випав із логу) — повний snapshot:
+      {"version", "full": True, "items", "attendees_count"}
+    Інакше лише те, що змінилось після since:
+      {"version", "full": False, "items": [додані/змінені], "removed": [track_id], "attendees_count"}
+    Реєструє відвідувача, якщо є tg_id.
+    """
+    limit = max(1, min(int(limit or 10), 200))
+    attendees, seq, full, ids, raw_items, raw_votes = await redis_client.eval(
+        _QUEUE_STATE_LUA,
+        7,
+        k_attendees(event_id),
+        k_queue_order(event_id),
+        k_queue_items(event_id),
+        k_votes(event_id),
+        k_stream_seq(event_id),
+        k_queue_changes(event_id),
+        k_queue_changes_floor(event_id),
+        str(tg_id) if tg_id else "",
+        limit,
+        "" if since is None else int(since),
+    )
+    # Lua-таблиці з nil обрізаються — вирівнюємо довжини
+    raw_items = list(raw_items) + [None] * (len(ids) - len(raw_items))
+    raw_votes = list(raw_votes) + [None] * (len(ids) - len(raw_votes))
+
+    state: Dict[str, Any] = {
+        "version": int(seq or 0),
+        "full": bool(full),
+        "items": _snapshot_items(ids, raw_items, raw_votes),
+        "attendees_count": int(attendees or 0),
+    }
+    if not full:
+        state["removed"] = [tid for tid, js in zip(ids, raw_items) if not js]
+    return state
+
+
+async def get_bootstrap_state(
+        event_id: int,
+        tg_id: Optional[int],
+        limit: int = 20,
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """(queue snapshot, attendees_count, stream seq); реєструє відвідувача, якщо є tg_id."""
+    state = await get_queue_state(event_id, tg_id, limit=limit)
+    return state["items"], state["attendees_count"], state["version"]
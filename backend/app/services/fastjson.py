@@ -0,0 +1,116 @@
+"""
+Готові до відправки JSON-байти: швидкий енкодер (orjson, якщо встановлений)
+і стиснуті варіанти, які рахуються один раз і живуть поруч із записом кешу.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - залежить від деплою
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+MIN_COMPRESS_BYTES = 512   # менше — заголовки з'їдять виграш
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 7
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return _iso(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _iso(dt: datetime) -> str:
+    s = dt.isoformat()
+    return s[:-6] + "Z" if s.endswith("+00:00") else s
+
+
+def dumps(obj: Any) -> bytes:
+    """datetime — як у pydantic (UTC з "Z"), тож рядки з БД можна віддавати без моделей."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def fields(obj: Any, model: Type[BaseModel]) -> Dict[str, Any]:
+    """Атрибути ORM-об'єкта / рядка рівно за полями схеми відповіді — без валідації."""
+    return {name: getattr(obj, name, None) for name in model.model_fields}
+
+
+def loads(raw: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def negotiate(accept_encoding: Optional[str]) -> str:
+    """Accept-Encoding -> "br" / "gzip" / "" (без стиснення). q-значення не розбираємо."""
+    if not accept_encoding:
+        return ""
+    ae = accept_encoding.lower()
+    if brotli is not None and "br" in ae:
+        return "br"
+    if "gzip" in ae:
+        return "gzip"
+    return ""
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match проти нашого ETag (RFC 9110 13.1.2): список через кому, слабке порівняння
+    (W/ ігнорується), "*" — збіг із будь-яким поточним представленням.
+    """
+    if not if_none_match:
+        return False
+    ours = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == ours:
+            return True
+    return False
+
+
+def compress(raw: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(raw, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    return raw
+
+
+class EncodedBody:
+    """JSON одного payload + ліниво пораховані gzip/br."""
+
+    __slots__ = ("payload", "raw", "_variants")
+
+    def __init__(self, payload: Any) -> None:
+        self.payload = payload
+        self.raw = dumps(payload)
+        self._variants: Dict[str, bytes] = {}
+
+    def body(self, encoding: str) -> Tuple[bytes, str]:
+        """(байти, Content-Encoding або "")."""
+        if not encoding or len(self.raw) < MIN_COMPRESS_BYTES:
+            return self.raw, ""
+        data = self._variants.get(encoding)
+        if data is None:
+            data = self._variants[encoding] = compress(self.raw, encoding)
+        return data, encoding
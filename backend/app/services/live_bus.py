@@ -1,6 +1,7 @@
 import asyncio
 from typing import Dict, Set, Optional
 from app.core.config import settings
+from app.services.event_keys import k_stream_seq
 
 # ---------- Local fallback ----------
 class LocalBus:
@@ -70,5 +71,26 @@ if settings.REDIS_URL:
 else:
     bus = LocalBus()
 
-async def publish_event(event_id: int, payload: dict):
-    await bus.publish(f"event:{event_id}", payload)
+# seq — наскрізний номер повідомлення в стрімі івенту: клієнт бачить пропуски
+# і знає, з якого місця продовжувати після bootstrap. INCR і PUBLISH атомарно,
+# інакше два паралельні паблішери можуть віддати seq не по порядку.
+_PUBLISH_SEQ_LUA = """
+local seq = redis.call('INCR', KEYS[1])
+local body = ARGV[2]
+if body == '{}' then
+  body = '{"seq":' .. seq .. '}'
+else
+  body = string.sub(body, 1, -2) .. ',"seq":' .. seq .. '}'
+end
+redis.call('PUBLISH', ARGV[1], body)
+return seq
+"""
+
+async def publish_event(event_id: int, payload: dict) -> Optional[int]:
+    topic = f"event:{event_id}"
+    if isinstance(bus, RedisBus):
+        import json
+        body = json.dumps(payload, separators=(",", ":"))
+        return int(await bus.redis.eval(_PUBLISH_SEQ_LUA, 1, k_stream_seq(event_id), topic, body))
+    await bus.publish(topic, payload)
+    return None
@@ -0,0 +1,141 @@
+"""
+Мінімальні in-process метрики у форматі Prometheus text exposition.
+Без зовнішніх залежностей: кожен воркер віддає свої значення на /metrics,
+агрегує вже Prometheus (sum by ...).
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+SUMMARY_WINDOW = 1024
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_gauges: Dict[str, Dict[LabelKey, float]] = {}
+_summaries: Dict[str, Dict[LabelKey, "_Summary"]] = {}
+_help: Dict[str, str] = {}
+_collectors: List[Callable[[], None]] = []
+
+
+class _Summary:
+    __slots__ = ("count", "total", "window")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.window: Deque[float] = deque(maxlen=SUMMARY_WINDOW)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.window.append(value)
+
+    def quantile(self, q: float) -> float:
+        return quantile(self.window, q)
+
+
+def quantile(values: Iterable[float], q: float) -> float:
+    data = sorted(values)
+    if not data:
+        return 0.0
+    idx = min(len(data) - 1, max(0, int(round(q * (len(data) - 1)))))
+    return data[idx]
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name: str, text: str) -> None:
+    _help[name] = text
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    series = _counters.setdefault(name, {})
+    k = _key(labels)
+    series[k] = series.get(k, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    _gauges.setdefault(name, {})[_key(labels)] = float(value)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    series = _summaries.setdefault(name, {})
+    k = _key(labels)
+    s = series.get(k)
+    if s is None:
+        s = series[k] = _Summary()
+    s.observe(value)
+
+
+def register_collector(fn: Callable[[], None]) -> None:
+    """fn викликається перед кожним рендером — зручно для gauge, які рахуються на льоту."""
+    _collectors.append(fn)
+
+
+class timer:
+    """with metrics.timer("x_seconds", route="..."): ..."""
+
+    def __init__(self, name: str, **labels) -> None:
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self) -> "timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(k: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = k + extra
+    if not pairs:
+        return ""
+    body = ",".join(f'{n}="{_esc(v)}"' for n, v in pairs)
+    return "{" + body + "}"
+
+
+def render() -> str:
+    for fn in list(_collectors):
+        try:
+            fn()
+        except Exception:
+            continue
+
+    lines: List[str] = []
+
+    def header(name: str, kind: str) -> None:
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for name, series in sorted(_counters.items()):
+        header(name, "counter")
+        for k, v in series.items():
+            lines.append(f"{name}{_fmt_labels(k)} {v}")
+
+    for name, series in sorted(_gauges.items()):
+        header(name, "gauge")
+        for k, v in series.items():
+            lines.append(f"{name}{_fmt_labels(k)} {v}")
+
+    for name, series in sorted(_summaries.items()):
+        header(name, "summary")
+        for k, s in series.items():
+            for q in SUMMARY_QUANTILES:
+                lines.append(f"{name}{_fmt_labels(k, (('quantile', str(q)),))} {s.quantile(q)}")
+            lines.append(f"{name}_sum{_fmt_labels(k)} {s.total}")
+            lines.append(f"{name}_count{_fmt_labels(k)} {s.count}")
+
+    return "\n".join(lines) + "\n"
@@ -1,32 +1,102 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import os
 import time
-from typing import Dict, List, Optional, Tuple
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 import httpx
 
+from app.core.redis_client import redis_client
+from app.services import metrics
+from app.services.cover_proxy import proxied
+from app.services.fastjson import EncodedBody
+from app.services.provider_health import get_health, ordered
+from app.services.search_providers import active_providers, configure_providers, register_provider
+
 SEARCH_TTL_SECONDS = 45  # короткий TTL => свіжо і швидко
+SEARCH_SWR_SECONDS = 5 * 60        # після TTL ще стільки віддаємо протухле одразу, оновлюючи у фоні
+SEARCH_STALE_IF_ERROR_SECONDS = 60 * 60  # а до цього — лише якщо провайдери лежать
+EMPTY_TTL_SECONDS = 20   # negative cache: "нічого не знайдено"
+FAILURE_TTL_SECONDS = 5  # обидва провайдери впали / таймаут — не довбемо їх на кожен символ
+MAX_CACHE_ENTRIES = 5000
 MAX_LIMIT = 25          # для autocomplete цього з головою
+SEARCH_DEADLINE_SECONDS = 2.0
+
+# можна підмінити на локальний fake_provider_server.py
+DEEZER_API_URL = os.getenv("DEEZER_API_URL", "https://api.deezer.com").rstrip("/")
+ITUNES_API_URL = os.getenv("ITUNES_API_URL", "https://itunes.apple.com").rstrip("/")
 
 # ---------- In-memory cache ----------
-_cache: Dict[str, Tuple[float, dict]] = {}
-_inflight: Dict[str, asyncio.Task] = {}
+# key -> (stored_at, fresh_ttl, payload); порядок — LRU (найдавніше використаний першим)
+_cache: "OrderedDict[str, Tuple[float, float, dict]]" = OrderedDict()
+# key -> до якого часу провайдери вважаються лежачими для цього запиту (stale-if-error);
+# stored_at запису в _cache при цьому не оновлюємо — вік протухлого не скидається
+_failed_until: Dict[str, float] = {}
+_inflight: Dict[str, "_Flight"] = {}
+# key -> готові байти відповіді для payload з _cache (валідні, поки payload той самий об'єкт)
+_bodies: Dict[str, EncodedBody] = {}
+
+
+class SearchUnavailable(Exception):
+    """Жоден провайдер не відповів (помилка або таймаут)."""
+
 
 def _now() -> float:
     return time.time()
 
-def cache_get(key: str) -> Optional[dict]:
+def cache_lookup(key: str) -> Tuple[Optional[dict], float]:
+    """
+    Повертає (payload, age_over_ttl):
+      age_over_ttl <= 0  -> свіжий запис
+      age_over_ttl > 0   -> протухлий, але ще в межах stale-if-error вікна
+    """
     rec = _cache.get(key)
     if not rec:
-        return None
-    ts, payload = rec
-    if _now() - ts > SEARCH_TTL_SECONDS:
+        return None, 0.0
+    ts, ttl, payload = rec
+    over = _now() - ts - ttl
+    if over > SEARCH_STALE_IF_ERROR_SECONDS:
         _cache.pop(key, None)
+        _bodies.pop(key, None)
+        return None, 0.0
+    _cache.move_to_end(key)
+    return payload, over
+
+def cache_get(key: str) -> Optional[dict]:
+    payload, over = cache_lookup(key)
+    if payload is None or over > 0:
         return None
     return payload
 
-def cache_put(key: str, payload: dict) -> None:
-    _cache[key] = (_now(), payload)
+def cache_put(key: str, payload: dict, ttl: float = SEARCH_TTL_SECONDS) -> None:
+    if key in _cache:
+        _cache.move_to_end(key)
+    else:
+        while len(_cache) >= MAX_CACHE_ENTRIES:
+            old, _ = _cache.popitem(last=False)
+            _bodies.pop(old, None)
+            _failed_until.pop(old, None)
+    _cache[key] = (_now(), ttl, payload)
+    body = _bodies.get(key)
+    if body is not None and body.payload is not payload:
+        _bodies.pop(key, None)
+
+def _mark_failed(key: str) -> None:
+    if len(_failed_until) >= MAX_CACHE_ENTRIES:
+        _failed_until.clear()
+    _failed_until[key] = _now() + FAILURE_TTL_SECONDS
+
+def _failing(key: str) -> bool:
+    until = _failed_until.get(key)
+    if until is None:
+        return False
+    if until <= _now():
+        _failed_until.pop(key, None)
+        return False
+    return True
 
 # ---------- Global shared HTTP client (KEEP-ALIVE) ----------
 # Важливо: створюємо 1 раз і перевикористовуємо (максимальний буст швидкості)
@@ -42,6 +112,11 @@ _client = httpx.AsyncClient(
 async def close_http_client() -> None:
     await _client.aclose()
 
+def _request_timeout(provider: str) -> httpx.Timeout:
+    # read-таймаут підлаштовується під p99 провайдера, а не фіксовані 2.5s
+    read = get_health(provider).timeout()
+    return httpx.Timeout(connect=min(1.5, read), read=read, write=2.0, pool=2.0)
+
 # ---------- Normalize helpers ----------
 def _pick_first(*vals):
     for v in vals:
@@ -91,14 +166,15 @@ def _dedupe_key(t: dict) -> Tuple[str, str]:
     return (t.get("title", "").strip().lower(), (t.get("artist") or "").strip().lower())
 
 # ---------- Providers ----------
+@register_provider("deezer")
 async def search_deezer(q: str, limit: int, lang: Optional[str]) -> List[dict]:
-    url = "https://api.deezer.com/search"
+    url = f"{DEEZER_API_URL}/search"
     params = {"q": q, "limit": max(1, min(limit, 50))}
     headers = {}
     if lang:
         headers["Accept-Language"] = lang
 
-    r = await _client.get(url, params=params, headers=headers)
+    r = await _client.get(url, params=params, headers=headers, timeout=_request_timeout("deezer"))
     r.raise_for_status()
     data = r.json()
     raw = data.get("data") or []
@@ -110,14 +186,15 @@ async def search_deezer(q: str, limit: int, lang: Optional[str]) -> List[dict]:
             continue
     return out
 
+@register_provider("itunes")
 async def search_itunes(q: str, limit: int, lang: Optional[str]) -> List[dict]:
-    url = "https://itunes.apple.com/search"
+    url = f"{ITUNES_API_URL}/search"
     params = {"term": q, "entity": "song", "limit": max(1, min(limit, 50))}
     headers = {}
     if lang:
         headers["Accept-Language"] = lang
 
-    r = await _client.get(url, params=params, headers=headers)
+    r = await _client.get(url, params=params, headers=headers, timeout=_request_timeout("itunes"))
     r.raise_for_status()
     data = r.json()
     raw = data.get("results") or []
@@ -129,71 +206,471 @@ async def search_itunes(q: str, limit: int, lang: Optional[str]) -> List[dict]:
             continue
     return out
 
+# SEARCH_PROVIDERS з env; усі провайдери вже зареєстровані вище / в search_providers
+configure_providers()
+
+async def _call_provider(name: str, q: str, limit: int, lang: Optional[str]) -> List[dict]:
+    health = get_health(name)
+    started = time.perf_counter()
+    try:
+        res = await active_providers()[name](q, limit, lang)
+    except asyncio.CancelledError:
+        health.release_probe()
+        raise
+    except Exception:
+        health.record_failure(time.perf_counter() - started)
+        raise
+    health.record_success(time.perf_counter() - started)
+    for t in res:
+        # 1000px з CDN на кожен телефон заради мініатюри — ні, через наш проксі
+        t["cover_url"] = proxied(t.get("cover_url"))
+    return res
+
 # ---------- Unified fast search ----------
-async def _unified_search_impl(q: str, limit: int, lang: Optional[str]) -> dict:
+async def _unified_search_impl(
+        q: str,
+        limit: int,
+        lang: Optional[str],
+        on_batch: Optional[Callable[[List[dict]], None]] = None,
+) -> dict:
     q = (q or "").strip()
     limit = max(1, min(int(limit or 10), MAX_LIMIT))
     if len(q) < 2:
         return {"items": []}
 
-    # 1) паралельно стартуємо 2 провайдера
-    t1 = asyncio.create_task(search_deezer(q, limit, lang))
-    t2 = asyncio.create_task(search_itunes(q, limit, lang))
+    # 1) порядок — за здоров'ям; провайдери з відкритим breaker пропускаємо
+    waiting = list(ordered(tuple(active_providers())))
+    if not waiting:
+        raise SearchUnavailable(q)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + SEARCH_DEADLINE_SECONDS
+    pending: Dict[asyncio.Task, str] = {}
+
+    def launch() -> str:
+        name = waiting.pop(0)
+        pending[asyncio.create_task(_call_provider(name, q, limit, lang))] = name
+        return name
+
+    # 2) primary одразу; наступного — лише якщо primary повільніший за свій p90,
+    #    впав або дав менше ніж limit
+    hedge_at = started + get_health(launch()).hedge_delay()
 
     items: List[dict] = []
     seen = set()
+    answered = 0
+    timed_out = False
 
-    # 2) беремо результати у міру готовності (найшвидший перший)
-    for fut in asyncio.as_completed([t1, t2], timeout=2):
-        try:
-            res = await fut
-        except Exception:
-            res = []
+    try:
+        while pending:
+            now = loop.time()
+            if now >= deadline:
+                timed_out = True
+                break
+
+            wait_until = min(deadline, hedge_at) if waiting else deadline
+            done, _ = await asyncio.wait(
+                pending, timeout=max(0.0, wait_until - now), return_when=asyncio.FIRST_COMPLETED
+            )
 
-        for it in res:
-            k = _dedupe_key(it)
-            if k in seen:
+            if not done:
+                if waiting and loop.time() >= hedge_at:
+                    name = launch()
+                    metrics.inc("search_hedged_requests_total", provider=name)
+                    hedge_at = loop.time() + get_health(name).hedge_delay()
                 continue
-            seen.add(k)
-            if not it.get("duration_sec"):
-                it["duration_sec"] = 0
-            items.append(it)
-            if len(items) >= limit:
-                # вже досить — гасимо інші таски якщо ще живі
-                if not t1.done():
-                    t1.cancel()
-                if not t2.done():
-                    t2.cancel()
-                return {"items": items[:limit]}
+
+            for t in done:
+                pending.pop(t, None)
+                try:
+                    res = t.result()
+                    answered += 1
+                except Exception:
+                    res = []
+
+                batch: List[dict] = []
+                for it in res:
+                    if len(items) >= limit:
+                        break
+                    k = _dedupe_key(it)
+                    if k in seen:
+                        continue
+                    seen.add(k)
+                    if not it.get("duration_sec"):
+                        it["duration_sec"] = 0
+                    items.append(it)
+                    batch.append(it)
+
+                if batch and on_batch:
+                    on_batch(batch)
+                if len(items) >= limit:
+                    # вже досить — решта тасок гаситься у finally
+                    return {"items": items[:limit]}
+
+            if waiting and not pending:
+                launch()
+    finally:
+        for t, name in pending.items():
+            if timed_out:
+                get_health(name).record_failure(loop.time() - started)
+            t.cancel()
+        for name in waiting:
+            get_health(name).release_probe()
+
+    if not answered:
+        raise SearchUnavailable(q)
 
     return {"items": items[:limit]}
 
-async def unified_search(q: str, limit: int, lang: Optional[str]) -> dict:
+class _Flight:
+    """
+    Один апстрім-пошук на key. unified_search чекає на task,
+    стрім читає батчі (нові дедупнуті items від кожного провайдера) по мірі появи.
+    """
+
+    def __init__(self) -> None:
+        self.batches: List[List[dict]] = []
+        self.finished = False
+        self.source = "upstream"  # "shared" — результат узяли з Redis іншого воркера
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _wake(self) -> None:
+        ev, self._changed = self._changed, asyncio.Event()
+        ev.set()
+
+    def push(self, batch: List[dict]) -> None:
+        self.batches.append(batch)
+        self._wake()
+
+    def finish(self) -> None:
+        self.finished = True
+        self._wake()
+
+    async def stream(self) -> AsyncIterator[List[dict]]:
+        i = 0
+        while True:
+            if i < len(self.batches):
+                i += 1
+                yield self.batches[i - 1]
+                continue
+            if self.finished:
+                return
+            await self._changed.wait()
+
+# ---------- Shared (Redis) tier + cross-worker single-flight ----------
+# _inflight дедупить лише в межах процесу. Між воркерами: короткий lease на key —
+# один воркер тягне апстрім, решта чекають на нотифікацію і читають спільний результат.
+SHARED_PREFIX = "search:"
+DONE_CHANNEL = "search:done"
+LEASE_MS = int((SEARCH_DEADLINE_SECONDS + 1.0) * 1000)  # лідер або встиг, або вважаємо мертвим
+NO_LEASE = ""  # Redis недоступний — працюємо як раніше, без координації
+TAKEOVER_ATTEMPTS = 2  # стільки разів чекаємо на нового лідера, далі тягнемо самі без lease
+
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_waiters: Dict[str, List[asyncio.Future]] = {}
+_listener: Optional[asyncio.Task] = None
+
+def _k_result(key: str) -> str:
+    return f"{SHARED_PREFIX}res:{key}"
+
+def _k_lease(key: str) -> str:
+    return f"{SHARED_PREFIX}lease:{key}"
+
+async def _shared_get(key: str) -> Optional[dict]:
+    try:
+        raw = await redis_client.get(_k_result(key))
+        return json.loads(raw) if raw else None
+    except Exception:
+        return None
+
+async def _acquire_lease(key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    try:
+        ok = await redis_client.set(_k_lease(key), token, nx=True, px=LEASE_MS)
+    except Exception:
+        return NO_LEASE
+    return token if ok else None
+
+async def _publish_and_release(key: str, token: Optional[str], entry: dict, ttl: float) -> None:
+    if not token:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(_k_result(key), json.dumps(entry, ensure_ascii=False, separators=(",", ":")), ex=max(1, int(ttl)))
+        pipe.publish(DONE_CHANNEL, key)
+        pipe.eval(_RELEASE_LUA, 1, _k_lease(key), token)
+        await pipe.execute()
+    except Exception:
+        pass
+
+async def _release_lease(key: str, token: Optional[str]) -> None:
+    if not token:
+        return
+    try:
+        await redis_client.eval(_RELEASE_LUA, 1, _k_lease(key), token)
+    except Exception:
+        pass
+
+async def _listen_done() -> None:
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(DONE_CHANNEL)
+    try:
+        async for msg in pubsub.listen():
+            if msg and msg.get("type") == "message":
+                for fut in _waiters.pop(msg["data"], []):
+                    if not fut.done():
+                        fut.set_result(True)
+    finally:
+        await pubsub.unsubscribe(DONE_CHANNEL)
+        await pubsub.aclose()
+
+def _ensure_listener() -> None:
+    global _listener
+    if _listener is None or _listener.done():
+        _listener = asyncio.create_task(_listen_done())
+
+async def _wait_for_leader(key: str) -> Optional[dict]:
+    _ensure_listener()
+    fut = asyncio.get_running_loop().create_future()
+    _waiters.setdefault(key, []).append(fut)
+    try:
+        # лідер міг закінчити між нашим SET NX і підпискою
+        shared = await _shared_get(key)
+        if shared is not None:
+            return shared
+        try:
+            await asyncio.wait_for(fut, LEASE_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        return await _shared_get(key)
+    finally:
+        lst = _waiters.get(key)
+        if lst and fut in lst:
+            lst.remove(fut)
+            if not lst:
+                _waiters.pop(key, None)
+
+def _from_stale_or_failure(key: str) -> dict:
+    stale, _ = cache_lookup(key)
+    if stale is not None:
+        # stale-if-error: віддаємо старе і не чіпаємо провайдерів FAILURE_TTL секунд;
+        # сам запис не перекладаємо — інакше кожен збій продовжував би вікно stale-if-error
+        _mark_failed(key)
+        return stale
+    resp = {"items": []}
+    cache_put(key, resp, ttl=FAILURE_TTL_SECONDS)
+    return resp
+
+def _store(key: str, resp: dict, ttl: Optional[float] = None) -> float:
+    if not resp["items"]:
+        ttl = EMPTY_TTL_SECONDS
+    elif ttl is None:
+        ttl = SEARCH_TTL_SECONDS
+    cache_put(key, resp, ttl=ttl)
+    _failed_until.pop(key, None)
+    return ttl
+
+async def _fetch_and_store(
+        key: str,
+        q: str,
+        limit: int,
+        lang: Optional[str],
+        flight: _Flight,
+        ttl: Optional[float] = None,
+) -> dict:
+    shared = await _shared_get(key)
+    token: Optional[str] = None
+
+    if shared is None:
+        token = await _acquire_lease(key)
+        if token is None:
+            # інший воркер уже тягне цей key
+            metrics.inc("search_singleflight_total", role="follower")
+            shared = await _wait_for_leader(key)
+            attempts = TAKEOVER_ATTEMPTS
+            while shared is None:
+                # лідер помер або не встиг — lease перехоплює один фоловер, решта чекають уже на нього
+                token = await _acquire_lease(key)
+                if token is not None:
+                    metrics.inc("search_singleflight_total", role="takeover")
+                    break
+                attempts -= 1
+                if attempts <= 0:
+                    token = NO_LEASE
+                    break
+                shared = await _wait_for_leader(key)
+        else:
+            metrics.inc("search_singleflight_total", role="leader")
+
+    if shared is not None:
+        metrics.inc("search_shared_hits_total")
+        flight.source = "shared"
+        if shared.get("failed"):
+            return _from_stale_or_failure(key)
+        resp = {"items": shared.get("items") or []}
+        if resp["items"]:
+            flight.push(resp["items"])
+        _store(key, resp, ttl)
+        return resp
+
+    try:
+        resp = await _unified_search_impl(q, limit, lang, on_batch=flight.push)
+    except SearchUnavailable:
+        await _publish_and_release(key, token, {"items": [], "failed": True}, FAILURE_TTL_SECONDS)
+        return _from_stale_or_failure(key)
+    except BaseException:
+        # скасували (shutdown) — просто віддаємо lease, фоловери підхоплять після таймауту
+        await _release_lease(key, token)
+        raise
+
+    ttl = _store(key, resp, ttl)
+    await _publish_and_release(key, token, resp, ttl)
+    return resp
+
+def _start_fetch(key: str, q: str, limit: int, lang: Optional[str], ttl: Optional[float] = None) -> _Flight:
+    # in-flight dedupe: один апстрім-запит на key
+    flight = _inflight.get(key)
+    if flight and not flight.finished:
+        return flight
+
+    flight = _Flight()
+    task = asyncio.create_task(_fetch_and_store(key, q, limit, lang, flight, ttl))
+    flight.task = task
+    _inflight[key] = flight
+
+    def _cleanup(t: asyncio.Task) -> None:
+        flight.finish()
+        if _inflight.get(key) is flight:
+            _inflight.pop(key, None)
+        if not t.cancelled():
+            t.exception()  # щоб фонові помилки не сипались у лог як "never retrieved"
+
+    task.add_done_callback(_cleanup)
+    return flight
+
+def norm_lang(lang: Optional[str]) -> str:
+    """"uk-UA,uk;q=0.9,en;q=0.8" -> "uk": ключ кешу не дробимо на варіанти Accept-Language."""
+    if not lang:
+        return ""
+    return lang.split(",", 1)[0].split(";", 1)[0].split("-", 1)[0].strip().lower()
+
+def _cache_key(q: str, limit: int, lang: Optional[str]) -> str:
+    return f"s:{norm_lang(lang)}:{q.strip().lower()}|{min(int(limit or 10), MAX_LIMIT)}"
+
+def _cached_or_none(key: str, q: str, limit: int, lang: Optional[str]) -> Tuple[Optional[dict], str]:
+    cached, over = cache_lookup(key)
+    if cached is not None:
+        if over <= 0:
+            metrics.inc("search_cache_total", result="fresh")
+            return cached, "fresh"
+        if _failing(key):
+            # провайдери щойно впали на цьому запиті — протухле (у межах stale-if-error), без апстріму
+            metrics.inc("search_cache_total", result="stale")
+            return cached, "stale"
+        if over <= SEARCH_SWR_SECONDS:
+            # протухло недавно — віддаємо одразу, оновлюємо у фоні
+            metrics.inc("search_cache_total", result="stale")
+            _start_fetch(key, q, limit, lang)
+            return cached, "stale"
+
+    flight = _inflight.get(key)
+    outcome = "inflight" if flight and not flight.finished else "miss"
+    metrics.inc("search_cache_total", result=outcome)
+    return None, outcome
+
+async def search_with_outcome(
+        q: str,
+        limit: int,
+        lang: Optional[str],
+        ttl: Optional[float] = None,
+) -> Tuple[dict, str]:
+    """
+    unified_search + звідки прийшла відповідь:
+    fresh / stale — локальний кеш, shared — Redis (інший воркер чи прогрів),
+    inflight — приєднались до чужого апстрім-запиту, miss — самі пішли до провайдерів.
+    ttl — свіжість для результату, якщо його доведеться тягнути (прогрів кладе довше).
+    """
+    return await _search(_cache_key(q, limit, lang), q, limit, lang, ttl)
+
+async def _search(key: str, q: str, limit: int, lang: Optional[str], ttl: Optional[float]) -> Tuple[dict, str]:
+    started = time.perf_counter()
+    resp, outcome = _cached_or_none(key, q, limit, lang)
+    if resp is None:
+        flight = _start_fetch(key, q, limit, lang, ttl)
+        # shield: якщо клієнт відвалився, спільний запит для інших не скасовуємо
+        resp = await asyncio.shield(flight.task)
+        if flight.source == "shared":
+            outcome = "shared"
+    metrics.observe("search_time_to_first_result_seconds", time.perf_counter() - started, mode="blocking")
+    return resp, outcome
+
+async def unified_search(q: str, limit: int, lang: Optional[str], ttl: Optional[float] = None) -> dict:
     """
     Максимально швидко:
-    - cache
+    - cache (+ stale-while-revalidate, negative/failure cache)
     - in-flight dedupe (один запит на key навіть якщо 100 юзерів друкують одночасно)
     - паралельний Deezer+iTunes
     - early stop
     """
-    key = f"s:{lang or ''}:{q.strip().lower()}|{min(int(limit or 10), MAX_LIMIT)}"
-    cached = cache_get(key)
-    if cached:
-        return cached
+    resp, _ = await search_with_outcome(q, limit, lang, ttl)
+    return resp
 
-    # in-flight dedupe
-    task = _inflight.get(key)
-    if task and not task.done():
-        return await task
+def _encoded(key: str, resp: dict) -> EncodedBody:
+    body = _bodies.get(key)
+    if body is not None and body.payload is resp:
+        return body
+    body = EncodedBody(resp)
+    rec = _cache.get(key)
+    if rec is not None and rec[2] is resp:
+        # кешуємо байти лише для того, що лежить у кеші — інакше вони одразу застаріють
+        _bodies[key] = body
+    return body
 
-    task = asyncio.create_task(_unified_search_impl(q, limit, lang))
-    _inflight[key] = task
+async def search_encoded(q: str, limit: int, lang: Optional[str]) -> Tuple[EncodedBody, str]:
+    """
+    Те саме, що search_with_outcome, але одразу JSON-байти: на теплому кеші
+    ні валідації, ні повторного енкодингу — лише віддати готовий (стиснутий) body.
+    """
+    key = _cache_key(q, limit, lang)
+    resp, outcome = await _search(key, q, limit, lang, None)
+    return _encoded(key, resp), outcome
 
-    try:
-        resp = await task
-        cache_put(key, resp)
-        return resp
-    finally:
-        # cleanup inflight
-        if _inflight.get(key) is task:
-            _inflight.pop(key, None)
+async def unified_search_stream(q: str, limit: int, lang: Optional[str]) -> AsyncIterator[dict]:
+    """
+    Те саме, але прогресивно: перший кадр — дедупнуті результати найшвидшого провайдера,
+    далі — лише додані іншими провайдерами. Кеш і in-flight dedupe спільні з unified_search.
+    Кадри: {"type": "items", "items": [...]} ... {"type": "done", "count": N}
+    """
+    started = time.perf_counter()
+    key = _cache_key(q, limit, lang)
+
+    cached, _ = _cached_or_none(key, q, limit, lang)
+    if cached is not None:
+        metrics.observe("search_time_to_first_result_seconds", time.perf_counter() - started, mode="stream")
+        yield {"type": "items", "items": cached["items"]}
+        yield {"type": "done", "count": len(cached["items"])}
+        return
+
+    flight = _start_fetch(key, q, limit, lang)
+    sent = 0
+    async for batch in flight.stream():
+        if not sent:
+            metrics.observe("search_time_to_first_result_seconds", time.perf_counter() - started, mode="stream")
+        sent += len(batch)
+        yield {"type": "items", "items": batch}
+
+    resp = await asyncio.shield(flight.task)
+    if not sent and resp["items"]:
+        # stale-if-error: батчів не було, але є що віддати
+        metrics.observe("search_time_to_first_result_seconds", time.perf_counter() - started, mode="stream")
+        sent = len(resp["items"])
+        yield {"type": "items", "items": resp["items"]}
+    yield {"type": "done", "count": sent}
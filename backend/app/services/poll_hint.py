@@ -0,0 +1,120 @@
+"""
+Адаптивний інтервал опитування для /queue і summary.
+
+Клієнти без WS опитують чергу. Фіксований інтервал або марнує запити в тихій залі,
+або запізнюється на піку. Сервер сам підказує, коли приходити наступного разу:
+- темп змін івенту: EWMA приросту версії черги (seq стріму) між опитуваннями —
+  кожен воркер бачить опитування, тож окремий лічильник у Redis не потрібен
+- інтервал ≈ POLL_TARGET_CHANGES / темп, у межах [POLL_MIN_SECONDS, POLL_MAX_SECONDS]
+- навантаження: запити в обробці цього воркера / POLL_MAX_INFLIGHT; вище LOAD_SOFT
+  інтервал множиться (до LOAD_MAX_FACTOR), на перевантаженні додаємо Retry-After
+
+Заголовки: X-Poll-Interval (секунди) завжди, Retry-After — лише коли воркер перевантажений.
+"""
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from app.services import metrics
+
+POLL_MIN_SECONDS = float(os.getenv("POLL_MIN_SECONDS", "2"))
+POLL_MAX_SECONDS = float(os.getenv("POLL_MAX_SECONDS", "30"))
+POLL_DEFAULT_SECONDS = 5.0          # поки темп невідомий
+POLL_TARGET_CHANGES = 1.0           # скільки змін у середньому "накопичуємо" між опитуваннями
+POLL_MAX_INFLIGHT = int(os.getenv("POLL_MAX_INFLIGHT", "256"))
+
+RATE_TAU_SECONDS = 30.0             # пам'ять EWMA: пік вмикається за секунди, гасне за хвилину
+MIN_SAMPLE_SECONDS = 0.5            # частіші опитування не зсувають оцінку (шум)
+LOAD_SOFT = 0.7
+LOAD_MAX_FACTOR = 4.0
+MAX_EVENTS = 10_000
+
+# event_id -> (час останнього зразка, версія, EWMA змін/с або None до другого зразка)
+_rates: Dict[int, Tuple[float, int, Optional[float]]] = {}
+_inflight = 0
+
+metrics.describe("http_requests_inflight", "HTTP-запити в обробці цим воркером")
+metrics.register_collector(lambda: metrics.set_gauge("http_requests_inflight", _inflight))
+
+
+# ---------- Change rate ----------
+def observe(event_id: int, version: int, now: Optional[float] = None) -> Optional[float]:
+    """Нова версія черги з опитування -> оновлена оцінка темпу змін (змін/с); None, поки зразок лише один."""
+    now = time.monotonic() if now is None else now
+    prev = _rates.get(event_id)
+    if prev is None:
+        if len(_rates) >= MAX_EVENTS:
+            _rates.clear()
+        _rates[event_id] = (now, version, None)
+        return None
+
+    ts, seen, rate = prev
+    dt = now - ts
+    if dt < MIN_SAMPLE_SECONDS:
+        return rate
+    inst = max(0, version - seen) / dt
+    if rate is None:
+        rate = inst
+    else:
+        rate += (1.0 - math.exp(-dt / RATE_TAU_SECONDS)) * (inst - rate)
+    _rates[event_id] = (now, max(version, seen), rate)
+    return rate
+
+
+def change_rate(event_id: int) -> Optional[float]:
+    prev = _rates.get(event_id)
+    return prev[2] if prev else None
+
+
+# ---------- Load ----------
+def load() -> float:
+    return _inflight / POLL_MAX_INFLIGHT if POLL_MAX_INFLIGHT > 0 else 0.0
+
+
+def _load_factor(current: float) -> float:
+    if current <= LOAD_SOFT:
+        return 1.0
+    return min(LOAD_MAX_FACTOR, (current / LOAD_SOFT) ** 2)
+
+
+class InflightMiddleware:
+    """Чистий ASGI (без BaseHTTPMiddleware): лічильник запитів у обробці."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        global _inflight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        _inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _inflight -= 1
+
+
+# ---------- Hint ----------
+def interval(event_id: int, current_load: Optional[float] = None) -> float:
+    rate = change_rate(event_id)
+    if rate is None:
+        base = POLL_DEFAULT_SECONDS
+    elif rate <= 0:
+        base = POLL_MAX_SECONDS
+    else:
+        base = POLL_TARGET_CHANGES / rate
+    base = min(POLL_MAX_SECONDS, max(POLL_MIN_SECONDS, base))
+    return base * _load_factor(load() if current_load is None else current_load)
+
+
+def hint_headers(event_id: int) -> Dict[str, str]:
+    current = load()
+    secs = str(max(1, math.ceil(interval(event_id, current))))
+    headers = {"X-Poll-Interval": secs}
+    if current >= 1.0:
+        headers["Retry-After"] = secs
+    return headers
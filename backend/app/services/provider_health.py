@@ -0,0 +1,172 @@
+"""
+Здоров'я апстрім-провайдерів пошуку:
+- EWMA латентності та частки помилок + вікно останніх вимірів для перцентилів
+- circuit breaker: closed -> open (не ходимо) -> half_open (одна проба) -> closed
+- з цього ж рахуємо hedge-затримку (p90) і адаптивний таймаут (p99)
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from app.services import metrics
+
+EWMA_ALPHA = 0.2
+WINDOW = 200
+
+FAIL_THRESHOLD = 5            # підряд помилок => open
+ERROR_RATE_THRESHOLD = 0.5    # або EWMA помилок вище цього (при достатній кількості вимірів)
+MIN_SAMPLES = 10
+OPEN_BASE_SECONDS = 10.0
+OPEN_MAX_SECONDS = 120.0
+
+HEDGE_MIN = 0.15
+HEDGE_MAX = 1.5
+HEDGE_DEFAULT = 0.4           # поки нема статистики
+
+TIMEOUT_MIN = 0.8
+TIMEOUT_MAX = 2.5
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class ProviderHealth:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.ewma_latency: float = 0.0
+        self.ewma_errors: float = 0.0
+        self.samples = 0
+        self.latencies: Deque[float] = deque(maxlen=WINDOW)
+        self.consecutive_failures = 0
+
+        self.state = CLOSED
+        self.opened_until = 0.0
+        self.open_seconds = OPEN_BASE_SECONDS
+        self.probe_in_flight = False
+
+    # ---------- breaker ----------
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN and now >= self.opened_until:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def _open(self) -> None:
+        if self.state == HALF_OPEN:
+            # проба не вдалась — відкриваємо на довше
+            self.open_seconds = min(self.open_seconds * 2, OPEN_MAX_SECONDS)
+        self.state = OPEN
+        self.probe_in_flight = False
+        self.opened_until = time.monotonic() + self.open_seconds
+        metrics.inc("search_provider_circuit_opened_total", provider=self.name)
+
+    def _ewma(self, prev: float, value: float) -> float:
+        if self.samples <= 1:
+            return value
+        return prev + EWMA_ALPHA * (value - prev)
+
+    def record_success(self, latency: float) -> None:
+        self.samples += 1
+        self.latencies.append(latency)
+        self.ewma_latency = self._ewma(self.ewma_latency, latency)
+        self.ewma_errors = self._ewma(self.ewma_errors, 0.0)
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.open_seconds = OPEN_BASE_SECONDS
+            self.probe_in_flight = False
+        metrics.inc("search_provider_requests_total", provider=self.name, outcome="ok")
+
+    def record_failure(self, latency: float) -> None:
+        self.samples += 1
+        # таймаут теж латентність — інакше p90 "гарний" саме тоді, коли провайдер висне
+        self.latencies.append(latency)
+        self.ewma_latency = self._ewma(self.ewma_latency, latency)
+        self.ewma_errors = self._ewma(self.ewma_errors, 1.0)
+        self.consecutive_failures += 1
+        metrics.inc("search_provider_requests_total", provider=self.name, outcome="error")
+
+        if self.state == HALF_OPEN:
+            self._open()
+        elif self.consecutive_failures >= FAIL_THRESHOLD or (
+            self.samples >= MIN_SAMPLES and self.ewma_errors >= ERROR_RATE_THRESHOLD
+        ):
+            self._open()
+
+    def release_probe(self) -> None:
+        """Пробний запит скасували (нас випередив інший провайдер) — дозволяємо наступну пробу."""
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = False
+
+    # ---------- scheduling ----------
+    def percentile(self, q: float) -> float:
+        return metrics.quantile(self.latencies, q)
+
+    def score(self) -> float:
+        """Менше = краще. Невідомий провайдер не штрафуємо."""
+        if not self.samples:
+            return 0.0
+        return self.ewma_latency * (1.0 + 4.0 * self.ewma_errors)
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < MIN_SAMPLES:
+            return HEDGE_DEFAULT
+        return min(HEDGE_MAX, max(HEDGE_MIN, self.percentile(0.9)))
+
+    def timeout(self) -> float:
+        if len(self.latencies) < MIN_SAMPLES:
+            return TIMEOUT_MAX
+        return min(TIMEOUT_MAX, max(TIMEOUT_MIN, self.percentile(0.99) * 2))
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "samples": self.samples,
+            "ewma_latency": round(self.ewma_latency, 4),
+            "ewma_error_rate": round(self.ewma_errors, 4),
+            "p50": round(self.percentile(0.5), 4),
+            "p90": round(self.percentile(0.9), 4),
+            "p99": round(self.percentile(0.99), 4),
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+_health: Dict[str, ProviderHealth] = {}
+
+
+def get_health(name: str) -> ProviderHealth:
+    h = _health.get(name)
+    if h is None:
+        h = _health[name] = ProviderHealth(name)
+    return h
+
+
+def all_health() -> Dict[str, ProviderHealth]:
+    return dict(_health)
+
+
+def _collect() -> None:
+    for name, h in _health.items():
+        metrics.set_gauge("search_provider_latency_ewma_seconds", h.ewma_latency, provider=name)
+        metrics.set_gauge("search_provider_error_rate_ewma", h.ewma_errors, provider=name)
+        metrics.set_gauge("search_provider_circuit_state", _STATE_VALUE[h.state], provider=name)
+        for q in (0.5, 0.9, 0.99):
+            metrics.set_gauge("search_provider_latency_seconds", h.percentile(q), provider=name, quantile=q)
+
+
+metrics.describe("search_provider_circuit_state", "0=closed, 1=half_open, 2=open")
+metrics.register_collector(_collect)
+
+
+def ordered(names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Доступні (breaker пропускає) провайдери, найздоровіший перший."""
+    allowed = [n for n in names if get_health(n).allow()]
+    return tuple(sorted(allowed, key=lambda n: get_health(n).score()))
@@ -0,0 +1,186 @@
+"""
+Кеш стану раунду для GET /public/event/{token}/state.
+
+Відповідь однакова для всіх, крім user_voted_song_ids, тож:
+- спільна частина (event, round, songs) — готові байти в Redis event:{id}:round_state,
+  по одному запису на версію раунду; зміна складу (нова/видалена пісня, кінець раунду)
+  -> invalidate(): INCR покоління + DEL, запис після читання з БД проходить лише якщо
+  покоління не змінилось (як event_cache)
+- голоси запис не скидають: актуальні лічильники живуть у round:{rid}:song_votes
+  (buffered — vote_ingest, sync — set_counts() до COMMIT, поки тримається блокування
+  рядка пісні, тож записи однієї пісні приходять у порядку комітів) і накладаються
+  на спільні байти при читанні
+- персональна частина — множина round:{rid}:user:{uid}:votes; SENTINEL у ній означає
+  "заповнена з БД", голоси додаються SADD одразу після запису
+- відповідь склеюється з байтів без повторного енкоду спільної частини
+
+Гарячий шлях: MGET (стан + покоління) і pipeline HGETALL + SMEMBERS, без SQL.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.redis_client import redis_client
+from app.services import metrics
+from app.services.event_keys import (
+    k_round_state,
+    k_round_state_gen,
+    k_round_user_votes,
+    k_round_vote_counts,
+)
+from app.services.fastjson import dumps, loads
+
+STATE_TTL_SECONDS = 10 * 60
+USER_VOTES_TTL_SECONDS = 12 * 3600
+COUNTS_TTL_SECONDS = 24 * 3600   # як dedupe-ключі vote_ingest
+SENTINEL = "0"               # id пісень починаються з 1
+
+metrics.describe("round_state_cache_total", "Читання стану раунду за результатом (hit|miss|error)")
+metrics.describe("round_user_votes_total", "Читання голосів користувача в раунді (hit|miss)")
+
+# SET лише якщо покоління те саме, що було до читання з БД
+_STORE_LUA = """
+local gen = redis.call('GET', KEYS[2]) or '0'
+if gen == ARGV[1] then
+  redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+  return 1
+end
+return 0
+"""
+
+
+def shared_body(event: dict, round_: dict, songs: list) -> bytes:
+    return dumps({"event": event, "round": round_, "songs": songs})
+
+
+def with_user(shared: bytes, my_ids: Iterable[int]) -> bytes:
+    """Спільні байти + user_voted_song_ids -> повний StateResponse."""
+    return shared[:-1] + b',"user_voted_song_ids":' + dumps(sorted(my_ids)) + b"}"
+
+
+def with_counts(shared: bytes, counts: Dict[int, int]) -> bytes:
+    """Накладає живі лічильники на спільні байти; перекодовує лише якщо щось змінилось."""
+    if not counts:
+        return shared
+    doc = loads(shared)
+    songs = doc["songs"]
+    changed = False
+    for song in songs:
+        votes = counts.get(song["id"])
+        if votes is not None and votes != song["votes"]:
+            song["votes"] = votes
+            changed = True
+    if not changed:
+        return shared
+    songs.sort(key=lambda song: (-song["votes"], song["id"]))
+    return dumps(doc)
+
+
+# ---------- Shared part ----------
+async def lookup(event_id: int) -> Tuple[Optional[int], Optional[bytes], str]:
+    """(round_id, спільні байти, покоління для store()); на промаху — (None, None, покоління)."""
+    try:
+        raw, gen = await redis_client.mget(k_round_state(event_id), k_round_state_gen(event_id))
+    except Exception:
+        metrics.inc("round_state_cache_total", result="error")
+        return None, None, ""
+    if raw:
+        rid, _, body = raw.partition("|")
+        metrics.inc("round_state_cache_total", result="hit")
+        return int(rid), body.encode(), ""
+    metrics.inc("round_state_cache_total", result="miss")
+    return None, None, gen or "0"
+
+
+async def store(event_id: int, round_id: int, shared: bytes, gen: str) -> None:
+    if not gen:
+        return
+    try:
+        await redis_client.eval(
+            _STORE_LUA, 2, k_round_state(event_id), k_round_state_gen(event_id),
+            gen, f"{round_id}|{shared.decode()}", STATE_TTL_SECONDS,
+        )
+    except Exception:
+        return
+
+
+async def invalidate(event_id: int) -> None:
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.incr(k_round_state_gen(event_id))
+    pipe.delete(k_round_state(event_id))
+    await pipe.execute()
+
+
+# ---------- Live counts ----------
+async def set_counts(round_id: int, counts: Dict[int, int]) -> None:
+    """sync-режим: нові значення лічильників; викликати до COMMIT, під блокуванням рядків пісень."""
+    key = k_round_vote_counts(round_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(key, mapping=counts)
+    pipe.expire(key, COUNTS_TTL_SECONDS)
+    try:
+        await pipe.execute()
+    except Exception:
+        await drop_counts(round_id, counts)
+
+
+async def drop_counts(round_id: int, song_ids: Iterable[int]) -> None:
+    """Прибирає лічильники, яким не можна вірити (COMMIT не вдався) — читання візьме значення з БД."""
+    try:
+        await redis_client.hdel(k_round_vote_counts(round_id), *song_ids)
+    except Exception:
+        return
+
+
+async def live(round_id: int, user_id: int) -> Tuple[Dict[int, int], Optional[List[int]]]:
+    """(лічильники раунду, голоси користувача або None, якщо множину ще не заповнено з БД)."""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hgetall(k_round_vote_counts(round_id))
+    pipe.smembers(k_round_user_votes(round_id, user_id))
+    try:
+        raw, members = await pipe.execute()
+    except Exception:
+        raw, members = {}, set()
+    return {int(k): int(v) for k, v in raw.items()}, _members(members)
+
+
+# ---------- Per-user part ----------
+def _members(members) -> Optional[List[int]]:
+    if SENTINEL not in members:
+        metrics.inc("round_user_votes_total", result="miss")
+        return None
+    metrics.inc("round_user_votes_total", result="hit")
+    return [int(m) for m in members if m != SENTINEL]
+
+
+async def fill_user_votes(round_id: int, user_id: int, song_ids: Iterable[int]) -> None:
+    key = k_round_user_votes(round_id, user_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.sadd(key, SENTINEL, *song_ids)
+    pipe.expire(key, USER_VOTES_TTL_SECONDS)
+    try:
+        await pipe.execute()
+    except Exception:
+        return
+
+
+async def add_user_vote(round_id: int, user_id: int, song_id: int) -> None:
+    # без SENTINEL множина лишається "незаповненою" — наступне читання доповнить її з БД
+    key = k_round_user_votes(round_id, user_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.sadd(key, song_id)
+    pipe.expire(key, USER_VOTES_TTL_SECONDS)
+    await pipe.execute()
+
+
+async def remove_user_vote(round_id: int, user_id: int, song_id: int) -> None:
+    await redis_client.srem(k_round_user_votes(round_id, user_id), song_id)
+
+
+async def move_user_vote(round_id: int, user_id: int, from_song_id: int, song_id: int) -> None:
+    key = k_round_user_votes(round_id, user_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.srem(key, from_song_id)
+    pipe.sadd(key, song_id)
+    pipe.expire(key, USER_VOTES_TTL_SECONDS)
+    await pipe.execute()
@@ -0,0 +1,151 @@
+"""
+Реєстр провайдерів пошуку.
+
+Провайдер — це async callable (q, limit, lang) -> list[dict] у нормалізованому
+форматі music_search (id/title/artist/album/cover_url/duration_sec/source).
+Реальні провайдери (deezer, itunes) реєструються в music_search; які з них
+активні — вирішує деплой через SEARCH_PROVIDERS (порядок = пріоритет при рівному здоров'ї).
+
+    SEARCH_PROVIDERS=deezer,itunes   # прод
+    SEARCH_PROVIDERS=mock            # локально / бенчмарки, без інтернету
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import random
+import zlib
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+ProviderFn = Callable[[str, int, Optional[str]], Awaitable[List[dict]]]
+
+DEFAULT_PROVIDERS = "deezer,itunes"
+
+_registry: Dict[str, ProviderFn] = {}
+_active: Dict[str, ProviderFn] = {}
+
+
+def register_provider(name: str, fn: Optional[ProviderFn] = None):
+    """Можна як функцію: register_provider("x", fn), або як декоратор: @register_provider("x")."""
+    if fn is not None:
+        _registry[name] = fn
+        return fn
+
+    def deco(f: ProviderFn) -> ProviderFn:
+        _registry[name] = f
+        return f
+
+    return deco
+
+
+def registered() -> Dict[str, ProviderFn]:
+    return dict(_registry)
+
+
+def configure_providers(names: Optional[Iterable[str] | str] = None) -> Dict[str, ProviderFn]:
+    if names is None:
+        names = os.getenv("SEARCH_PROVIDERS", DEFAULT_PROVIDERS)
+    if isinstance(names, str):
+        names = [n.strip() for n in names.split(",")]
+
+    active: Dict[str, ProviderFn] = {}
+    for n in names:
+        if not n:
+            continue
+        if n not in _registry:
+            raise ValueError(f"Unknown search provider: {n}")
+        active[n] = _registry[n]
+
+    _active.clear()
+    _active.update(active)
+    return dict(_active)
+
+
+def active_providers() -> Dict[str, ProviderFn]:
+    return _active
+
+
+# ---------- Local mock provider ----------
+class Latency:
+    """
+    Розподіл затримки з рядка:
+      fixed:80              — завжди 80ms
+      uniform:50:150        — рівномірно 50..150ms
+      lognormal:80:0.5      — медіана 80ms, sigma 0.5 (довгий хвіст, як у реальних API)
+    """
+
+    def __init__(self, spec: str) -> None:
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.args = [float(x) for x in parts[1:]]
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rnd: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = rnd.uniform(self.args[0], self.args[1])
+        else:
+            ms = rnd.lognormvariate(math.log(self.args[0]), self.args[1])
+        return max(0.0, ms) / 1000
+
+
+class MockProvider:
+    """
+    Детермінований (за seed) фейковий провайдер: результат залежить лише від q,
+    тож dedupe/кеш поводяться як із реальними API.
+    """
+
+    def __init__(
+            self,
+            name: str = "mock",
+            latency: str = "lognormal:80:0.5",
+            items: int = 25,
+            payload_bytes: int = 0,
+            error_rate: float = 0.0,
+            seed: int = 42,
+    ) -> None:
+        self.name = name
+        self.latency = Latency(latency)
+        self.items = items
+        self.payload_bytes = payload_bytes
+        self.error_rate = error_rate
+        self.rnd = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls, name: str = "mock") -> "MockProvider":
+        return cls(
+            name=name,
+            latency=os.getenv("MOCK_SEARCH_LATENCY", "lognormal:80:0.5"),
+            items=int(os.getenv("MOCK_SEARCH_ITEMS", "25")),
+            payload_bytes=int(os.getenv("MOCK_SEARCH_PAYLOAD_BYTES", "0")),
+            error_rate=float(os.getenv("MOCK_SEARCH_ERROR_RATE", "0")),
+        )
+
+    async def __call__(self, q: str, limit: int, lang: Optional[str]) -> List[dict]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample(self.rnd))
+        if self.error_rate and self.rnd.random() < self.error_rate:
+            raise RuntimeError(f"{self.name}: injected failure")
+
+        pad = "x" * self.payload_bytes
+        n = min(limit, self.items)
+        return [
+            {
+                "id": f"{self.name}:{zlib.crc32(f'{q}|{i}'.encode())}",
+                "title": f"{q} {i}",
+                "artist": f"{self.name} artist {i % 7}",
+                "album": f"album {i}{pad}",
+                "cover_url": f"https://example.invalid/{self.name}/{i}.jpg",
+                "duration_sec": 150 + i,
+                "source": self.name,
+            }
+            for i in range(n)
+        ]
+
+
+register_provider("mock", MockProvider.from_env("mock"))
+register_provider("mock2", MockProvider.from_env("mock2"))
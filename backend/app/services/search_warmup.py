@@ -0,0 +1,206 @@
+"""
+Прогрів пошуку клубу перед стартом івенту.
+
+На початку ночі всі запити — холодні промахи, бо кеш порожній, а натовп приходить саме тоді.
+Тому:
+- кожен пошук із mini-app (з ?club=slug) пишемо в zset частот клубу, запропоновані треки — в інший
+- worker_search_warmup.py за WARMUP_LEAD_SECONDS до start_date проганяє топ запитів і треків
+  через unified_search (локальний кеш + спільний Redis) з обмеженням WARMUP_RPS
+- перші COLD_WINDOW_SECONDS після старту рахуємо, яка частка пошуків пішла до провайдерів
+
+Статистика відкриття: HGETALL event:{id}:search:opening (warmed / requests / cold)
+та метрика search_opening_requests_total{result="cold|warm"}.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import desc, func, select
+
+from app.core.redis_client import redis_client
+from app.crud.event_crud import get_club_event
+from app.models.models import Club, Event, Round, Song
+from app.models.session import async_session
+from app.services import metrics
+from app.services.event_keys import (
+    k_club_search_langs,
+    k_club_search_queries,
+    k_club_suggested,
+    k_search_opening,
+)
+from app.services.music_search import norm_lang, search_with_outcome
+
+WARMUP_LEAD_SECONDS = int(os.getenv("WARMUP_LEAD_SECONDS", "600"))
+WARMUP_RPS = float(os.getenv("WARMUP_RPS", "2"))
+WARMUP_MAX_QUERIES = int(os.getenv("WARMUP_MAX_QUERIES", "150"))
+WARMUP_LIMIT = 15  # як у useEventData.search, інакше ключ кешу не збігеться
+
+COLD_WINDOW_SECONDS = 15 * 60
+# прогріте має дожити до кінця вікна відкриття
+WARMUP_TTL_SECONDS = WARMUP_LEAD_SECONDS + COLD_WINDOW_SECONDS
+
+MAX_TRACKED = 2000          # скільки різних запитів/треків тримаємо на клуб
+MIN_QUERY_LEN = 2
+STATS_TTL_SECONDS = 14 * 24 * 3600
+
+COLD_OUTCOMES = ("miss", "inflight")
+
+metrics.describe(
+    "search_opening_requests_total",
+    "Пошуки в перші 15 хв івенту: cold — чекали на провайдерів, warm — з кешу",
+)
+
+
+# ---------- History ----------
+async def record_search(club_slug: str, q: str, lang: Optional[str]) -> None:
+    q = q.strip().lower()
+    if len(q) < MIN_QUERY_LEN:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zincrby(k_club_search_queries(club_slug), 1, q)
+    pipe.zincrby(k_club_search_langs(club_slug), 1, norm_lang(lang))
+    if random.random() < 0.01:
+        # zset не росте безмежно: рідкісні хвостові запити відрізаємо
+        pipe.zremrangebyrank(k_club_search_queries(club_slug), 0, -MAX_TRACKED - 1)
+    await pipe.execute()
+
+
+async def record_suggestion(club_slug: str, title: str) -> None:
+    title = title.strip().lower()
+    if len(title) < MIN_QUERY_LEN:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zincrby(k_club_suggested(club_slug), 1, title)
+    if random.random() < 0.01:
+        pipe.zremrangebyrank(k_club_suggested(club_slug), 0, -MAX_TRACKED - 1)
+    await pipe.execute()
+
+
+async def _db_suggested(db, club_id: int, limit: int) -> List[str]:
+    # раунди/пісні з БД — історія до того, як з'явився Redis-лічильник
+    title = func.lower(func.trim(Song.title))
+    rows = await db.execute(
+        select(title)
+        .join(Round, Round.id == Song.round_id)
+        .join(Event, Event.id == Round.event_id)
+        .where(Event.club_id == club_id)
+        .group_by(title)
+        .order_by(desc(func.count()))
+        .limit(limit)
+    )
+    return [r[0] for r in rows.all() if r[0]]
+
+
+async def warm_queries(db, club: Club, limit: int = WARMUP_MAX_QUERIES) -> List[str]:
+    """Топ минулих запитів клубу, потім найчастіше запропоновані треки. Без дублів."""
+    queries = await redis_client.zrevrange(k_club_search_queries(club.slug), 0, limit - 1)
+    suggested = await redis_client.zrevrange(k_club_suggested(club.slug), 0, limit - 1)
+    suggested += await _db_suggested(db, club.id, limit)
+
+    out: List[str] = []
+    seen = set()
+    # чергуємо, щоб треки не витіснились довгим хвостом префіксів
+    for q in _interleave(queries, suggested):
+        if q not in seen:
+            seen.add(q)
+            out.append(q)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def _interleave(a: List[str], b: List[str]) -> List[str]:
+    out: List[str] = []
+    for i in range(max(len(a), len(b))):
+        if i < len(a):
+            out.append(a[i])
+        if i < len(b):
+            out.append(b[i])
+    return out
+
+
+# ---------- Warm-up ----------
+async def warm_club(db, club: Club, event_id: int) -> Dict[str, int]:
+    langs = await redis_client.zrevrange(k_club_search_langs(club.slug), 0, 0)
+    lang = langs[0] if langs else None
+    queries = await warm_queries(db, club)
+
+    interval = 1.0 / WARMUP_RPS if WARMUP_RPS > 0 else 0.0
+    upstream = 0
+    for q in queries:
+        started = time.monotonic()
+        try:
+            _, outcome = await search_with_outcome(q, WARMUP_LIMIT, lang, ttl=WARMUP_TTL_SECONDS)
+        except Exception:
+            continue
+        if outcome in COLD_OUTCOMES:
+            upstream += 1
+            # бюджет рахуємо лише на реальні апстрім-виклики
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    key = k_search_opening(event_id)
+    await redis_client.hset(key, mapping={"warmed": len(queries), "warmed_upstream": upstream})
+    await redis_client.expire(key, STATS_TTL_SECONDS)
+    return {"queries": len(queries), "upstream": upstream}
+
+
+async def events_to_warm(db, now: Optional[float] = None) -> List[Tuple[Club, int]]:
+    now_dt = datetime.fromtimestamp(now or time.time(), tz=timezone.utc)
+    rows = await db.execute(
+        select(Club, Event.id)
+        .join(Event, Event.club_id == Club.id)
+        .where(
+            Event.start_date > now_dt,
+            Event.start_date <= now_dt + timedelta(seconds=WARMUP_LEAD_SECONDS),
+        )
+    )
+    return [(club, event_id) for club, event_id in rows.all()]
+
+
+# ---------- Cold-miss tracking ----------
+async def _club_event(club_slug: str) -> Tuple[Optional[int], Optional[float]]:
+    async with async_session() as db:
+        cached = await get_club_event(db, club_slug)
+    event = cached["event"]
+    if not event:
+        return None, None
+    start = event.get("start_date")
+    return event["id"], datetime.fromisoformat(start).timestamp() if start else None
+
+
+async def track_search(club_slug: str, q: str, lang: Optional[str], outcome: str) -> None:
+    """Після відповіді (BackgroundTasks): історія запитів + облік холодних промахів на відкритті."""
+    try:
+        await record_search(club_slug, q, lang)
+
+        event_id, start_ts = await _club_event(club_slug)
+        if event_id is None or start_ts is None:
+            return
+        if not 0 <= time.time() - start_ts <= COLD_WINDOW_SECONDS:
+            return
+
+        cold = outcome in COLD_OUTCOMES
+        metrics.inc("search_opening_requests_total", result="cold" if cold else "warm")
+        key = k_search_opening(event_id)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(key, "requests", 1)
+        if cold:
+            pipe.hincrby(key, "cold", 1)
+        pipe.expire(key, STATS_TTL_SECONDS)
+        await pipe.execute()
+    except Exception:
+        # статистика не повинна ламати пошук
+        return
+
+
+async def opening_stats(event_id: int) -> Dict[str, float]:
+    raw = await redis_client.hgetall(k_search_opening(event_id))
+    stats: Dict[str, float] = {k: int(v) for k, v in raw.items()}
+    requests = stats.get("requests", 0)
+    stats["cold_rate"] = round(stats.get("cold", 0) / requests, 4) if requests else 0.0
+    return stats
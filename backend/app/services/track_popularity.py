@@ -0,0 +1,116 @@
+"""
+Популярність треків у клубі (track_popularity: пропозиції, голоси, перемоги, коли грав).
+
+Таблицю наповнює rollup закритих раундів (analytics.rollup_round). Тут — читання для пошуку
+й черги: на пачку треків один запит по PK (club_id, source, source_id) лише для тих, кого
+нема в in-process кеші (POPULARITY_TTL_SECONDS, зокрема "нема даних"). Треки без історії
+в клубі не отримують поля popularity.
+"""
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+
+from app.models.models import TrackPopularity
+from app.models.session import async_session
+from app.services import metrics
+
+POPULARITY_TTL_SECONDS = float(os.getenv("POPULARITY_TTL_SECONDS", "60"))
+POPULARITY_BOOST = float(os.getenv("POPULARITY_BOOST", "1.5"))   # скільки позицій "коштує" одиниця score
+MAX_CLUBS = 1000
+MAX_TRACKS_PER_CLUB = 20_000
+
+# club_id -> track_id -> (expires_at, stats або None)
+_cache: Dict[int, Dict[str, Tuple[float, Optional[dict]]]] = {}
+
+metrics.describe("track_popularity_lookup_total", "Пошук популярності треків (cached — відомі з кешу, fetched — пішли в БД)")
+
+
+def _split(track_id: str) -> Optional[Tuple[str, str]]:
+    source, sep, source_id = (track_id or "").partition(":")
+    return (source, source_id) if sep and source and source_id else None
+
+
+async def lookup(club_id: int, track_ids: Iterable[str]) -> Dict[str, dict]:
+    """track_id ("deezer:123") -> {suggestions, votes, wins, last_played_at} для відомих клубу треків."""
+    now = time.monotonic()
+    club = _cache.get(club_id)
+    if club is None:
+        if len(_cache) >= MAX_CLUBS:
+            _cache.clear()
+        club = _cache[club_id] = {}
+
+    out: Dict[str, dict] = {}
+    missing: Dict[Tuple[str, str], str] = {}
+    for tid in track_ids:
+        hit = club.get(tid)
+        if hit and hit[0] > now:
+            if hit[1] is not None:
+                out[tid] = hit[1]
+            continue
+        key = _split(tid)
+        if key:
+            missing[key] = tid
+    metrics.inc("track_popularity_lookup_total", len(out), result="cached")
+    metrics.inc("track_popularity_lookup_total", len(missing), result="fetched")
+
+    if missing:
+        async with async_session() as db:
+            rows = (await db.execute(
+                select(
+                    TrackPopularity.source,
+                    TrackPopularity.source_id,
+                    TrackPopularity.suggestions,
+                    TrackPopularity.votes,
+                    TrackPopularity.wins,
+                    TrackPopularity.last_played_at,
+                ).where(
+                    TrackPopularity.club_id == club_id,
+                    tuple_(TrackPopularity.source, TrackPopularity.source_id).in_(list(missing)),
+                )
+            )).all()
+        found = {
+            (r.source, r.source_id): {
+                "suggestions": r.suggestions,
+                "votes": r.votes,
+                "wins": r.wins,
+                "last_played_at": r.last_played_at,
+            }
+            for r in rows
+        }
+        if len(club) + len(missing) > MAX_TRACKS_PER_CLUB:
+            club.clear()
+        expires = now + POPULARITY_TTL_SECONDS
+        for key, tid in missing.items():
+            stats = found.get(key)
+            club[tid] = (expires, stats)
+            if stats is not None:
+                out[tid] = stats
+    return out
+
+
+def annotate(items: List[dict], stats: Dict[str, dict], id_field: str = "id") -> List[dict]:
+    """Копії елементів із полем popularity (оригінали можуть лежати в спільному кеші)."""
+    return [
+        {**item, "popularity": stats[item.get(id_field)]} if item.get(id_field) in stats else item
+        for item in items
+    ]
+
+
+def score(stats: Optional[dict]) -> float:
+    if not stats:
+        return 0.0
+    return math.log1p(stats["votes"] + 3 * stats["wins"] + stats["suggestions"])
+
+
+def boost(items: List[dict], stats: Dict[str, dict], id_field: str = "id") -> List[dict]:
+    """Піднімає популярні в клубі треки, не руйнуючи релевантність провайдера повністю."""
+    ranked = sorted(
+        enumerate(items),
+        key=lambda p: p[0] - POPULARITY_BOOST * score(stats.get(p[1].get(id_field))),
+    )
+    return [item for _, item in ranked]
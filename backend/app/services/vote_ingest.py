@@ -0,0 +1,517 @@
+"""
+Write-behind голосів: прийняти в Redis одразу, записати в Postgres пачками.
+
+VOTE_INGEST_MODE=buffered (за замовчуванням sync — транзакція на кожен голос, vote_crud):
+- accept_vote: один Lua-скрипт — SET NX round:{rid}:voted:{uid} (той самий інваріант,
+  що uq_vote_user_round), HINCRBY лічильника пісні для відповіді й XADD у стрім votes:ingest
+- move_vote: так само один скрипт — dedupe-ключ переписується на нову пісню, -1/+1 лічильникам
+  і запис у стрім з полем from; retract_vote — зняття голосу (запис з from і s=0), dedupe-ключ
+  стає RETRACTED, поки флашер не видалить рядок з votes
+- worker_vote_flusher.py: XREADGROUP пачками (до VOTE_FLUSH_BATCH або VOTE_FLUSH_INTERVAL_MS),
+  один INSERT ... SELECT FROM unnest(...) ON CONFLICT DO NOTHING + інкремент songs.vote_count
+  в одній транзакції, і лише після commit — XACK/XDEL
+
+Crash-safe: непідтверджені записи лишаються в PEL групи — після рестарту воркер спершу
+перечитує свої, а записи мертвих споживачів забирає XAUTOCLAIM. Повтор після commit,
+але до XACK, безпечний: ON CONFLICT (user_id, round_id) відкидає вже записане, і
+vote_count збільшується лише на реально вставлені рядки. Переміщення пишеться як
+compare-and-set (song_id = from), тож повтор теж нічого не змінює; якщо вихідного голосу
+в votes ще нема (його тримає інший флашер), запис лишається в PEL до наступної спроби.
+Ім'я споживача стабільне (VOTE_FLUSHER_CONSUMER, інакше hostname) — після рестарту
+воркер знаходить свій PEL.
+
+Метрики флашера: vote_flush_rows_total, vote_flush_batches_total, vote_flush_seconds,
+vote_durable_lag_seconds (від прийняття до commit), vote_ingest_backlog.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.redis_client import redis_client
+from app.models.session import async_session
+from app.services import metrics
+from app.services.event_keys import K_VOTE_STREAM, k_round_vote_counts, k_vote_dedupe
+
+VOTE_INGEST_MODE = os.getenv("VOTE_INGEST_MODE", "sync")
+VOTE_FLUSH_BATCH = int(os.getenv("VOTE_FLUSH_BATCH", "500"))
+VOTE_FLUSH_INTERVAL_MS = int(os.getenv("VOTE_FLUSH_INTERVAL_MS", "200"))
+
+GROUP = "flushers"
+DEDUPE_TTL_SECONDS = 24 * 3600
+CLAIM_IDLE_MS = 30_000          # стільки запис має провисіти в чужому PEL, щоб його забрати
+STREAM_MAX_LEN = 1_000_000      # страховка, якщо флашер довго лежить
+RETRY_SECONDS = 1.0
+VOTE_MOVE_RETRY_SECONDS = int(os.getenv("VOTE_MOVE_RETRY_SECONDS", "600"))   # скільки чекати вихідний голос
+RETRACTED = "0"                 # dedupe-ключ після зняття голосу (id пісень починаються з 1)
+NOT_BUFFERED = -2               # retract_vote: dedupe-ключа нема, голос може бути лише у votes
+
+log = logging.getLogger("vote_ingest")
+
+metrics.describe("vote_ingest_accepted_total", "Голоси, прийняті в буфер (result=accepted|duplicate|moved|unchanged|retracted)")
+metrics.describe("vote_flush_rows_total", "Рядки з буфера, оброблені флашером (result=inserted|moved|deferred|dropped|skipped)")
+metrics.describe("vote_flush_batches_total", "Пачки, записані в Postgres")
+metrics.describe("vote_flush_seconds", "Тривалість запису однієї пачки")
+metrics.describe("vote_durable_lag_seconds", "Від прийняття голосу до commit у Postgres")
+metrics.describe("vote_ingest_backlog", "Записи в стрімі, ще не підтверджені флашером")
+
+
+def buffered() -> bool:
+    return VOTE_INGEST_MODE == "buffered"
+
+
+# ---------- Accept ----------
+# KEYS: dedupe, лічильники раунду, стрім
+# ARGV: user_id, round_id, song_id, event_id, seed (vote_count з БД), dedupe ttl, maxlen
+_ACCEPT_LUA = """
+local cur = redis.call('GET', KEYS[1])
+if cur and cur ~= '""" + RETRACTED + """' then
+  return -1
+end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[6])
+redis.call('HSETNX', KEYS[2], ARGV[3], ARGV[5])
+local votes = redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+local t = redis.call('TIME')
+local ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[7], '*',
+  'u', ARGV[1], 'r', ARGV[2], 's', ARGV[3], 'e', ARGV[4], 'ts', ms)
+return votes
+"""
+
+
+async def accept_vote(user_id: int, round_id: int, song_id: int, event_id: int, seed: int) -> Optional[int]:
+    """
+    Поточна кількість голосів за пісню або None, якщо користувач уже голосував у раунді.
+    seed — songs.vote_count з БД: з нього стартує лічильник, поки його нема в Redis.
+    """
+    votes = int(await redis_client.eval(
+        _ACCEPT_LUA,
+        3,
+        k_vote_dedupe(round_id, user_id),
+        k_round_vote_counts(round_id),
+        K_VOTE_STREAM,
+        user_id, round_id, song_id, event_id, seed, DEDUPE_TTL_SECONDS, STREAM_MAX_LEN,
+    ))
+    metrics.inc("vote_ingest_accepted_total", result="duplicate" if votes < 0 else "accepted")
+    return None if votes < 0 else votes
+
+
+# Переміщення голосу: dedupe-ключ тримає пісню, за яку зараз голос користувача, тож
+# "звідки" береться атомарно з нього — паралельні switch серіалізує Redis, без подвійного рахунку.
+# Поле старої пісні в лічильниках існує: його створив accept_vote разом із dedupe-ключем.
+# KEYS: dedupe, лічильники раунду, стрім
+# ARGV: user_id, round_id, song_id, event_id, seed (vote_count нової пісні з БД), ttl, maxlen
+_MOVE_LUA = """
+local old = redis.call('GET', KEYS[1])
+if not old or old == '""" + RETRACTED + """' then
+  return {-1}
+end
+if old == ARGV[3] then
+  return {0, old, 0, tonumber(redis.call('HGET', KEYS[2], ARGV[3]) or ARGV[5])}
+end
+redis.call('SET', KEYS[1], ARGV[3], 'KEEPTTL')
+redis.call('HSETNX', KEYS[2], ARGV[3], ARGV[5])
+local to_votes = redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+local from_votes = redis.call('HINCRBY', KEYS[2], old, -1)
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+local t = redis.call('TIME')
+local ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[7], '*',
+  'u', ARGV[1], 'r', ARGV[2], 's', ARGV[3], 'e', ARGV[4], 'from', old, 'ts', ms)
+return {1, old, from_votes, to_votes}
+"""
+
+
+async def move_vote(
+        user_id: int, round_id: int, song_id: int, event_id: int, seed: int,
+) -> Optional[Tuple[bool, int, int, int]]:
+    """
+    (moved, from_song_id, from_votes, to_votes) або None, якщо голосу в раунді нема.
+    moved=False — голос уже за цю пісню, нічого не змінено.
+    """
+    res = await redis_client.eval(
+        _MOVE_LUA,
+        3,
+        k_vote_dedupe(round_id, user_id),
+        k_round_vote_counts(round_id),
+        K_VOTE_STREAM,
+        user_id, round_id, song_id, event_id, seed, DEDUPE_TTL_SECONDS, STREAM_MAX_LEN,
+    )
+    if int(res[0]) < 0:
+        return None
+    metrics.inc("vote_ingest_accepted_total", result="moved" if int(res[0]) else "unchanged")
+    return bool(int(res[0])), int(res[1]), int(res[2]), int(res[3])
+
+
+# Зняття голосу: лише якщо dedupe-ключ ще на цій пісні (паралельний switch/повтор -> -1).
+# Ключа нема (-2) — голос, якщо є, лише у votes (до buffered-режиму або TTL минув): caller
+# перевіряє БД і повторює з fallback = song_id. Ключ стає RETRACTED — інакше до флашу читання
+# стану бачило б рядок з votes. У стрім — запис з from і s=0, флашер видаляє рядок
+# compare-and-set так само, як переміщення.
+# KEYS: dedupe, лічильники раунду, стрім
+# ARGV: user_id, round_id, song_id, event_id, maxlen, fallback, seed (vote_count з БД), ttl
+_RETRACT_LUA = """
+local cur = redis.call('GET', KEYS[1])
+if not cur then
+  if ARGV[6] == '' then
+    return -2
+  end
+  cur = ARGV[6]
+end
+if cur ~= ARGV[3] then
+  return -1
+end
+redis.call('SET', KEYS[1], '""" + RETRACTED + """', 'EX', ARGV[8])
+redis.call('HSETNX', KEYS[2], ARGV[3], ARGV[7])
+local votes = redis.call('HINCRBY', KEYS[2], ARGV[3], -1)
+local t = redis.call('TIME')
+local ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[5], '*',
+  'u', ARGV[1], 'r', ARGV[2], 's', 0, 'e', ARGV[4], 'from', ARGV[3], 'ts', ms)
+return votes
+"""
+
+
+async def retract_vote(
+        user_id: int, round_id: int, song_id: int, event_id: int, seed: int, in_db: bool = False,
+) -> Optional[int]:
+    """
+    Нова кількість голосів за пісню; None — голос користувача в раунді за іншу пісню або вже
+    знятий; NOT_BUFFERED — буфер про голос не знає: якщо рядок є у votes, повторити з in_db=True.
+    seed — songs.vote_count з БД, як в accept_vote.
+    """
+    votes = int(await redis_client.eval(
+        _RETRACT_LUA,
+        3,
+        k_vote_dedupe(round_id, user_id),
+        k_round_vote_counts(round_id),
+        K_VOTE_STREAM,
+        user_id, round_id, song_id, event_id, STREAM_MAX_LEN,
+        song_id if in_db else "", seed, DEDUPE_TTL_SECONDS,
+    ))
+    if votes == NOT_BUFFERED:
+        return votes
+    if votes < 0:
+        return None
+    metrics.inc("vote_ingest_accepted_total", result="retracted")
+    return votes
+
+
+async def round_counts(round_id: int) -> Dict[int, int]:
+    """Лічильники пісень раунду з буфера (новіші за songs.vote_count, поки флашер не дописав)."""
+    raw = await redis_client.hgetall(k_round_vote_counts(round_id))
+    return {int(k): int(v) for k, v in raw.items()}
+
+
+async def pending_vote(round_id: int, user_id: int) -> Optional[int]:
+    """
+    Голос користувача в раунді за буфером (новіший за votes, поки флашер не дописав):
+    id пісні, 0 — голос знято, None — буфер про голос не знає (правду каже votes).
+    """
+    raw = await redis_client.get(k_vote_dedupe(round_id, user_id))
+    return int(raw) if raw else None
+
+
+# ---------- Flush ----------
+# unnest — одна bind-змінна на колонку незалежно від розміру пачки; join відсікає голоси
+# за пісні/користувачів, яких уже нема (інакше FK отруїв би всю пачку), і прийняті вже після
+# закриття раунду (переможця обрано з лічильниками буфера на момент ротації, event_crud)
+_FLUSH_SQL = text("""
+WITH batch AS (
+    SELECT * FROM unnest(
+        CAST(:user_ids AS INTEGER[]),
+        CAST(:round_ids AS INTEGER[]),
+        CAST(:song_ids AS INTEGER[]),
+        CAST(:created AS TIMESTAMPTZ[])
+    ) AS b(user_id, round_id, song_id, created_at)
+),
+ins AS (
+    INSERT INTO votes (user_id, round_id, song_id, created_at)
+    SELECT b.user_id, b.round_id, b.song_id, b.created_at
+    FROM batch b
+    JOIN songs s ON s.id = b.song_id
+    JOIN users u ON u.id = b.user_id
+    JOIN rounds r ON r.id = b.round_id AND (r.ended_at IS NULL OR b.created_at <= r.ended_at)
+    ON CONFLICT (user_id, round_id) DO NOTHING
+    RETURNING song_id
+),
+per_song AS (
+    SELECT song_id, count(*) AS n FROM ins GROUP BY song_id
+),
+upd AS (
+    UPDATE songs SET vote_count = songs.vote_count + per_song.n
+    FROM per_song
+    WHERE songs.id = per_song.song_id
+    RETURNING per_song.n
+)
+SELECT coalesce(sum(n), 0) FROM upd
+""")
+
+# окремим стейтментом після вставок (CTE не бачать рядків, вставлених сусіднім CTE);
+# compare-and-set по from_id: повтор і вже застосоване переміщення нічого не змінюють.
+# По рядку пачки — чи перемістили і яка пісня в голосу зараз (до цього стейтменту):
+# голосу ще нема або він на іншій пісні -> попередній запис (голос чи переміщення) ще не
+# durable, flush_batch лишає такий запис у PEL до наступної спроби.
+_MOVE_SQL = text("""
+WITH batch AS (
+    SELECT * FROM unnest(
+        CAST(:user_ids AS INTEGER[]),
+        CAST(:round_ids AS INTEGER[]),
+        CAST(:from_ids AS INTEGER[]),
+        CAST(:song_ids AS INTEGER[]),
+        CAST(:created AS TIMESTAMPTZ[])
+    ) AS b(user_id, round_id, from_id, song_id, created_at)
+),
+moved AS (
+    UPDATE votes v SET song_id = b.song_id
+    FROM batch b
+    JOIN songs s ON s.id = b.song_id
+    JOIN rounds r ON r.id = b.round_id AND (r.ended_at IS NULL OR b.created_at <= r.ended_at)
+    WHERE v.user_id = b.user_id AND v.round_id = b.round_id AND v.song_id = b.from_id
+    RETURNING b.user_id, b.round_id, b.from_id, b.song_id
+),
+removed AS (
+    -- song_id = 0: голос знято (retract_vote)
+    DELETE FROM votes v
+    USING batch b
+    JOIN rounds r ON r.id = b.round_id AND (r.ended_at IS NULL OR b.created_at <= r.ended_at)
+    WHERE b.song_id = 0
+      AND v.user_id = b.user_id AND v.round_id = b.round_id AND v.song_id = b.from_id
+    RETURNING b.user_id, b.round_id, b.from_id
+),
+delta AS (
+    SELECT song_id, sum(n) AS n
+    FROM (
+        SELECT song_id, 1 AS n FROM moved
+        UNION ALL
+        SELECT from_id, -1 FROM moved
+        UNION ALL
+        SELECT from_id, -1 FROM removed
+    ) d
+    GROUP BY song_id
+),
+upd AS (
+    UPDATE songs SET vote_count = songs.vote_count + delta.n
+    FROM delta
+    WHERE songs.id = delta.song_id AND delta.n <> 0
+)
+SELECT b.user_id, b.round_id,
+       m.user_id IS NOT NULL OR d.user_id IS NOT NULL AS moved,
+       v.song_id AS current_song_id,
+       r.ended_at IS NOT NULL AND b.created_at > r.ended_at AS late
+FROM batch b
+LEFT JOIN moved m ON m.user_id = b.user_id AND m.round_id = b.round_id
+LEFT JOIN removed d ON d.user_id = b.user_id AND d.round_id = b.round_id
+LEFT JOIN votes v ON v.user_id = b.user_id AND v.round_id = b.round_id
+LEFT JOIN rounds r ON r.id = b.round_id
+""")
+
+Entry = Tuple[str, Dict[str, str]]
+
+
+def _parse(entries: List[Entry]) -> Tuple[List[str], Dict[str, list], Dict[Tuple[int, int], dict], List[float]]:
+    """
+    (ids, вставки, переміщення, час прийняття). Кілька записів одного користувача в раунді
+    згортаються: голос + переміщення -> вставка одразу нової пісні, ланцюжок переміщень ->
+    одне (перший from -> остання пісня); переміщення пам'ятає id своїх записів у стрімі.
+    Зняття голосу — переміщення в пісню 0.
+    """
+    ids: List[str] = []
+    inserts: Dict[Tuple[int, int], list] = {}
+    moves: Dict[Tuple[int, int], dict] = {}
+    accepted: List[float] = []
+    for entry_id, f in entries:
+        ids.append(entry_id)
+        try:
+            ts = int(f["ts"]) / 1000.0
+            key = (int(f["u"]), int(f["r"]))
+            song_id = int(f["s"])
+            from_id = int(f["from"]) if f.get("from") else None
+        except (KeyError, ValueError):
+            log.warning("dropping malformed vote entry %s: %s", entry_id, f)
+            continue
+        accepted.append(ts)
+        if from_id is None:
+            if key in moves and not moves[key]["to"]:
+                # зняли й проголосували знову — для votes це переміщення
+                moves[key]["to"] = song_id
+                moves[key]["ids"].append(entry_id)
+            else:
+                inserts.setdefault(key, [song_id, datetime.fromtimestamp(ts, tz=timezone.utc)])
+        elif key in inserts:
+            if song_id:
+                inserts[key][0] = song_id
+            else:
+                del inserts[key]        # голос і його зняття в одній пачці — нічого не пишемо
+        elif key in moves:
+            moves[key]["to"] = song_id
+            moves[key]["ids"].append(entry_id)
+            moves[key]["ts"] = ts
+        else:
+            moves[key] = {"from": from_id, "to": song_id, "ids": [entry_id], "ts": ts}
+
+    ins_cols: Dict[str, list] = {"user_ids": [], "round_ids": [], "song_ids": [], "created": []}
+    for (user_id, round_id), (song_id, created) in inserts.items():
+        ins_cols["user_ids"].append(user_id)
+        ins_cols["round_ids"].append(round_id)
+        ins_cols["song_ids"].append(song_id)
+        ins_cols["created"].append(created)
+    return ids, ins_cols, {k: m for k, m in moves.items() if m["from"] != m["to"]}, accepted
+
+
+def _move_cols(moves: Dict[Tuple[int, int], dict]) -> Dict[str, list]:
+    cols: Dict[str, list] = {"user_ids": [], "round_ids": [], "from_ids": [], "song_ids": [], "created": []}
+    for (user_id, round_id), m in moves.items():
+        cols["user_ids"].append(user_id)
+        cols["round_ids"].append(round_id)
+        cols["from_ids"].append(m["from"])
+        cols["song_ids"].append(m["to"])
+        cols["created"].append(datetime.fromtimestamp(m["ts"], tz=timezone.utc))
+    return cols
+
+
+async def flush_batch(entries: List[Entry]) -> int:
+    """
+    Записує пачку й підтверджує її в стрімі. Повертає кількість вставлених голосів.
+    Переміщення, для якого в votes ще нема вихідного стану (голос чи попереднє переміщення
+    обробляє інший флашер або воно в PEL мертвого споживача), не підтверджується — його
+    повторить XAUTOCLAIM; старше за VOTE_MOVE_RETRY_SECONDS — відкидається з попередженням.
+    """
+    ids, cols, moves, accepted = _parse(entries)
+    inserted = moved = 0
+    deferred: List[str] = []
+    dropped = 0
+    with metrics.timer("vote_flush_seconds"):
+        if cols["user_ids"] or moves:
+            async with async_session() as db:
+                if cols["user_ids"]:
+                    inserted = int((await db.execute(_FLUSH_SQL, cols)).scalar_one())
+                if moves:
+                    rows = (await db.execute(_MOVE_SQL, _move_cols(moves))).all()
+                    now = time.time()
+                    for row in rows:
+                        m = moves[(row.user_id, row.round_id)]
+                        if row.moved:
+                            moved += 1
+                        elif row.late or row.current_song_id == (m["to"] or None):
+                            pass            # після закриття раунду / уже застосоване раніше
+                        elif now - m["ts"] < VOTE_MOVE_RETRY_SECONDS:
+                            deferred += m["ids"]
+                        else:
+                            dropped += 1
+                            log.warning(
+                                "dropping vote move u=%s r=%s %s->%s: vote is on %s",
+                                row.user_id, row.round_id, m["from"], m["to"], row.current_song_id,
+                            )
+                await db.commit()
+
+    # лише після commit: якщо впадемо тут — пачку перечитають і ON CONFLICT / CAS її відкинуть
+    skip = set(deferred)
+    done = [i for i in ids if i not in skip]
+    if done:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.xack(K_VOTE_STREAM, GROUP, *done)
+        pipe.xdel(K_VOTE_STREAM, *done)
+        await pipe.execute()
+
+    now = time.time()
+    for ts in accepted:
+        metrics.observe("vote_durable_lag_seconds", now - ts)
+    metrics.inc("vote_flush_batches_total")
+    metrics.inc("vote_flush_rows_total", inserted, result="inserted")
+    metrics.inc("vote_flush_rows_total", moved, result="moved")
+    metrics.inc("vote_flush_rows_total", len(deferred), result="deferred")
+    metrics.inc("vote_flush_rows_total", dropped, result="dropped")
+    metrics.inc("vote_flush_rows_total", len(done) - inserted - moved - dropped, result="skipped")
+    return inserted
+
+
+async def ensure_group() -> None:
+    try:
+        await redis_client.xgroup_create(K_VOTE_STREAM, GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def _read(consumer: str, stream_id: str, block_ms: Optional[int], count: int) -> List[Entry]:
+    res = await redis_client.xreadgroup(GROUP, consumer, {K_VOTE_STREAM: stream_id}, count=count, block=block_ms)
+    return list(res[0][1]) if res else []
+
+
+async def _collect(consumer: str) -> List[Entry]:
+    """Нові записи: чекаємо перший, далі добираємо до пачки, поки не мине інтервал."""
+    entries = await _read(consumer, ">", VOTE_FLUSH_INTERVAL_MS, VOTE_FLUSH_BATCH)
+    if not entries:
+        return entries
+    deadline = time.monotonic() + VOTE_FLUSH_INTERVAL_MS / 1000.0
+    while len(entries) < VOTE_FLUSH_BATCH:
+        left_ms = int((deadline - time.monotonic()) * 1000)
+        if left_ms <= 0:
+            break
+        more = await _read(consumer, ">", left_ms, VOTE_FLUSH_BATCH - len(entries))
+        if not more:
+            break
+        entries += more
+    return entries
+
+
+async def _backlog() -> None:
+    try:
+        metrics.set_gauge("vote_ingest_backlog", await redis_client.xlen(K_VOTE_STREAM))
+    except Exception:
+        pass
+
+
+def consumer_name() -> str:
+    """Стабільне між рестартами ім'я: після падіння воркер перечитує свій PEL."""
+    return os.getenv("VOTE_FLUSHER_CONSUMER") or socket.gethostname()
+
+
+async def run_flusher(stop: Optional[asyncio.Event] = None, consumer: Optional[str] = None) -> None:
+    consumer = consumer or consumer_name()
+    await ensure_group()
+    replay_from = "0"            # спершу свій PEL: те, що прочитали до падіння/рестарту
+    claim_from = "0-0"
+    last_claim = 0.0
+
+    while not (stop and stop.is_set()):
+        try:
+            if replay_from:
+                entries = await _read(consumer, replay_from, None, VOTE_FLUSH_BATCH)
+                # курсор, а не знову "0": відкладені переміщення лишаються в PEL
+                replay_from = _next_id(entries[-1][0]) if entries else ""
+            elif time.monotonic() - last_claim > CLAIM_IDLE_MS / 1000.0:
+                last_claim = time.monotonic()
+                # записи споживачів, що впали й не повернулись, і власні відкладені
+                claim_from, entries, *_ = await redis_client.xautoclaim(
+                    K_VOTE_STREAM, GROUP, consumer, CLAIM_IDLE_MS, start_id=claim_from, count=VOTE_FLUSH_BATCH,
+                )
+                entries = [e for e in entries if e and e[1]]
+                if claim_from != "0-0":
+                    last_claim = 0.0     # PEL ще не обійшли — наступна порція одразу
+            else:
+                entries = await _collect(consumer)
+
+            if entries:
+                await flush_batch(entries)
+            await _backlog()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("vote flush failed, retrying")
+            replay_from = "0"    # непідтверджене лишилось у PEL — перечитаємо
+            await asyncio.sleep(RETRY_SECONDS)
+
+
+def _next_id(entry_id: str) -> str:
+    ms, _, seq = entry_id.partition("-")
+    return f"{ms}-{int(seq or 0) + 1}"
@@ -0,0 +1,183 @@
+"""
+Rate limit та idempotency поверх Redis.
+
+- token bucket: місткість limit, поповнення limit/window токенів за секунду; кілька кошиків
+  (користувач / IP / івент) перевіряються одним Lua-скриптом — один round trip на запит,
+  і якщо хоч один порожній, жоден не списується
+- час береться з Redis (TIME), тож воркери з різним годинником рахують однаково
+- відмова — 429 з Retry-After (секунди до появи потрібного токена в найгіршому кошику)
+- ensure_idempotent: SET NX на ключ операції; повтор протягом ttl -> 409 або збережена відповідь
+
+    @router.post("/{club_slug}/queue", dependencies=[Depends(RateLimit("suggest", user=(5, 60), ip=(20, 60)))])
+"""
+# без from __future__ import annotations: FastAPI читає анотації RateLimit.__call__ у рантаймі
+import json
+import math
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.redis_client import redis_client
+from app.services import metrics
+
+# за reverse proxy (nginx) client.host — це сам proxy
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "0") == "1"
+# глобальний вимикач — для навантажувальних тестів
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+
+IDEMPOTENCY_TTL_SECONDS = 60
+_PENDING = "__pending__"
+
+# (key, limit, window_seconds)
+Bucket = Tuple[str, int, float]
+
+metrics.describe("ratelimit_rejected_total", "Запити, відхилені rate limit (429), за scope")
+
+# KEYS — кошики; ARGV[1] — вартість, далі пари (місткість, токенів за мс).
+# Повертає 0, якщо списали, інакше скільки мс чекати.
+_BUCKETS_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local wait = 0
+local left = {}
+for i, key in ipairs(KEYS) do
+  local cap = tonumber(ARGV[i * 2])
+  local rate = tonumber(ARGV[i * 2 + 1])
+  local b = redis.call('HMGET', key, 't', 'ts')
+  local tokens = tonumber(b[1]) or cap
+  local ts = tonumber(b[2]) or now
+  tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+  if tokens < cost then
+    wait = math.max(wait, math.ceil((cost - tokens) / rate))
+  end
+  left[i] = tokens
+end
+if wait > 0 then
+  return wait
+end
+for i, key in ipairs(KEYS) do
+  local cap = tonumber(ARGV[i * 2])
+  local rate = tonumber(ARGV[i * 2 + 1])
+  redis.call('HSET', key, 't', tostring(left[i] - cost), 'ts', now)
+  -- повний кошик == відсутній ключ, тож після повного поповнення його можна забути
+  redis.call('PEXPIRE', key, math.ceil(cap / rate) + 1000)
+end
+return 0
+"""
+
+
+# ---------- Token bucket ----------
+async def check_buckets(buckets: Sequence[Bucket], cost: int = 1) -> float:
+    """0.0, якщо пропускаємо (токени списані), інакше секунди до наступної спроби."""
+    if not buckets or not RATE_LIMIT_ENABLED:
+        return 0.0
+    args: List[Any] = [cost]
+    for _, limit, window in buckets:
+        args += [limit, limit / (window * 1000.0)]
+    wait_ms = await redis_client.eval(_BUCKETS_LUA, len(buckets), *(b[0] for b in buckets), *args)
+    return int(wait_ms) / 1000.0
+
+
+def too_many(retry_after: float, detail: str = "Too many requests") -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def rate_limit(key: str, limit: int, window: float, scope: str = "custom") -> None:
+    """Один кошик: не більше limit запитів за window секунд (з допуском сплеску до limit)."""
+    wait = await check_buckets([(key, limit, window)])
+    if wait:
+        metrics.inc("ratelimit_rejected_total", scope=scope)
+        raise too_many(wait)
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        fwd = request.headers.get("x-forwarded-for")
+        if fwd:
+            return fwd.split(",", 1)[0].strip()
+        real = request.headers.get("x-real-ip")
+        if real:
+            return real.strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """
+    FastAPI-залежність: кошики на користувача (X-Telegram-User-Id), IP та івент (club_slug з path).
+    Кожен ліміт — (кількість, вікно в секундах) або None.
+
+    X-Telegram-User-Id ніхто не перевіряє, клієнт може міняти його на кожен запит — як
+    залежність реально стримують IP- та event-кошики, user-кошик лише для чесних клієнтів.
+    Де користувач уже перевірений (initData у router_public), викликайте check() з його id.
+    """
+
+    def __init__(
+            self,
+            scope: str,
+            user: Optional[Tuple[int, float]] = None,
+            ip: Optional[Tuple[int, float]] = None,
+            event: Optional[Tuple[int, float]] = None,
+    ) -> None:
+        self.scope = scope
+        self.user = user
+        self.ip = ip
+        self.event = event
+
+    def buckets(self, request: Request, user: Any = None, event: Any = None) -> List[Bucket]:
+        out: List[Bucket] = []
+        tg_id = user if user is not None else request.headers.get("x-telegram-user-id")
+        if self.user and tg_id:
+            out.append((f"rl:{self.scope}:u:{tg_id}", *self.user))
+        if self.ip:
+            out.append((f"rl:{self.scope}:ip:{client_ip(request)}", *self.ip))
+        slug = event if event is not None else request.path_params.get("club_slug")
+        if self.event and slug:
+            out.append((f"rl:{self.scope}:ev:{slug}", *self.event))
+        return out
+
+    async def check(self, request: Request, user: Any = None, event: Any = None) -> None:
+        """Усі кошики одним скриптом; user/event — перевірені id замість заголовка і club_slug."""
+        wait = await check_buckets(self.buckets(request, user, event))
+        if wait:
+            metrics.inc("ratelimit_rejected_total", scope=self.scope)
+            raise too_many(wait)
+
+    async def __call__(self, request: Request) -> None:
+        await self.check(request)
+
+
+# ---------- Idempotency ----------
+async def ensure_idempotent(key: str, ttl: int = IDEMPOTENCY_TTL_SECONDS) -> Optional[Any]:
+    """
+    Перший виклик із ключем -> None (виконуйте операцію, потім remember_idempotent).
+    Повтор: збережена відповідь першого, або 409, поки перший ще виконується / нічого не зберіг.
+    """
+    if await redis_client.set(key, _PENDING, nx=True, ex=ttl):
+        return None
+    stored = await redis_client.get(key)
+    if stored is None or stored == _PENDING:
+        raise HTTPException(status_code=409, detail="Duplicate request")
+    return json.loads(stored)
+
+
+async def remember_idempotent(key: str, response: Any, ttl: int = IDEMPOTENCY_TTL_SECONDS) -> None:
+    await redis_client.set(key, json.dumps(response, ensure_ascii=False), ex=ttl)
+
+
+async def forget_idempotent(key: str) -> None:
+    """Операція впала — дозволяємо повтор із тим самим ключем."""
+    await redis_client.delete(key)
+
+
+def idempotency_key(scope: str, header: Optional[str], *parts: Any) -> Optional[str]:
+    """Ключ з Idempotency-Key клієнта; без заголовка — None (операція не захищена)."""
+    header = (header or "").strip()
+    if not header or len(header) > 128:
+        return None
+    return ":".join(["idem", scope, *(str(p) for p in parts), header])
@@ -0,0 +1,215 @@
+"""
+Обслуговування секцій votes (RANGE по round_id, див. міграцію 7c2e4a91d3f0).
+
+1. Секції наперед: щоб нові раунди не падали у votes_default, тримаємо --ahead порожніх
+   секцій після поточного max(rounds.id). Якщо у votes_default уже є рядки з діапазону нової
+   секції — переносимо їх у ту ж транзакцію.
+2. Закриття: раунди івентів, що завершились (events.end_date) давніше за --after-days, але
+   так і лишились відкритими, закриваються (ended_at = end_date, переможець за vote_count) —
+   далі їх підхоплює worker_analytics.py.
+3. Архів: секція, всі раунди якої закриті давніше за --after-days, враховані в analytics_rounds
+   і всі їхні івенти завершились так само давно, від'єднується від votes і переписується в
+   archive.votes_r{lo} — компактна копія без FK і B-tree індексів (лише BRIN по round_id),
+   відсортована за (round_id, song_id).
+   songs.vote_count лишається як є — підсумки архівних раундів не губляться.
+
+    python archive_votes.py                 # лише план
+    python archive_votes.py --apply         # виконати (cron раз на добу)
+    python archive_votes.py --apply --after-days 7
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models.session import engine
+
+ROUNDS_PER_PARTITION = int(os.getenv("VOTE_PARTITION_ROUNDS", "5000"))
+ARCHIVE_SCHEMA = "archive"
+LOCK_TIMEOUT = "5s"             # DETACH бере ACCESS EXCLUSIVE на votes — не висимо за довгими запитами
+
+_PARTITION_RE = re.compile(r"^votes_r(\d+)$")
+
+
+async def partitions(conn: AsyncConnection) -> List[int]:
+    """Нижні межі підключених секцій votes_r{lo}."""
+    rows = await conn.execute(text(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'votes'
+        """
+    ))
+    out = []
+    for (name,) in rows.all():
+        m = _PARTITION_RE.match(name)
+        if m:
+            out.append(int(m.group(1)))
+    return sorted(out)
+
+
+async def archived_ranges(conn: AsyncConnection) -> List[Tuple[int, int]]:
+    """[lo, hi) раундів, чиї голоси вже в archive.votes_r{lo}."""
+    rows = await conn.execute(
+        text("SELECT tablename FROM pg_tables WHERE schemaname = :schema"),
+        {"schema": ARCHIVE_SCHEMA},
+    )
+    out = []
+    for (name,) in rows.all():
+        m = _PARTITION_RE.match(name)
+        if m:
+            lo = int(m.group(1))
+            out.append((lo, lo + ROUNDS_PER_PARTITION))
+    return sorted(out)
+
+
+# ---------- Partitions ahead ----------
+async def ensure_ahead(conn: AsyncConnection, ahead: int, apply: bool) -> None:
+    max_round = (await conn.execute(text("SELECT coalesce(max(id), 0) FROM rounds"))).scalar_one()
+    existing = set(await partitions(conn))
+    archived = {lo for lo, _ in await archived_ranges(conn)}
+    await conn.rollback()       # далі — по транзакції на секцію
+    last = (max_round // ROUNDS_PER_PARTITION + ahead) * ROUNDS_PER_PARTITION
+    for lo in range(0, last + 1, ROUNDS_PER_PARTITION):
+        if lo in existing or lo in archived:
+            continue
+        hi = lo + ROUNDS_PER_PARTITION
+        print(f"create votes_r{lo} [{lo}, {hi})")
+        if not apply:
+            continue
+        async with conn.begin():
+            stray = (await conn.execute(
+                text("SELECT count(*) FROM votes_default WHERE round_id >= :lo AND round_id < :hi"),
+                {"lo": lo, "hi": hi},
+            )).scalar_one()
+            if stray:
+                # секцію не можна створити, поки default тримає рядки з її діапазону
+                await conn.execute(text("ALTER TABLE votes DETACH PARTITION votes_default"))
+                await conn.execute(text(
+                    f"CREATE TABLE votes_r{lo} PARTITION OF votes FOR VALUES FROM ({lo}) TO ({hi})"
+                ))
+                await conn.execute(
+                    text(
+                        "WITH moved AS (DELETE FROM votes_default WHERE round_id >= :lo AND round_id < :hi "
+                        "RETURNING id, user_id, round_id, song_id, created_at) "
+                        "INSERT INTO votes (id, user_id, round_id, song_id, created_at) SELECT * FROM moved"
+                    ),
+                    {"lo": lo, "hi": hi},
+                )
+                await conn.execute(text("ALTER TABLE votes ATTACH PARTITION votes_default DEFAULT"))
+                print(f"  moved {stray} rows from votes_default")
+            else:
+                await conn.execute(text(
+                    f"CREATE TABLE votes_r{lo} PARTITION OF votes FOR VALUES FROM ({lo}) TO ({hi})"
+                ))
+
+
+# ---------- Archive ----------
+_ARCHIVABLE_SQL = text(
+    """
+    SELECT
+        (SELECT coalesce(max(id), 0) FROM rounds) >= :hi - 1 AS allocated,
+        NOT EXISTS (
+            SELECT 1
+            FROM rounds r
+            JOIN events e ON e.id = r.event_id
+            WHERE r.id >= :lo AND r.id < :hi
+              AND (r.ended_at IS NULL
+                   OR r.ended_at > now() - make_interval(days => :days)
+                   -- events.status ніхто не виставляє: кінець івенту — end_date (router_admin end_event)
+                   OR e.end_date IS NULL
+                   OR e.end_date > now() - make_interval(days => :days)
+                   -- голоси раунду ще не враховані worker_analytics.py
+                   OR NOT EXISTS (SELECT 1 FROM analytics_rounds a WHERE a.round_id = r.id))
+        ) AS closed
+    """
+)
+
+
+# Івенти, завершені до того, як end_event почав закривати останній раунд, або за розкладом
+_CLOSE_ENDED_SQL = text(
+    """
+    UPDATE rounds r
+    SET ended_at = e.end_date,
+        winner_song_id = (
+            SELECT s.id FROM songs s WHERE s.round_id = r.id ORDER BY s.vote_count DESC, s.id ASC LIMIT 1
+        )
+    FROM events e
+    WHERE e.id = r.event_id
+      AND r.ended_at IS NULL
+      AND e.end_date < now() - make_interval(days => :days)
+    RETURNING r.id
+    """
+)
+
+
+async def close_ended(conn: AsyncConnection, after_days: int, apply: bool) -> None:
+    if not apply:
+        n = (await conn.execute(
+            text(
+                "SELECT count(*) FROM rounds r JOIN events e ON e.id = r.event_id "
+                "WHERE r.ended_at IS NULL AND e.end_date < now() - make_interval(days => :days)"
+            ),
+            {"days": after_days},
+        )).scalar_one()
+        await conn.rollback()
+    else:
+        async with conn.begin():
+            n = len((await conn.execute(_CLOSE_ENDED_SQL, {"days": after_days})).all())
+    if n:
+        print(f"close {n} open rounds of ended events")
+
+
+async def archive(conn: AsyncConnection, after_days: int, apply: bool) -> None:
+    for lo in await partitions(conn):
+        hi = lo + ROUNDS_PER_PARTITION
+        row = (await conn.execute(_ARCHIVABLE_SQL, {"lo": lo, "hi": hi, "days": after_days})).one()
+        await conn.rollback()
+        # останню заповнену секцію не чіпаємо, поки в її діапазоні ще можуть з'явитись раунди
+        if not (row.allocated and row.closed):
+            continue
+        print(f"archive votes_r{lo} [{lo}, {hi}) -> {ARCHIVE_SCHEMA}.votes_r{lo}")
+        if not apply:
+            continue
+        async with conn.begin():
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            await conn.execute(text(f"ALTER TABLE votes DETACH PARTITION votes_r{lo}"))
+            await conn.execute(text(
+                f"CREATE TABLE {ARCHIVE_SCHEMA}.votes_r{lo} AS "
+                f"SELECT id, user_id, round_id, song_id, created_at FROM votes_r{lo} ORDER BY round_id, song_id"
+            ))
+            await conn.execute(text(
+                f"CREATE INDEX votes_r{lo}_round_brin ON {ARCHIVE_SCHEMA}.votes_r{lo} USING brin (round_id)"
+            ))
+            moved = (await conn.execute(text(f"SELECT count(*) FROM {ARCHIVE_SCHEMA}.votes_r{lo}"))).scalar_one()
+            await conn.execute(text(f"DROP TABLE votes_r{lo}"))
+        print(f"  archived {moved} votes")
+
+
+async def run(args) -> int:
+    async with engine.connect() as conn:
+        await ensure_ahead(conn, args.ahead, args.apply)
+        await close_ended(conn, args.after_days, args.apply)
+        await archive(conn, args.after_days, args.apply)
+    await engine.dispose()
+    return 0
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--apply", action="store_true", help="без нього — лише план")
+    p.add_argument("--after-days", type=int, default=int(os.getenv("VOTE_ARCHIVE_AFTER_DAYS", "30")))
+    p.add_argument("--ahead", type=int, default=2, help="скільки порожніх секцій тримати наперед")
+    return asyncio.run(run(p.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
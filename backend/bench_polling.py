@@ -0,0 +1,134 @@
+"""
+Симуляція ночі: скільки запитів і наскільки застарілу чергу бачать клієнти, що опитують
+/queue з фіксованим інтервалом, проти тих, що слухаються X-Poll-Interval (poll_hint).
+
+Подієва симуляція з віртуальним годинником (без мережі/Redis, секунди роботи):
+  - зміни черги — пуассонівський потік із темпом за фазами ночі (див. NIGHT)
+  - сервер має --capacity req/s; навантаження = поточний req/s / capacity
+    (в проді — запити в обробці / POLL_MAX_INFLIGHT, за законом Літтла те саме)
+  - застарілість: для кожної зміни й кожного клієнта — скільки секунд минуло, доки
+    клієнт її побачив; усереднюємо по всіх (зміна, клієнт)
+
+    python bench_polling.py
+    python bench_polling.py --clients 800 --capacity 150 --fixed 2,5,10
+"""
+import argparse
+import bisect
+import heapq
+import random
+import sys
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from app.services import poll_hint
+
+# (хвилин, змін черги за секунду)
+NIGHT = [
+    (30, 0.01),   # двері відчинились
+    (30, 0.15),   # зала наповнюється
+    (90, 1.2),    # пік: пропозиції й голоси
+    (30, 0.3),    # спад
+    (60, 0.03),   # афтепаті
+]
+EVENT_ID = 1
+
+
+def change_times(rnd: random.Random) -> Tuple[List[float], float]:
+    out: List[float] = []
+    t0 = 0.0
+    for minutes, rate in NIGHT:
+        end = t0 + minutes * 60
+        t = t0
+        while True:
+            t += rnd.expovariate(rate)
+            if t >= end:
+                break
+            out.append(t)
+        t0 = end
+    return out, t0
+
+
+def simulate(args, changes: List[float], duration: float, fixed: Optional[float]) -> Dict[str, float]:
+    rnd = random.Random(args.seed)
+    poll_hint._rates.clear()
+    prefix = [0.0]
+    for t in changes:
+        prefix.append(prefix[-1] + t)
+
+    window: deque = deque()              # час запитів за останню секунду -> req/s
+    heap = [(rnd.uniform(0, fixed or poll_hint.POLL_DEFAULT_SECONDS), i) for i in range(args.clients)]
+    heapq.heapify(heap)
+    last_seen = [0] * args.clients       # скільки змін клієнт уже бачив
+    requests = 0
+    overloaded = 0
+    stale_sum = 0.0
+    stale_n = 0
+
+    while heap:
+        t, c = heapq.heappop(heap)
+        if t >= duration:
+            continue
+        requests += 1
+        window.append(t)
+        while window and window[0] <= t - 1.0:
+            window.popleft()
+        load = len(window) / args.capacity
+        if load >= 1.0:
+            overloaded += 1
+
+        version = bisect.bisect_right(changes, t)
+        i = last_seen[c]
+        if version > i:
+            n = version - i
+            stale_sum += n * t - (prefix[version] - prefix[i])
+            stale_n += n
+            last_seen[c] = version
+
+        if fixed:
+            nxt = fixed
+        else:
+            poll_hint.observe(EVENT_ID, version, now=t)
+            nxt = max(1, -(-poll_hint.interval(EVENT_ID, load) // 1))   # як ceil у заголовку
+        # невеликий джитер, як у реальних клієнтів (таймери, мережа)
+        heapq.heappush(heap, (t + nxt * rnd.uniform(0.95, 1.05), c))
+
+    # зміни, яких клієнт так і не побачив до кінця ночі, — застарілі до кінця
+    for c in range(args.clients):
+        i = last_seen[c]
+        n = len(changes) - i
+        stale_sum += n * duration - (prefix[-1] - prefix[i])
+        stale_n += n
+
+    return {
+        "requests": requests,
+        "rps": requests / duration,
+        "staleness": stale_sum / stale_n if stale_n else 0.0,
+        "overloaded": overloaded / requests if requests else 0.0,
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--clients", type=int, default=400)
+    p.add_argument("--capacity", type=float, default=200.0, help="req/s, які витримує API")
+    p.add_argument("--fixed", default="2,5,10", help="фіксовані інтервали для порівняння, с")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args()
+
+    changes, duration = change_times(random.Random(args.seed))
+    print(
+        f"night {duration / 3600:.1f}h, {len(changes)} queue changes, {args.clients} polling clients, "
+        f"capacity {args.capacity:.0f} req/s"
+    )
+    print(f"  {'strategy':<12} {'requests':>10} {'avg req/s':>10} {'staleness':>10} {'overloaded':>11}")
+    runs = [(f"fixed {x}s", float(x)) for x in args.fixed.split(",") if x] + [("adaptive", None)]
+    for label, fixed in runs:
+        r = simulate(args, changes, duration, fixed)
+        print(
+            f"  {label:<12} {r['requests']:10d} {r['rps']:10.1f} {r['staleness']:9.2f}s "
+            f"{r['overloaded']:10.1%}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
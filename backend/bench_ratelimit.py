@@ -0,0 +1,98 @@
+"""
+Скільки коштує rate limit на запит: латентність і пропускна здатність check_buckets
+проти голого PING до того ж Redis (нижня межа будь-якого round trip).
+
+    REDIS_URL=redis://127.0.0.1:6379/0 python bench_ratelimit.py
+    python bench_ratelimit.py --concurrency 64 --requests 20000
+
+Варіанти:
+  ping         — redis PING, база
+  1 bucket     — rate_limit на одного користувача
+  3 buckets    — користувач + IP + івент (як suggest_limit), той самий один EVAL
+  3 x 1 bucket — ті самі три перевірки окремими викликами (три round trip)
+Ключі користувачів розкидані, ліміти великі — міряємо перевірку, а не відмови.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+from app.core.redis_client import redis_client
+from app.services import metrics
+from app.utils.ratelimit import check_buckets
+
+BIG = (1_000_000, 60)
+
+
+async def _measure(fn: Callable[[int], Awaitable[object]], requests: int, concurrency: int) -> Tuple[List[float], float]:
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            t0 = time.perf_counter()
+            await fn(i)
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return latencies, wall
+
+
+async def run(args) -> None:
+    rnd = random.Random(args.seed)
+    users = [rnd.randrange(10 ** 9) for _ in range(args.users)]
+
+    def user(i: int) -> int:
+        return users[i % len(users)]
+
+    cases = [
+        ("ping", lambda i: redis_client.ping()),
+        ("1 bucket", lambda i: check_buckets([(f"rl:bench:u:{user(i)}", *BIG)])),
+        ("3 buckets", lambda i: check_buckets([
+            (f"rl:bench:u:{user(i)}", *BIG),
+            (f"rl:bench:ip:{user(i) % 500}", *BIG),
+            ("rl:bench:ev:club", *BIG),
+        ])),
+    ]
+
+    async def separate(i: int) -> None:
+        await check_buckets([(f"rl:bench:u:{user(i)}", *BIG)])
+        await check_buckets([(f"rl:bench:ip:{user(i) % 500}", *BIG)])
+        await check_buckets([("rl:bench:ev:club", *BIG)])
+
+    cases.append(("3 x 1 bucket", separate))
+
+    await redis_client.ping()
+    print(f"requests={args.requests} concurrency={args.concurrency} users={args.users}")
+    base = None
+    for label, fn in cases:
+        latencies, wall = await _measure(fn, args.requests, args.concurrency)
+        p50 = metrics.quantile(latencies, 0.5) * 1000
+        p99 = metrics.quantile(latencies, 0.99) * 1000
+        base = base if base is not None else p50
+        print(
+            f"  {label:<13} p50 {p50:6.3f} ms  p99 {p99:6.3f} ms  "
+            f"{args.requests / wall:8.0f} ops/s  (+{p50 - base:5.3f} ms p50 над ping)"
+        )
+
+    keys = [k async for k in redis_client.scan_iter("rl:bench:*")]
+    for i in range(0, len(keys), 500):
+        await redis_client.delete(*keys[i:i + 500])
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--requests", type=int, default=10_000)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--users", type=int, default=5_000)
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
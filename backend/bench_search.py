@@ -0,0 +1,221 @@
+"""
+Бенчмарк unified_search на локальному mock-провайдері (без інтернету).
+
+Імітує натовп, що друкує назви треків у пошуку mini-app:
+  - популярність треків за Zipf (усі шукають одні й ті самі хіти)
+  - натискання клавіш з інтервалом 80..350ms, запит іде після паузи >= debounce
+    (як у useEventData.search) або на останньому символі
+  - користувачі стартують рівномірно протягом --ramp секунд
+
+    python bench_search.py --users 300 --providers mock,mock2
+    MOCK_SEARCH_LATENCY=uniform:100:400 python bench_search.py --users 500
+    REDIS_URL=redis://127.0.0.1:6379/0 python bench_search.py --workers 4
+    python bench_search.py --hits --duration 5
+
+--workers N запускає N окремих процесів (як N воркерів uvicorn/gunicorn) з однаковим
+натовпом одночасно — видно, скільки апстрім-викликів лишається після крос-воркерного
+single-flight через Redis.
+
+Звіт: p50/p90/p99 латентності unified_search, кількість апстрім-викликів на
+провайдер і ефективність кешу (fresh/stale/inflight/miss).
+
+--hits: запити на теплий кеш через весь FastAPI-стек (ASGI без мережі, один процес =
+одне ядро). Порівнює старий шлях (dict -> jsonable_encoder -> JSONResponse) з готовими
+байтами router_search.search (без стиснення, gzip, br). Потрібні змінні з .env (DATABASE_URL тощо),
+бо роутер тягне за собою налаштування.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+os.environ.setdefault("SEARCH_PROVIDERS", "mock,mock2")
+
+from app.services import metrics, music_search  # noqa: E402
+from app.services.search_providers import active_providers, configure_providers  # noqa: E402
+
+TITLES = [
+    "blinding lights", "bad guy", "levitating", "shape of you", "stay", "heat waves",
+    "as it was", "flowers", "dance monkey", "one kiss", "cold heart", "believer",
+    "roses", "titanium", "wake me up", "lose yourself", "numb", "yellow", "smells like teen spirit",
+    "around the world", "one more time", "sandstorm", "strobe", "opus", "animals", "clarity",
+    "summer", "faded", "lean on", "closer", "something just like this", "don't start now",
+    "physical", "kernkraft 400", "freed from desire", "blue", "better off alone", "insomnia",
+    "children", "show me love", "music sounds better with you", "you & me", "latch", "ghosts n stuff",
+]
+
+DEBOUNCE = 0.25
+
+
+def zipf_pick(rnd: random.Random, items: List[str], s: float) -> str:
+    weights = [1 / (i + 1) ** s for i in range(len(items))]
+    return rnd.choices(items, weights=weights, k=1)[0]
+
+
+async def user_session(rnd: random.Random, delay: float, zipf_s: float, latencies: List[float]) -> None:
+    await asyncio.sleep(delay)
+    title = zipf_pick(rnd, TITLES, zipf_s)
+
+    typed = ""
+    for i, ch in enumerate(title):
+        typed += ch
+        gap = rnd.uniform(0.08, 0.35)
+        last = i == len(title) - 1
+        if len(typed.strip()) >= 2 and (gap >= DEBOUNCE or last):
+            t0 = time.perf_counter()
+            await music_search.unified_search(typed, 15, None)
+            latencies.append(time.perf_counter() - t0)
+        if not last:
+            await asyncio.sleep(gap)
+
+
+def _counter(name: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in metrics._counters.get(name, {}).items():
+        out[",".join(f"{a}={b}" for a, b in k)] = v
+    return out
+
+
+async def crowd(args, latencies: List[float]) -> float:
+    configure_providers(args.providers)
+    rnd = random.Random(args.seed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        user_session(random.Random(rnd.random()), rnd.uniform(0, args.ramp), args.zipf, latencies)
+        for _ in range(args.users)
+    ))
+    return time.perf_counter() - started
+
+
+def _worker(args, start_at: float):
+    # усі процеси стартують одночасно, щоб популярні запити реально збігались у часі
+    time.sleep(max(0.0, start_at - time.time()))
+    latencies: List[float] = []
+    asyncio.run(crowd(args, latencies))
+    calls = {name: getattr(fn, "calls", 0) for name, fn in active_providers().items()}
+    return latencies, calls, _counter("search_singleflight_total")
+
+
+def run_workers(args) -> None:
+    start_at = time.time() + 2.0
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        results = pool.starmap(_worker, [(args, start_at)] * args.workers)
+
+    latencies = [x for lat, _, _ in results for x in lat]
+    print(f"workers={args.workers} users/worker={args.users} requests={len(latencies)}")
+    for q in (0.5, 0.9, 0.99):
+        print(f"  p{int(q * 100):<3} {metrics.quantile(latencies, q) * 1000:8.1f} ms")
+
+    total: Dict[str, int] = {}
+    for i, (_, calls, roles) in enumerate(results):
+        print(f"  worker {i}: upstream {calls} single-flight {roles}")
+        for name, n in calls.items():
+            total[name] = total.get(name, 0) + n
+    print(f"upstream calls total: {total}")
+
+
+async def run(args) -> None:
+    latencies: List[float] = []
+    wall = await crowd(args, latencies)
+
+    n = len(latencies)
+    print(f"users={args.users} requests={n} wall={wall:.1f}s rps={n / wall:.1f}")
+    for q in (0.5, 0.9, 0.99):
+        print(f"  p{int(q * 100):<3} {metrics.quantile(latencies, q) * 1000:8.1f} ms")
+    print(f"  max  {max(latencies or [0]) * 1000:8.1f} ms")
+
+    print("upstream calls:")
+    for name, fn in active_providers().items():
+        print(f"  {name:<8} {getattr(fn, 'calls', '?')}")
+
+    cache = _counter("search_cache_total")
+    total = sum(cache.values()) or 1
+    print("cache:")
+    for k, v in sorted(cache.items()):
+        print(f"  {k:<20} {int(v):6d}  {v / total:6.1%}")
+    served_without_upstream = sum(v for k, v in cache.items() if "miss" not in k)
+    print(f"  effectiveness        {served_without_upstream / total:6.1%}")
+    print(f"hedged: {_counter('search_hedged_requests_total')}")
+
+
+async def _asgi_get(app, path: str, query: bytes, headers) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query,
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(msg):
+        nonlocal size
+        if msg["type"] == "http.response.body":
+            size += len(msg.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def run_hits(args) -> None:
+    from fastapi import FastAPI
+    from app.api.router_search import router
+
+    configure_providers(args.providers)
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.get("/legacy")
+    async def legacy(q: str, limit: int = 15):
+        # як було до пре-енкодингу: dict з кешу енкодиться заново на кожен запит
+        return await music_search.unified_search(q=q, limit=limit, lang=None)
+
+    for t in TITLES:
+        await music_search.unified_search(t, 15, None)
+
+    queries = [f"q={t.replace(' ', '+').replace('&', '%26')}&limit=15".encode() for t in TITLES]
+    cases = [
+        ("dict + JSONResponse", "/legacy", b""),
+        ("pre-encoded", "/api/v1/search/", b""),
+        ("pre-encoded gzip", "/api/v1/search/", b"gzip"),
+        ("pre-encoded br", "/api/v1/search/", b"gzip, br"),
+    ]
+    print(f"warm-cache hits, {len(queries)} distinct queries, {args.duration:.0f}s per case")
+    for label, path, ae in cases:
+        headers = [(b"host", b"bench"), (b"accept-encoding", ae)] if ae else [(b"host", b"bench")]
+        n = total = 0
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        while time.perf_counter() - wall0 < args.duration:
+            total += await _asgi_get(app, path, queries[n % len(queries)], headers)
+            n += 1
+        cpu = time.process_time() - cpu0
+        print(f"  {label:<22} {n / cpu:9.0f} req/s per core   {total / n:7.0f} B/response")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--users", type=int, default=200)
+    p.add_argument("--ramp", type=float, default=10.0, help="за скільки секунд заходять усі користувачі")
+    p.add_argument("--zipf", type=float, default=1.1, help="параметр Zipf популярності треків")
+    p.add_argument("--providers", default=os.environ["SEARCH_PROVIDERS"])
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--workers", type=int, default=0, help="N процесів зі спільним Redis")
+    p.add_argument("--hits", action="store_true", help="req/s на ядро для теплого кешу")
+    p.add_argument("--duration", type=float, default=3.0, help="секунд на кожен варіант у --hits")
+    args = p.parse_args()
+    if args.hits:
+        asyncio.run(run_hits(args))
+    elif args.workers:
+        run_workers(args)
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Бенчмарк серіалізації гарячих read-роутів: як було (dict -> модель -> response_model ->
+jsonable_encoder -> JSONResponse) проти рядків, закодованих одразу в байти.
+
+Без БД і Redis: дані генеруються в пам'яті, запити йдуть через FastAPI-стек як ASGI
+без мережі (один процес = одне ядро), тож різниця — чисто серіалізація й валідація.
+
+    python bench_serialize.py
+    python bench_serialize.py --events 500 --items 100 --duration 5
+
+Роути:
+  admin events   — GET /api/v1/admin/events (список EventOut з dj_ids)
+  admin event    — GET /api/v1/admin/events/{id}
+  queue          — GET /api/v1/events/{slug}/queue (snapshot черги з Redis)
+  round state    — GET /api/v1/public/event/{token}/state
+  event summary  — GET /api/v1/events/{slug}
+Потрібні змінні з .env (DATABASE_URL тощо), бо роутери тягнуть за собою налаштування.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import List
+
+from fastapi import FastAPI, Response
+
+from app.api.router_admin import EventOut, _event_row, _json
+from app.crud.event_crud import to_event
+from app.crud.vote_crud import state_response
+from app.models.models import Event, Round
+from app.schemas.schemas import EventResponse, RoundResponse, SongResponse, StateResponse
+from app.services.event_cache import entry, summary_body
+from app.services.event_runtime import Track, _snapshot_items
+from app.services.fastjson import dumps
+from bench_search import _asgi_get
+
+
+_Row = namedtuple("_Row", "id club_id title preview start_date end_date created_at dj_ids")
+
+
+def _legacy_snapshot(ids, raw_items, raw_votes):
+    # як було до прямого розбору: Track.from_json на кожен елемент
+    out = []
+    for tid, js, v in zip(ids, raw_items, raw_votes):
+        t = Track.from_json(js)
+        out.append({
+            "track_id": t.track_id or tid, "title": t.title, "artist": t.artist,
+            "cover_url": t.cover_url, "duration_sec": t.duration_sec, "votes": int(v or 0),
+            "suggested_by": t.suggested_by, "created_at": t.created_at,
+        })
+    return out
+
+
+def build_app(args) -> FastAPI:
+    rnd = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+
+    # як Row з select(*_EVENT_COLUMNS): _asdict() у порядку колонок
+    rows = [
+        _Row(
+            id=i, club_id=1, title=f"Night {i}", preview=None if i % 3 else f"preview {i}",
+            start_date=now - timedelta(days=i), end_date=now - timedelta(days=i, hours=-6),
+            created_at=now - timedelta(days=i + 7),
+            dj_ids=[rnd.randrange(1, 50) for _ in range(rnd.randrange(0, 4))] or None,
+        )
+        for i in range(args.events)
+    ]
+    dicts = [{**r._asdict(), "dj_ids": list(r.dj_ids or [])} for r in rows]
+
+    ids = [f"deezer:{i}" for i in range(args.items)]
+    raw_items = [
+        Track(
+            track_id=tid, title=f"Track {i}", artist=f"Artist {i % 17}",
+            cover_url=None, duration_sec=180 + i, suggested_by=1000 + i, created_at=1_700_000_000 + i,
+        ).to_json()
+        for i, tid in enumerate(ids)
+    ]
+    raw_votes = [str(rnd.randrange(50)) for _ in ids]
+
+    ev = Event(id=1, club_id=1, title="Night", preview=None, start_date=now, end_date=None, created_at=now)
+    rnd_row = Round(id=3, event_id=1, number=3, started_at=now, ended_at=None)
+    song_rows = [(i, f"Song {i}", 3, rnd.randrange(40)) for i in range(args.songs)]
+    my_ids = [s[0] for s in song_rows[:2]]
+
+    cached = entry(SimpleNamespace(id=1, name="Club", slug="club"), ev)
+
+    app = FastAPI()
+
+    @app.get("/legacy/admin/events", response_model=list[EventOut])
+    async def legacy_events():
+        return [EventOut(**d) for d in dicts]
+
+    @app.get("/new/admin/events", response_model=list[EventOut])
+    async def new_events():
+        return _json(dumps([_event_row(r) for r in rows]))
+
+    @app.get("/legacy/admin/event", response_model=EventOut)
+    async def legacy_event():
+        return EventOut(**dicts[0])
+
+    @app.get("/new/admin/event", response_model=EventOut)
+    async def new_event():
+        return _json(dumps(_event_row(rows[0])))
+
+    @app.get("/legacy/queue")
+    async def legacy_queue():
+        return {"version": 1, "full": True, "items": _legacy_snapshot(ids, raw_items, raw_votes), "attendees_count": 250}
+
+    @app.get("/new/queue")
+    async def new_queue():
+        state = {"version": 1, "full": True, "items": _snapshot_items(ids, raw_items, raw_votes), "attendees_count": 250}
+        return Response(content=dumps(state), media_type="application/json")
+
+    @app.get("/legacy/state", response_model=StateResponse)
+    async def legacy_state():
+        return StateResponse(
+            event=EventResponse.model_validate(ev, from_attributes=True),
+            round=RoundResponse.model_validate(rnd_row, from_attributes=True),
+            songs=[SongResponse(id=i, name=n, round_id=r, votes=v) for i, n, r, v in song_rows],
+            user_voted_song_ids=my_ids,
+        )
+
+    @app.get("/new/state", response_model=StateResponse)
+    async def new_state():
+        return Response(content=state_response(ev, rnd_row, song_rows, my_ids), media_type="application/json")
+
+    @app.get("/legacy/summary", response_model=EventResponse)
+    async def legacy_summary():
+        return to_event(ev)
+
+    @app.get("/new/summary")
+    async def new_summary():
+        body, _ = summary_body("club", cached)
+        return Response(content=body, media_type="application/json")
+
+    return app
+
+
+async def _same_shape(app, name: str) -> bool:
+    # байти можуть відрізнятись порядком/пробілами, але JSON має бути той самий
+    bodies = []
+    for prefix in ("legacy", "new"):
+        chunks: List[bytes] = []
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/{prefix}/{name}", "raw_path": f"/{prefix}/{name}".encode(),
+            "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(msg):
+            if msg["type"] == "http.response.body":
+                chunks.append(msg.get("body", b""))
+
+        await app(scope, receive, send)
+        bodies.append(json.loads(b"".join(chunks)))
+    return bodies[0] == bodies[1]
+
+
+async def run(args) -> None:
+    app = build_app(args)
+    cases = [
+        ("admin events", "admin/events"),
+        ("admin event", "admin/event"),
+        ("queue", "queue"),
+        ("round state", "state"),
+        ("event summary", "summary"),
+    ]
+    headers = [(b"host", b"bench")]
+    print(f"events={args.events} queue items={args.items} songs={args.songs}, {args.duration:.0f}s per case")
+    print(f"  {'route':<14} {'before':>10} {'after':>10}   req/s per core")
+    for label, name in cases:
+        rates = []
+        for prefix in ("legacy", "new"):
+            path = f"/{prefix}/{name}"
+            n = 0
+            cpu0, wall0 = time.process_time(), time.perf_counter()
+            while time.perf_counter() - wall0 < args.duration:
+                await _asgi_get(app, path, b"", headers)
+                n += 1
+            rates.append(n / (time.process_time() - cpu0))
+        same = "same JSON" if await _same_shape(app, name) else "differs (summary: нова схема з club/slug)"
+        print(f"  {label:<14} {rates[0]:10.0f} {rates[1]:10.0f}   x{rates[1] / rates[0]:.1f}  {same}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--events", type=int, default=200, help="івентів у списку адмінки")
+    p.add_argument("--items", type=int, default=20, help="треків у snapshot черги")
+    p.add_argument("--songs", type=int, default=30, help="пісень у стані раунду")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--duration", type=float, default=2.0, help="секунд на кожен варіант")
+    args = p.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
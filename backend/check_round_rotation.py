@@ -0,0 +1,104 @@
+"""
+Перевірка ротації раундів під конкуренцією: N одночасних "завершити раунд" для одного івенту.
+
+Очікування (end_round_and_start_next):
+- рівно один виклик закриває раунд, решта — 409 (із --round; без нього виклики
+  серіалізуються lock'ом і кожен закриває наступний раунд — але без дублікатів)
+- у івенту рівно один відкритий раунд, номери без пропусків і повторів
+- на успішний виклик — стейтмент ротації + COMMIT, менше трьох round trip
+
+Працює з реальною БД і Redis (.env), змінює дані: запускайте на тестовому івенті.
+
+    python check_round_rotation.py --event 7
+    python check_round_rotation.py --event 7 --calls 50 --no-round
+"""
+import argparse
+import asyncio
+import sys
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import event as sa_event, func, select
+
+from app.crud.event_crud import end_round_and_start_next, open_round
+from app.models.models import Round
+from app.models.session import async_session, engine
+
+_trips: Counter = Counter()
+_current = {}
+
+
+def _count(conn, *args, **kwargs) -> None:
+    task = _current.get(id(conn))
+    if task is not None:
+        _trips[task] += 1
+
+
+async def _one(i: int, event_id: int, round_id) -> str:
+    async with async_session() as db:
+        conn = await db.connection()
+        _current[id(conn.sync_connection)] = i
+        try:
+            await end_round_and_start_next(db, event_id, round_id)
+            return "ok"
+        except HTTPException as e:
+            return str(e.status_code)
+        finally:
+            _current.pop(id(conn.sync_connection), None)
+
+
+async def run(args) -> int:
+    sa_event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    sa_event.listen(engine.sync_engine, "commit", _count)
+    sa_event.listen(engine.sync_engine, "rollback", _count)
+
+    async with async_session() as db:
+        r = await open_round(db, args.event)
+        if not r:
+            print(f"event {args.event}: no open round")
+            return 1
+        before = r.number
+    round_id = None if args.no_round else r.id
+
+    results = await asyncio.gather(*(_one(i, args.event, round_id) for i in range(args.calls)))
+    outcome = Counter(results)
+
+    async with async_session() as db:
+        open_count = (await db.execute(
+            select(func.count()).where(Round.event_id == args.event, Round.ended_at.is_(None))
+        )).scalar_one()
+        numbers = [n for (n,) in (await db.execute(
+            select(Round.number).where(Round.event_id == args.event, Round.number > before).order_by(Round.number)
+        )).all()]
+    await engine.dispose()
+
+    ok = outcome.get("ok", 0)
+    trips = max(_trips.values()) if _trips else 0
+    print(f"calls: {args.calls}, results: {dict(outcome)}")
+    print(f"open rounds: {open_count}, new round numbers: {numbers}")
+    print(f"round trips per call (max, без BEGIN/pre-ping): {trips}")
+
+    failed = []
+    if open_count != 1:
+        failed.append("expected exactly one open round")
+    if numbers != list(range(before + 1, before + 1 + ok)):
+        failed.append("round numbers have gaps or duplicates")
+    if round_id is not None and ok != 1:
+        failed.append("expected exactly one successful rotation")
+    if trips >= 3:
+        failed.append("rotation takes 3+ round trips")
+    for f in failed:
+        print(f"FAIL: {f}")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--event", type=int, required=True)
+    p.add_argument("--calls", type=int, default=50)
+    p.add_argument("--no-round", action="store_true", help="не передавати round_id (серіалізація без 409)")
+    return asyncio.run(run(p.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Звірка songs.vote_count з фактичною кількістю рядків у votes.
+
+Лічильник змінюється в тій самій транзакції, що й голос (vote_crud), але голоси можуть
+зникнути й повз нього — каскадне видалення користувача, ручні правки в БД.
+
+    python check_vote_counts.py                 # лише звіт, exit 1 якщо є розбіжності
+    python check_vote_counts.py --fix           # виправити
+    python check_vote_counts.py --round 42      # лише один раунд
+"""
+import argparse
+import asyncio
+import sys
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+from app.models.models import Song, Vote
+from app.models.session import async_session, engine
+from archive_votes import archived_ranges
+
+
+def _drift_query(round_id: Optional[int], archived: List[Tuple[int, int]]):
+    actual = (
+        select(Vote.song_id, func.count().label("cnt"))
+        .group_by(Vote.song_id)
+        .subquery()
+    )
+    stmt = (
+        select(Song.id, Song.round_id, Song.vote_count, func.coalesce(actual.c.cnt, 0).label("actual"))
+        .outerjoin(actual, actual.c.song_id == Song.id)
+        .where(Song.vote_count != func.coalesce(actual.c.cnt, 0))
+        .order_by(Song.id)
+    )
+    if round_id is not None:
+        stmt = stmt.where(Song.round_id == round_id)
+    # голоси від'єднаних секцій лежать в archive.* — лічильники цих раундів не звіряємо
+    for lo, hi in archived:
+        stmt = stmt.where(~Song.round_id.between(lo, hi - 1))
+    return stmt
+
+
+async def run(args) -> int:
+    async with async_session() as db:
+        archived = await archived_ranges(await db.connection())
+        rows = (await db.execute(_drift_query(args.round, archived))).all()
+        for r in rows[:args.show]:
+            print(f"song {r.id} (round {r.round_id}): vote_count={r.vote_count} actual={r.actual}")
+        if len(rows) > args.show:
+            print(f"... and {len(rows) - args.show} more")
+        print(f"mismatched songs: {len(rows)}")
+
+        if rows and args.fix:
+            # перераховуємо в одному UPDATE, а не з прочитаних значень — голоси могли змінитись
+            actual = (
+                select(func.count())
+                .where(Vote.song_id == Song.id)
+                .correlate(Song)
+                .scalar_subquery()
+            )
+            await db.execute(
+                update(Song)
+                .where(Song.id.in_([r.id for r in rows]))
+                .values(vote_count=actual)
+            )
+            await db.commit()
+            print("fixed")
+    await engine.dispose()
+    return 1 if rows and not args.fix else 0
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--fix", action="store_true")
+    p.add_argument("--round", type=int, default=None)
+    p.add_argument("--show", type=int, default=20, help="скільки розбіжностей вивести")
+    return asyncio.run(run(p.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Локальний fake Deezer/iTunes для перевірки пошуку без інтернету.
+
+    FAKE_MODE=slow uvicorn fake_provider_server:app --port 9900
+    DEEZER_API_URL=http://127.0.0.1:9900/deezer ITUNES_API_URL=http://127.0.0.1:9900/itunes uvicorn main:app
+
+Режими: FAKE_MODE для обох, FAKE_DEEZER_MODE / FAKE_ITUNES_MODE окремо,
+або на льоту POST /_mode?provider=deezer&mode=flaky:
+  ok     — відповідає за FAKE_LATENCY_MS
+  slow   — FAKE_SLOW_MS (за замовчуванням довше ніж дедлайн пошуку)
+  flaky  — кожен FAKE_FLAKY_EVERY-й запит 500, решта ok
+  down   — завжди 503
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, HTTPException, Query
+
+app = FastAPI(title="Fake search providers")
+
+LATENCY_MS = int(os.getenv("FAKE_LATENCY_MS", "80"))
+SLOW_MS = int(os.getenv("FAKE_SLOW_MS", "3000"))
+FLAKY_EVERY = int(os.getenv("FAKE_FLAKY_EVERY", "2"))
+
+_modes = {
+    "deezer": os.getenv("FAKE_DEEZER_MODE", os.getenv("FAKE_MODE", "ok")),
+    "itunes": os.getenv("FAKE_ITUNES_MODE", os.getenv("FAKE_MODE", "ok")),
+}
+_hits = {"deezer": 0, "itunes": 0}
+
+
+async def _behave(provider: str) -> None:
+    _hits[provider] += 1
+    mode = _modes[provider]
+
+    if mode == "down":
+        raise HTTPException(503, "down")
+    if mode == "slow":
+        await asyncio.sleep(SLOW_MS / 1000)
+        return
+    if mode == "flaky" and _hits[provider] % FLAKY_EVERY == 0:
+        raise HTTPException(500, "flaky")
+
+    jitter = random.uniform(0.7, 1.3)
+    await asyncio.sleep(LATENCY_MS * jitter / 1000)
+
+
+@app.post("/_mode")
+async def set_mode(provider: str = Query(...), mode: str = Query(...)):
+    if provider not in _modes or mode not in ("ok", "slow", "flaky", "down"):
+        raise HTTPException(400, "bad provider or mode")
+    _modes[provider] = mode
+    return {"modes": _modes, "hits": _hits}
+
+
+@app.get("/_stats")
+async def stats():
+    return {"modes": _modes, "hits": _hits}
+
+
+@app.get("/deezer/search")
+async def deezer_search(q: str, limit: int = 25):
+    await _behave("deezer")
+    return {
+        "data": [
+            {
+                "id": 1000 + i,
+                "title": f"{q} song {i}",
+                "duration": 180 + i,
+                "artist": {"name": f"Deezer Artist {i}"},
+                "album": {"title": f"Album {i}", "cover_xl": f"https://example.invalid/dz/{i}.jpg"},
+            }
+            for i in range(limit)
+        ]
+    }
+
+
+@app.get("/itunes/search")
+async def itunes_search(term: str, limit: int = 25, entity: str = "song"):
+    await _behave("itunes")
+    return {
+        "results": [
+            {
+                "trackId": 2000 + i,
+                "trackName": f"{term} track {i}",
+                "artistName": f"iTunes Artist {i}",
+                "collectionName": f"Collection {i}",
+                "artworkUrl100": f"https://example.invalid/it/{i}.jpg",
+                "trackTimeMillis": (200 + i) * 1000,
+            }
+            for i in range(limit)
+        ]
+    }
@@ -1,16 +1,21 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from app.api.auth_telegram_webapp import router as tg_auth_router
 from app.api.router_admin import router as admin_router
+from app.api.router_covers import router as covers_router
+from app.api.router_public import router as public_router
 from app.api.router_search import router as search_router
 from app.api.routes_event_runtime_tg import router as events_router
 from app.api.ws import router as ws_router
 from app.models.session import Base, engine
+from app.services import metrics
+from app.services.cover_proxy import close_cover_client
 from app.services.music_search import close_http_client
+from app.services.poll_hint import InflightMiddleware
 
 app = FastAPI(title="Next Track API")
 
@@ -31,7 +36,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # підказки опитування мають бути видні fetch() з іншого домену
+    expose_headers=["X-Poll-Interval", "Retry-After", "ETag"],
 )
+app.add_middleware(InflightMiddleware)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
@@ -52,11 +60,18 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(search_router)
 app.include_router(tg_auth_router)
 app.include_router(events_router)
 app.include_router(ws_router)
 app.include_router(admin_router)
+app.include_router(covers_router)
+app.include_router(public_router)
 
 
 @app.get("/__dev__/init_db")
@@ -68,4 +83,5 @@ async def init_db():
 
 @app.on_event("shutdown")
 async def _shutdown():
-    await close_http_client()
\ No newline at end of file
+    await close_http_client()
+    await close_cover_client()
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""Проксі обкладинок: підписуємо й тягнемо лише CDN провайдерів, без SSRF і відкритого редіректу."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import cover_proxy
+from app.services.cover_proxy import CoverError, allowed, proxied, verify_token
+
+DEEZER = "https://e-cdns-images.dzcdn.net/images/cover/abc/1000x1000-000000-80-0-0.jpg"
+ITUNES = "https://is1-ssl.mzstatic.com/image/thumb/Music/x/100x100bb.jpg"
+
+
+def test_allowlist():
+    assert allowed(DEEZER) and allowed(ITUNES)
+    for url in (
+        "http://169.254.169.254/latest/meta-data/",
+        "https://169.254.169.254/",
+        "http://e-cdns-images.dzcdn.net/x.jpg",          # лише https
+        "https://dzcdn.net.evil.com/x.jpg",
+        "https://evildzcdn.net/x.jpg",
+        "https://user@cdn-images.dzcdn.net/x.jpg",
+        "https://cdn-images.dzcdn.net:8080/x.jpg",
+        "https://localhost/x.jpg",
+        "",
+        None,
+    ):
+        assert not allowed(url), url
+
+
+def test_proxied_signs_only_allowed_hosts():
+    assert proxied("http://169.254.169.254/latest/meta-data/") is None
+    token = proxied(DEEZER).rsplit("/", 1)[1]
+    assert verify_token(token) == DEEZER
+    assert proxied("/static/default.jpg") == "/static/default.jpg"
+
+
+def test_private_resolution_is_rejected(monkeypatch):
+    async def fake_getaddrinfo(host, port, **kwargs):
+        return [(None, None, None, "", ("10.0.0.5", port))]
+
+    async def run():
+        monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", fake_getaddrinfo)
+        await cover_proxy._open(DEEZER)
+
+    with pytest.raises(CoverError, match="non-public"):
+        asyncio.run(run())
+
+
+def test_redirect_to_other_host_is_rejected(monkeypatch):
+    async def public(host):
+        return None
+
+    def handler(request):
+        return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data/"})
+
+    monkeypatch.setattr(cover_proxy, "_check_resolves_public", public)
+    monkeypatch.setattr(cover_proxy, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    with pytest.raises(CoverError, match="not allowed"):
+        asyncio.run(cover_proxy._open(DEEZER))
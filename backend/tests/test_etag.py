@@ -0,0 +1,21 @@
+from app.services.fastjson import etag_matches
+
+ETAG = '"abc123"'
+
+
+def test_exact_and_list():
+    assert etag_matches('"abc123"', ETAG)
+    assert etag_matches('"zzz", "abc123"', ETAG)
+    assert etag_matches('"zzz",W/"abc123"', ETAG)
+
+
+def test_star():
+    assert etag_matches("*", ETAG)
+
+
+def test_no_substring_match():
+    assert not etag_matches('"abc1234"', ETAG)
+    assert not etag_matches('"xabc123"', ETAG)
+    assert not etag_matches('"abc123', ETAG)
+    assert not etag_matches("", ETAG)
+    assert not etag_matches(None, ETAG)
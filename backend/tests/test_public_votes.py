@@ -0,0 +1,114 @@
+"""Публічні роути голосування й пропозицій змонтовані в main.app: ліміти, квота, vote_crud."""
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import main
+from app.api import router_public
+from app.schemas.schemas import SongSuggestResponse
+from app.utils import ratelimit
+
+INIT = {"X-Telegram-InitData": "signed"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    async def user_id(db, telegram_id):
+        return telegram_id + 1000
+
+    async def switch_vote(db, user_id, song_id):
+        calls.append(("switch", user_id, song_id))
+        return {"ok": True, "moved": True, "votes": 1, "from": {"song_id": 3, "votes": 0}}
+
+    async def remove_vote(db, user_id, song_id):
+        calls.append(("remove", user_id, song_id))
+        return {"ok": True, "votes": 0}
+
+    async def no_db():
+        yield None
+
+    monkeypatch.setattr(router_public, "verify_telegram_init_data", lambda init_data: {"id": 7})
+    monkeypatch.setattr(router_public, "verify_event_token", lambda token: 42)
+    monkeypatch.setattr(router_public, "resolve_user_id", user_id)
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(router_public, "switch_vote", switch_vote)
+    monkeypatch.setattr(router_public, "remove_vote", remove_vote)
+    main.app.dependency_overrides[router_public.get_async_session] = no_db
+    yield TestClient(main.app), calls
+    main.app.dependency_overrides.clear()
+
+
+def test_switch_is_mounted(client):
+    c, calls = client
+    r = c.post("/api/v1/public/event/tok/vote/switch", json={"song_id": 5}, headers=INIT)
+    assert r.status_code == 200
+    assert r.json()["moved"] is True
+    assert calls == [("switch", 1007, 5)]
+
+
+def test_unvote_is_mounted(client):
+    c, calls = client
+    r = c.delete("/api/v1/public/event/tok/vote/5", headers=INIT)
+    assert r.status_code == 200
+    assert calls == [("remove", 1007, 5)]
+
+
+def test_requires_init_data(client):
+    c, calls = client
+    assert c.delete("/api/v1/public/event/tok/vote/5").status_code == 422
+    assert calls == []
+
+
+@pytest.fixture
+def suggest(client, monkeypatch):
+    c, calls = client
+    quota = {}
+
+    async def max_per_user(db, event_id):
+        return 2
+
+    async def reserve(event_id, tg_id, max_per_user):
+        n = quota.get(tg_id, 0)
+        if n >= max_per_user:
+            return None
+        quota[tg_id] = n + 1
+        return n + 1
+
+    async def release(event_id, tg_id):
+        quota[tg_id] -= 1
+
+    async def add_song(db, event_id, song, user_id=None):
+        calls.append(("suggest", user_id, song.name))
+        created = song.name != "dup"
+        return SongSuggestResponse(id=1, name=song.name, round_id=1, votes=1, created=created, voted=not created)
+
+    monkeypatch.setattr(router_public, "max_suggestions_per_user", max_per_user)
+    monkeypatch.setattr(router_public, "reserve_suggestion", reserve)
+    monkeypatch.setattr(router_public, "release_suggestion", release)
+    monkeypatch.setattr(router_public, "add_song_to_current_round", add_song)
+    return c, calls, quota
+
+
+def test_suggest_quota_per_user(suggest):
+    c, calls, quota = suggest
+    for name in ("a", "b"):
+        assert c.post("/api/v1/public/event/tok/songs", json={"name": name}, headers=INIT).status_code == 200
+    r = c.post("/api/v1/public/event/tok/songs", json={"name": "c"}, headers=INIT)
+    assert r.status_code == 429
+    assert [name for _, _, name in calls] == ["a", "b"]
+    assert quota == {7: 2}
+
+
+def test_duplicate_suggestion_does_not_use_quota(suggest):
+    c, calls, quota = suggest
+    r = c.post("/api/v1/public/event/tok/songs", json={"name": "dup"}, headers=INIT)
+    assert r.status_code == 200 and r.json()["voted"] is True
+    assert quota == {7: 0}
+
+
+def test_user_bucket_uses_verified_id():
+    request = Request({"type": "http", "headers": [(b"x-telegram-user-id", b"999")], "client": ("1.2.3.4", 1), "path_params": {}})
+    keys = [key for key, _, _ in router_public.suggest_limit.buckets(request, user=7, event=42)]
+    assert keys == ["rl:public_suggest:u:7", "rl:public_suggest:ip:1.2.3.4", "rl:public_suggest:ev:42"]
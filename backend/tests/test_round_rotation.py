@@ -0,0 +1,137 @@
+"""
+Ротація раунду під конкуренцією (event_crud.end_round_and_start_next): CALLS одночасних
+«завершити раунд» по одному івенту — рівно один закриває раунд і відкриває наступний,
+решта отримують 409; дублікатів і дір у нумерації нема, переможець — пісня з найбільшим
+vote_count. Кожен виклик — один стейтмент (advisory lock + закриття + новий раунд).
+
+Потрібен Postgres: TEST_DATABASE_URL (postgresql+asyncpg://...). Таблиці створюються
+в окремій схемі й видаляються після тесту; без БД тест пропускається.
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.crud import event_crud
+from app.models.models import Club, Event, Round, Song
+from app.models.session import Base
+from app.services import round_state, vote_ingest
+
+CALLS = 50
+SCHEMA = f"test_rounds_{os.getpid()}"
+
+
+@pytest.fixture
+def engine():
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL не задано")
+
+    async def setup():
+        admin = create_async_engine(url, poolclass=NullPool)
+        try:
+            async with admin.begin() as conn:
+                await conn.execute(text(f'CREATE SCHEMA "{SCHEMA}"'))
+        finally:
+            await admin.dispose()
+        eng = create_async_engine(
+            url, poolclass=NullPool,
+            connect_args={"server_settings": {"search_path": SCHEMA}},
+        )
+        async with eng.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return eng
+
+    async def teardown(eng):
+        await eng.dispose()
+        admin = create_async_engine(url, poolclass=NullPool)
+        try:
+            async with admin.begin() as conn:
+                await conn.execute(text(f'DROP SCHEMA "{SCHEMA}" CASCADE'))
+        finally:
+            await admin.dispose()
+
+    try:
+        eng = asyncio.run(setup())
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"Postgres недоступний: {e}")
+    yield eng
+    asyncio.run(teardown(eng))
+
+
+@pytest.fixture(autouse=True)
+def no_side_effects(monkeypatch):
+    # тест про БД: кеш стану раунду й live-шина (Redis) тут не потрібні
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(vote_ingest, "VOTE_INGEST_MODE", "sync")
+    monkeypatch.setattr(round_state, "invalidate", noop)
+    monkeypatch.setattr(event_crud, "publish_event", noop)
+
+
+async def _seed(session_factory) -> tuple[int, int, int]:
+    async with session_factory() as db:
+        club = Club(name="Race", slug=f"race-{os.getpid()}")
+        db.add(club)
+        await db.flush()
+        ev = Event(club_id=club.id, title="Race night")
+        db.add(ev)
+        await db.flush()
+        rnd = Round(event_id=ev.id, number=1)
+        db.add(rnd)
+        await db.flush()
+        loser = Song(round_id=rnd.id, title="Loser", vote_count=2)
+        winner = Song(round_id=rnd.id, title="Winner", vote_count=5)
+        db.add_all([loser, winner])
+        await db.commit()
+        return ev.id, rnd.id, winner.id
+
+
+def test_concurrent_end_round_rotates_once(engine):
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    async def end_round(event_id: int, round_id: int):
+        async with session_factory() as db:
+            try:
+                return await event_crud.end_round_and_start_next(db, event_id, round_id)
+            except HTTPException as e:
+                return e.status_code
+
+    async def run():
+        event_id, round_id, winner_id = await _seed(session_factory)
+        statements.clear()
+        results = await asyncio.gather(*(end_round(event_id, round_id) for _ in range(CALLS)))
+        async with session_factory() as db:
+            rounds = (await db.execute(
+                select(Round).where(Round.event_id == event_id).order_by(Round.number)
+            )).scalars().all()
+        return round_id, winner_id, results, rounds
+
+    round_id, winner_id, results, rounds = asyncio.run(run())
+
+    ok = [r for r in results if isinstance(r, dict)]
+    assert len(ok) == 1
+    assert sorted(r for r in results if not isinstance(r, dict)) == [409] * (CALLS - 1)
+    assert ok[0]["ended_round_id"] == round_id
+    assert ok[0]["winner_song_id"] == winner_id
+    assert ok[0]["new_round_number"] == 2
+
+    assert [r.number for r in rounds] == [1, 2]
+    first, second = rounds
+    assert first.ended_at is not None and first.winner_song_id == winner_id
+    assert second.id == ok[0]["new_round_id"] and second.ended_at is None
+
+    # один стейтмент на виклик — lock, закриття й новий раунд не розносяться по round trip-ах
+    assert len(statements) == CALLS
+    assert all("pg_advisory_xact_lock" in s for s in statements)
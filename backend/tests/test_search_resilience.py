@@ -0,0 +1,231 @@
+"""
+Сценарії fake_provider_server (slow / flaky / down):
+- breaker, hedge і half-open проба — проти MockProvider: потрібні точні затримки й лічильники
+  викликів, яких HTTP-сервер з jitter не дає;
+- справжні провайдери deezer/itunes (httpx, нормалізація, health) — проти fake_provider_server
+  через ASGITransport, без мережі й окремого процесу.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import fake_provider_server
+from app.services import music_search, provider_health, search_providers
+from app.services.music_search import SearchUnavailable, _unified_search_impl
+from app.services.provider_health import CLOSED, FAIL_THRESHOLD, HALF_OPEN, OPEN, get_health
+from app.services.search_providers import MockProvider, configure_providers, register_provider
+
+HEDGE = 0.1
+
+
+class Recorder(MockProvider):
+    """MockProvider, що запам'ятовує, коли (loop.time) його викликали."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.called_at = []
+
+    async def __call__(self, q, limit, lang):
+        self.called_at.append(asyncio.get_running_loop().time())
+        return await super().__call__(q, limit, lang)
+
+
+@pytest.fixture(autouse=True)
+def fresh_health(monkeypatch):
+    provider_health._health.clear()
+    monkeypatch.setattr(provider_health, "HEDGE_DEFAULT", HEDGE)
+    monkeypatch.setattr(music_search, "SEARCH_DEADLINE_SECONDS", 1.0)
+    # use() реєструє t_* у глобальному реєстрі — після тесту повертаємо його як був
+    registry = dict(search_providers._registry)
+    active = dict(search_providers._active)
+    yield
+    provider_health._health.clear()
+    search_providers._registry.clear()
+    search_providers._registry.update(registry)
+    search_providers._active.clear()
+    search_providers._active.update(active)
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """deezer/itunes з music_search ходять у fake_provider_server.app замість інтернету."""
+    monkeypatch.setattr(fake_provider_server, "_modes", {"deezer": "ok", "itunes": "ok"})
+    monkeypatch.setattr(fake_provider_server, "_hits", {"deezer": 0, "itunes": 0})
+    monkeypatch.setattr(fake_provider_server, "LATENCY_MS", 5)
+    monkeypatch.setattr(fake_provider_server, "SLOW_MS", 3000)
+    monkeypatch.setattr(music_search, "DEEZER_API_URL", "http://fake/deezer")
+    monkeypatch.setattr(music_search, "ITUNES_API_URL", "http://fake/itunes")
+    monkeypatch.setattr(music_search, "_client", httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake_provider_server.app),
+    ))
+    configure_providers(["deezer", "itunes"])
+    return fake_provider_server
+
+
+def use(*providers: MockProvider) -> None:
+    for p in providers:
+        register_provider(p.name, p)
+    configure_providers([p.name for p in providers])
+
+
+def search(limit: int = 5):
+    return _unified_search_impl("hello", limit, None)
+
+
+def test_breaker_opens_after_fail_threshold():
+    down = Recorder("t_down", latency="fixed:0", error_rate=1.0)
+    use(down)
+
+    async def run():
+        for _ in range(FAIL_THRESHOLD):
+            with pytest.raises(SearchUnavailable):
+                await search()
+        assert get_health("t_down").state == OPEN
+        # відкритий breaker: до провайдера більше не ходимо
+        with pytest.raises(SearchUnavailable):
+            await search()
+
+    asyncio.run(run())
+    assert down.calls == FAIL_THRESHOLD
+
+
+def test_breaker_stays_closed_below_threshold():
+    down = Recorder("t_flaky", latency="fixed:0", error_rate=1.0)
+    use(down)
+
+    async def run():
+        for _ in range(FAIL_THRESHOLD - 1):
+            with pytest.raises(SearchUnavailable):
+                await search()
+
+    asyncio.run(run())
+    assert get_health("t_flaky").state == CLOSED
+
+
+def test_hedge_fires_after_hedge_delay():
+    slow = Recorder("t_slow", latency="fixed:600")
+    fast = Recorder("t_fast", latency="fixed:0")
+    use(slow, fast)
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        resp = await search()
+        return started, resp
+
+    started, resp = asyncio.run(run())
+    assert len(slow.called_at) == 1 and len(fast.called_at) == 1
+    waited = fast.called_at[0] - started
+    assert HEDGE <= waited < HEDGE + 0.1
+    assert all(it["source"] == "t_fast" for it in resp["items"])
+
+
+def test_no_hedge_when_primary_is_fast():
+    primary = Recorder("t_primary", latency="fixed:10")
+    backup = Recorder("t_backup", latency="fixed:0")
+    use(primary, backup)
+
+    resp = asyncio.run(search())
+    assert backup.calls == 0
+    assert len(resp["items"]) == 5
+
+
+def test_half_open_allows_one_probe_and_recovers():
+    flaky = Recorder("t_probe", latency="fixed:50")
+    use(flaky)
+    health = get_health("t_probe")
+    for _ in range(FAIL_THRESHOLD):
+        health.record_failure(0.01)
+    assert health.state == OPEN
+    health.opened_until = 0.0          # backoff минув
+
+    async def run():
+        return await asyncio.gather(search(), search(), search(), return_exceptions=True)
+
+    results = asyncio.run(run())
+    ok = [r for r in results if isinstance(r, dict)]
+    assert len(ok) == 1
+    assert sum(isinstance(r, SearchUnavailable) for r in results) == 2
+    assert flaky.calls == 1
+    assert health.state == CLOSED
+    assert health.open_seconds == provider_health.OPEN_BASE_SECONDS
+
+
+def test_failed_probe_reopens_with_longer_backoff():
+    down = Recorder("t_probe_down", latency="fixed:0", error_rate=1.0)
+    use(down)
+    health = get_health("t_probe_down")
+    for _ in range(FAIL_THRESHOLD):
+        health.record_failure(0.01)
+    health.opened_until = 0.0
+
+    with pytest.raises(SearchUnavailable):
+        asyncio.run(search())
+    assert health.state == OPEN
+    assert health.open_seconds == provider_health.OPEN_BASE_SECONDS * 2
+
+
+def test_cancelled_probe_is_released():
+    fast = Recorder("t_main", latency="fixed:300")
+    probe = Recorder("t_halfopen", latency="fixed:800")
+    use(fast, probe)
+    health = get_health("t_halfopen")
+    for _ in range(FAIL_THRESHOLD):
+        health.record_failure(0.01)
+    health.opened_until = 0.0
+
+    async def run():
+        resp = await search()
+        await asyncio.sleep(0.01)       # скасована проба встигає обробити CancelledError
+        return resp
+
+    resp = asyncio.run(run())
+    # пробу запустили як hedge, і її скасували, коли основний дав повну відповідь
+    assert probe.calls == 1
+    assert all(it["source"] == "t_main" for it in resp["items"])
+    assert health.state == HALF_OPEN
+    assert not health.probe_in_flight
+    assert health.allow()
+
+
+def test_fake_server_down_provider_falls_back(fake_server):
+    fake_server._modes["deezer"] = "down"
+
+    resp = asyncio.run(search())
+    assert resp["items"] and all(it["source"] == "itunes" for it in resp["items"])
+    assert fake_server._hits["deezer"] == 1
+    assert get_health("deezer").state == CLOSED      # одна 503 — ще не привід відкривати breaker
+
+
+def test_fake_server_slow_provider_is_cut_by_deadline(fake_server):
+    fake_server._modes["deezer"] = "slow"
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        resp = await search()
+        return loop.time() - started, resp
+
+    elapsed, resp = asyncio.run(run())
+    # 3s fake-затримка не тримає відповідь: itunes приходить після hedge, deezer скасовується
+    assert elapsed < music_search.SEARCH_DEADLINE_SECONDS + 0.2
+    assert resp["items"] and all(it["source"] == "itunes" for it in resp["items"])
+
+
+def test_fake_server_flaky_failures_do_not_open_breaker(fake_server):
+    fake_server._modes["deezer"] = "flaky"          # кожен FLAKY_EVERY-й (2-й) запит — 500
+    configure_providers(["deezer"])
+
+    async def run():
+        failures = 0
+        for _ in range(6):
+            try:
+                await search()
+            except SearchUnavailable:
+                failures += 1
+        return failures
+
+    assert asyncio.run(run()) == 3
+    assert fake_server._hits["deezer"] == 6
+    # помилки не підряд і вимірів менше MIN_SAMPLES — breaker лишається закритим
+    assert get_health("deezer").state == CLOSED
@@ -0,0 +1,171 @@
+"""
+Крос-воркерний single-flight пошуку (music_search: lease у Redis + pub/sub):
+N окремих процесів одночасно шукають те саме проти fake_provider_server — до кожного
+провайдера апстрім іде один раз; якщо власник lease помер, його перехоплює рівно один воркер.
+
+Redis — TEST_REDIS_URL (наприклад, локальний redis-server) або fakeredis.TcpFakeServer
+у цьому ж процесі; без обох тест пропускається.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+WORKERS = 4
+QUERY = "singleflight hit"
+
+# один воркер uvicorn: конфіг з env до імпорту app, старт — разом з рештою в START_AT
+_WORKER = """
+import asyncio, json, os, sys, time
+from app.services import music_search
+
+async def main():
+    await asyncio.sleep(max(0.0, float(os.environ["START_AT"]) - time.time()))
+    resp = await music_search.unified_search(os.environ["QUERY"], 5, None)
+    print(json.dumps({"items": len(resp["items"]), "sources": sorted({i["source"] for i in resp["items"]})}))
+
+asyncio.run(main())
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_http(url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=0.5)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not start")
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    url = os.getenv("TEST_REDIS_URL")
+    if url:
+        yield url
+        return
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")                 # Lua (EVAL) у fakeredis
+    port = _free_port()
+    server = fakeredis.TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://127.0.0.1:{port}/0"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def provider_url():
+    port = _free_port()
+    env = {**os.environ, "FAKE_LATENCY_MS": "400", "FAKE_SLOW_MS": "30000"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_provider_server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_http(f"{url}/_stats")
+        yield url
+    finally:
+        proc.kill()                             # slow-запит мертвого лідера висить 30 с
+        proc.wait()
+
+
+@pytest.fixture
+def redis_sync(redis_url):
+    import redis
+
+    client = redis.Redis.from_url(redis_url, decode_responses=True)
+    client.flushdb()
+    yield client
+    client.close()
+
+
+def _hits(provider_url: str) -> dict:
+    return httpx.get(f"{provider_url}/_stats").json()["hits"]
+
+
+def _mode(provider_url: str, mode: str) -> None:
+    for provider in ("deezer", "itunes"):
+        httpx.post(f"{provider_url}/_mode", params={"provider": provider, "mode": mode}).raise_for_status()
+
+
+def _spawn(redis_url: str, provider_url: str, start_at: float) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND),
+        "REDIS_URL": redis_url,
+        "DEEZER_API_URL": f"{provider_url}/deezer",
+        "ITUNES_API_URL": f"{provider_url}/itunes",
+        "SEARCH_PROVIDERS": "deezer,itunes",
+        "START_AT": str(start_at),
+        "QUERY": QUERY,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-c", _WORKER], cwd=BACKEND, env=env, stdout=subprocess.PIPE, text=True,
+    )
+
+
+def _results(procs) -> list:
+    out = []
+    for p in procs:
+        stdout, _ = p.communicate(timeout=30)
+        assert p.returncode == 0
+        out.append(json.loads(stdout.strip().splitlines()[-1]))
+    return out
+
+
+def test_one_upstream_call_per_provider(redis_url, provider_url, redis_sync):
+    _mode(provider_url, "ok")
+    before = _hits(provider_url)
+
+    start_at = time.time() + 4.0                # усі процеси встигають імпортувати app
+    results = _results([_spawn(redis_url, provider_url, start_at) for _ in range(WORKERS)])
+
+    after = _hits(provider_url)
+    calls = {p: after[p] - before[p] for p in after}
+    assert all(r["items"] == 5 for r in results)
+    assert calls["deezer"] == 1
+    assert calls["itunes"] <= 1                 # itunes — лише як hedge, і теж один раз
+
+
+def test_dead_lease_holder_is_taken_over_once(redis_url, provider_url, redis_sync):
+    _mode(provider_url, "slow")                 # лідер зависає на апстрімі з lease у руках
+    t0 = time.time()
+    # фоловери імпортують app паралельно з лідером і стартують, поки його lease ще живий
+    followers = [_spawn(redis_url, provider_url, t0 + 5.0) for _ in range(WORKERS)]
+    leader = _spawn(redis_url, provider_url, t0 + 4.0)
+    try:
+        deadline = time.monotonic() + 15
+        while not redis_sync.keys("search:lease:*"):
+            assert time.monotonic() < deadline, "leader never took the lease"
+            time.sleep(0.02)
+    finally:
+        leader.kill()
+        leader.wait()
+    _mode(provider_url, "ok")
+    before = _hits(provider_url)
+
+    results = _results(followers)
+
+    after = _hits(provider_url)
+    calls = {p: after[p] - before[p] for p in after}
+    assert time.time() - t0 > 5.0 + 1.0         # справді чекали на мертвого лідера
+    assert all(r["items"] == 5 for r in results)
+    assert calls["deezer"] == 1
+    assert calls["itunes"] <= 1
@@ -0,0 +1,55 @@
+"""
+Rollup аналітики (app/services/analytics.py): раз на ANALYTICS_INTERVAL_SECONDS враховує
+раунди, що закрились. Перший запуск проходить усю історію пачками по ANALYTICS_BATCH.
+
+    python worker_analytics.py
+    python worker_analytics.py --once      # один прохід (cron / перед archive_votes.py)
+"""
+import asyncio
+import logging
+import os
+import sys
+from typing import Optional
+
+from app.models.session import async_session, engine
+from app.services.analytics import ANALYTICS_BATCH, rollup_pending
+from app.services.event_runtime import get_attendees_count
+
+ANALYTICS_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_INTERVAL_SECONDS", "30"))
+
+log = logging.getLogger("worker_analytics")
+
+
+async def _attendees(event_id: int) -> Optional[int]:
+    # множина відвідувачів живе в Redis лише під час івенту — для історії її вже нема
+    try:
+        return await get_attendees_count(event_id) or None
+    except Exception:
+        return None
+
+
+async def run_once() -> int:
+    total = 0
+    while True:
+        async with async_session() as db:
+            done = await rollup_pending(db, _attendees)
+        total += len(done)
+        if len(done) < ANALYTICS_BATCH:
+            return total
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    if "--once" in sys.argv:
+        log.info("rolled up %d rounds", await run_once())
+        await engine.dispose()
+        return
+    while True:
+        try:
+            await run_once()
+        except Exception:
+            log.exception("analytics rollup failed")
+        await asyncio.sleep(ANALYTICS_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""
+Прогрів пошуку перед стартом івентів (див. app/services/search_warmup.py).
+
+    python worker_search_warmup.py
+
+Раз на WARMUP_POLL_SECONDS шукає івенти, що стартують протягом WARMUP_LEAD_SECONDS,
+і прогріває кожен один раз (прапорець у Redis, тож можна запускати кілька копій).
+"""
+import asyncio
+import logging
+import os
+
+from app.core.redis_client import redis_client
+from app.models.session import async_session
+from app.services.event_keys import k_search_warmup_lock
+from app.services.search_warmup import WARMUP_LEAD_SECONDS, events_to_warm, warm_club
+
+POLL_SECONDS = int(os.getenv("WARMUP_POLL_SECONDS", "60"))
+
+log = logging.getLogger("search_warmup")
+
+
+async def tick() -> None:
+    async with async_session() as db:
+        for club, event_id in await events_to_warm(db):
+            if not await redis_client.set(k_search_warmup_lock(event_id), "1", nx=True, ex=WARMUP_LEAD_SECONDS * 2):
+                continue
+            stats = await warm_club(db, club, event_id)
+            log.info("warmed club=%s event=%s %s", club.slug, event_id, stats)
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        try:
+            await tick()
+        except Exception:
+            log.exception("warm-up tick failed")
+        await asyncio.sleep(POLL_SECONDS)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""
+Флашер write-behind голосів (див. app/services/vote_ingest.py).
+
+    VOTE_INGEST_MODE=buffered uvicorn main:app ...   # API приймає голоси в Redis
+    python worker_vote_flusher.py                     # пише їх у Postgres пачками
+
+Можна запускати кілька копій — вони ділять стрім через consumer group; кожній копії
+на одному хості — своє VOTE_FLUSHER_CONSUMER (за замовчуванням hostname, стабільне між
+рестартами, щоб воркер дочитав власні непідтверджені записи).
+Метрики флашера (throughput, лаг до durable, backlog) — на http://0.0.0.0:VOTE_FLUSHER_METRICS_PORT/metrics.
+"""
+import asyncio
+import logging
+import os
+
+from app.services import metrics
+from app.services.vote_ingest import run_flusher
+
+METRICS_PORT = int(os.getenv("VOTE_FLUSHER_METRICS_PORT", "9108"))
+
+log = logging.getLogger("vote_flusher")
+
+
+async def _serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # окремий процес без FastAPI — мінімальний HTTP лише для scrape Prometheus
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = metrics.render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    server = await asyncio.start_server(_serve_metrics, "0.0.0.0", METRICS_PORT)
+    log.info("vote flusher started, metrics on :%s", METRICS_PORT)
+    async with server:
+        await run_flusher()
+
+if __name__ == "__main__":
+    asyncio.run(main())
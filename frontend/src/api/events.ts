@@ -20,7 +20,9 @@ export type EventSummary = {
     end_date?: string | null;
     created_at: string;
     slug: string;
-    attendees_count: number;
+    attendees_count?: number;
+    background_image_url?: string | null;
+    club?: { id: number; name: string; slug: string } | null;
 };
 
 export type QueueItem = {
@@ -89,11 +91,37 @@ export async function getEventQueue(
     );
 }
 
-export async function searchTracks(query: string, limit = 15) {
+export type EventBootstrap = {
+    event: EventSummary;
+    items: QueueItem[];
+    attendees_count: number;
+    seq: number;
+};
+
+export async function getEventBootstrap(
+    slug: string,
+    limit = 20,
+    tgUserId?: number,
+    token?: string | null
+) {
+    return apiRequest<EventBootstrap>(
+        `/api/v1/events/${slug}/bootstrap?limit=${limit}`,
+        {
+            method: "GET",
+            headers: telegramHeaders(tgUserId),
+            authToken: token ?? undefined,
+        }
+    );
+}
+
+export async function searchTracks(query: string, limit = 15, clubSlug?: string) {
     const params = new URLSearchParams({
         q: query,
         limit: String(limit),
     });
+    if (clubSlug) {
+        params.set("club", clubSlug);
+    }
 
     return apiRequest<{ items: SearchTrack[] }>(
         `/api/v1/search/?${params.toString()}`,
@@ -132,6 +160,8 @@ export async function suggestTrack(
             method: "POST",
             headers: {
                 "Content-Type": "application/json",
+                // подвійний тап по тому ж треку бекенд відсіює і не списує квоту вдруге
+                "Idempotency-Key": `suggest:${payload.track_id}`,
             },
             body: JSON.stringify(payload),
             authToken: token ?? undefined,
@@ -1,8 +1,7 @@
 import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import {
     createEventWsUrl,
-    getEventByClubSlug,
-    getEventQueue,
+    getEventBootstrap,
     searchTracks,
     suggestTrack,
     voteForTrack,
@@ -125,19 +124,10 @@ export function useEventData(clubSlug: string, token?: string | null) {
         setIsLoading(true);
 
         try {
-            const [eventResponse, queueResponse] = await Promise.all([
-                getEventByClubSlug(clubSlug, token ?? null),
-                getEventQueue(clubSlug, 20, token ?? null),
-            ]);
-
-            const attendeesCount = Number(
-                queueResponse?.attendees_count ??
-                eventResponse?.attendees_count ??
-                0
-            );
-
-            setEvent(normalizeEvent(eventResponse, clubSlug, attendeesCount));
-            setQueue(normalizeQueue(queueResponse));
+            const bootstrap = await getEventBootstrap(clubSlug, 20, undefined, token ?? null);
+
+            setEvent(normalizeEvent(bootstrap.event, clubSlug, Number(bootstrap.attendees_count ?? 0)));
+            setQueue(normalizeQueue(bootstrap));
         } catch (error) {
             console.error("Failed to fetch event data:", error);
             setEvent(null);
@@ -260,7 +250,7 @@ export function useEventData(clubSlug: string, token?: string | null) {
         }
 
         try {
-            const response = await searchTracks(trimmed, 15);
+            const response = await searchTracks(trimmed, 15, clubSlug);
             if (lastSearchRef.current === trimmed) {
                 setSearchResults(normalizeSearch(response));
             }
@@ -274,7 +264,7 @@ export function useEventData(clubSlug: string, token?: string | null) {
                 setIsSearching(false);
             }
         }
-    }, []);
+    }, [clubSlug]);
 
     const suggest = useCallback(
         async (track: UiSearchResult) => {